@@ -0,0 +1,76 @@
+"""Benchmark finding config sources in every directory of a large tree.
+
+Each package has a ``pyproject.toml``, a ``package.json`` without ``doitoml`` config,
+some source directories, and a ``node_modules`` which is never walked.
+
+Usage: ``python benchmarks/bench_discover.py 1000 --dirs 10``
+"""
+import argparse
+import json
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+from typing import List, Tuple
+
+from doitoml import DoiTOML
+from monorepo import write_pyproject
+
+
+def make_tree(root: Path, package_count: int, dir_count: int) -> None:
+    """Write many packages, each with some directories."""
+    write_pyproject(root / "pyproject.toml", {"doitoml": {"prefix": ""}})
+    for i in range(package_count):
+        pkg = root / f"packages/group{i % 10}/pkg{i}"
+        config = {"prefix": f"pkg{i}", "tasks": {"a": {"actions": [["echo", f"{i}"]]}}}
+        write_pyproject(pkg / "pyproject.toml", {"doitoml": config})
+        (pkg / "package.json").write_text(json.dumps({"name": f"pkg{i}"}), "utf-8")
+        for j in range(dir_count):
+            (pkg / f"src/mod{j}").mkdir(parents=True)
+            (pkg / f"src/mod{j}/__init__.py").touch()
+        vendored = pkg / "node_modules/dep"
+        vendored.mkdir(parents=True)
+        (vendored / "package.json").write_text("{}", encoding="utf-8")
+
+
+def main(argv: List[str]) -> int:
+    """Time discovery with a cold, and a warm, discovery cache."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("packages", nargs="?", type=int, default=1000)
+    parser.add_argument("--dirs", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    opts = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        make_tree(root, opts.packages, opts.dirs)
+        cache_dir = root / ".doitoml_cache"
+
+        def load(warm: bool) -> Tuple[float, int, int]:
+            if not warm:
+                shutil.rmtree(cache_dir, ignore_errors=True)
+            (cache_dir / "config.json").unlink(missing_ok=True)
+            doitoml = DoiTOML(
+                cwd=root,
+                discover_config_paths="tree",
+                update_env=False,
+                fail_quietly=False,
+                cache_dir=cache_dir,
+            )
+            discovery = doitoml.tree_discovery
+            seconds = doitoml.timings.phases["discover_tree"]
+            return seconds, discovery.scans, discovery.parsed
+
+        load(False)
+        print(f"{opts.packages} packages, {opts.dirs} directories each")
+        print(f"{'':>8} {'discover':>10} {'scans':>8} {'parsed':>8}")
+        for label in ["cold", "warm"]:
+            seconds, scans, parsed = min(
+                load(label == "warm") for _ in range(opts.repeat)
+            )
+            print(f"{label:>8} {seconds * 1000:8.1f}ms {scans:8} {parsed:8}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
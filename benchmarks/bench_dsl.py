@@ -0,0 +1,63 @@
+"""Benchmark finding the DSL for a mix of mostly-plain tokens.
+
+Usage: ``python benchmarks/bench_dsl.py 100000``
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+
+from doitoml import DoiTOML
+
+TOKENS = [
+    "python",
+    "-m",
+    "pytest",
+    "--cov-fail-under=100",
+    "src/foo/bar.py",
+    "::all_py",
+    "${PYTHONPATH}/foo",
+    ":rglob::src::*.py",
+    ":get::json::package.json::version",
+    "build/reports",
+]
+
+
+def match_every_pattern(doitoml: DoiTOML, token: str) -> Optional[Tuple[Any, Any]]:
+    """Find a DSL by trying every pattern in rank order."""
+    for dsl in doitoml.entry_points.dsl.values():
+        match = dsl.pattern.search(token)
+        if match is not None:
+            return dsl, match
+    return None
+
+
+def main(argv: List[str]) -> int:
+    """Time both approaches over ``count`` tokens."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("count", nargs="?", type=int, default=100_000)
+    opts = parser.parse_args(argv)
+    tokens = (TOKENS * (opts.count // len(TOKENS) + 1))[: opts.count]
+
+    with tempfile.TemporaryDirectory() as td:
+        ppt = Path(td) / "pyproject.toml"
+        ppt.write_text("[tool.doitoml]\nvalidate = false\n", encoding="utf-8")
+        doitoml = DoiTOML([ppt], cwd=Path(td), update_env=False)
+
+    index = doitoml.entry_points.dsl_index
+    for label, func in [
+        ("every pattern", lambda token: match_every_pattern(doitoml, token)),
+        ("index", index.match),
+    ]:
+        start = time.perf_counter()
+        for token in tokens:
+            func(token)
+        elapsed = time.perf_counter() - start
+        print(f"{label:>14} {elapsed:8.3f}s {opts.count / elapsed:12.0f} tokens/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
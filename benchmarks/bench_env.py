@@ -0,0 +1,79 @@
+"""Benchmark the memory held by the environments of many generated tasks.
+
+Usage: ``python benchmarks/bench_env.py 5000 300``
+"""
+import argparse
+import os
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Mapping, Tuple
+
+import tomli_w
+from doitoml import DoiTOML
+from doitoml.utils.env import LayeredEnv
+
+
+def make_tasks(root: Path, task_count: int) -> Path:
+    """Write a ``pyproject.toml`` with many tasks, a few with their own ``env``."""
+    tasks: Dict[str, Any] = {
+        f"t{i}": {"actions": [["echo", f"{i}"]]} for i in range(task_count)
+    }
+    for i in range(0, task_count, 10):
+        tasks[f"t{i}"]["meta"] = {"doitoml": {"env": {"TASK": f"{i}"}}}
+    ppt = root / "pyproject.toml"
+    config = {"prefix": "", "validate": False, "tasks": tasks}
+    ppt.write_text(tomli_w.dumps({"tool": {"doitoml": config}}), encoding="utf-8")
+    return ppt
+
+
+def copy_environ(env: LayeredEnv, overlay: Mapping[str, str]) -> Dict[str, str]:
+    """Copy the whole environment for every task, as earlier versions did."""
+    cmd_env = dict(env.base)
+    cmd_env.update(overlay)
+    return cmd_env
+
+
+def generate_tasks(doitoml: DoiTOML) -> List[Any]:
+    """Generate every ``doit`` task."""
+    return [task for func in doitoml.tasks().values() for task in func()]
+
+
+def measure(func: Callable[[], Any]) -> Tuple[Any, int, int]:
+    """Measure the memory allocated, and still held, by calling a function."""
+    tracemalloc.start()
+    kept = func()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return kept, current, peak
+
+
+def main(argv: List[str]) -> int:
+    """Compare copying the environment for every task to sharing one snapshot."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("tasks", nargs="?", type=int, default=5000)
+    parser.add_argument("env_vars", nargs="?", type=int, default=300)
+    opts = parser.parse_args(argv)
+
+    for i in range(opts.env_vars):
+        os.environ[f"DOITOML_BENCH_{i}"] = f"{i}" * 20
+
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        ppt = make_tasks(root, opts.tasks)
+        doitoml = DoiTOML([ppt], cwd=root, update_env=False, fail_quietly=False)
+        print(f"{opts.tasks} tasks, {len(os.environ)} environment variables")
+        layer = LayeredEnv.layer
+        for label in ["copy", "layered"]:
+            LayeredEnv.layer = copy_environ if label == "copy" else layer  # type: ignore
+            tasks, current, peak = measure(lambda: generate_tasks(doitoml))
+            mib = current / 2**20, peak / 2**20
+            print(f"{label:>8} {mib[0]:8.2f} MiB held {mib[1]:8.2f} MiB peak")
+            del tasks
+        LayeredEnv.layer = layer  # type: ignore
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
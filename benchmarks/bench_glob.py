@@ -0,0 +1,85 @@
+"""Benchmark ``:rglob`` with a huge excluded (and ignored) directory.
+
+Usage: ``python benchmarks/bench_glob.py 2000``
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List
+
+from doitoml import DoiTOML
+from doitoml.utils.fs import DirectoryCache
+
+FILES_PER_DIR = 10
+
+
+def make_tree(root: Path, ignored_dirs: int) -> None:
+    """Write a small ``src`` and a large ``node_modules``."""
+    for i in range(20):
+        (root / f"src/pkg{i}").mkdir(parents=True)
+        (root / f"src/pkg{i}/index.js").touch()
+    for i in range(ignored_dirs):
+        pkg = root / f"node_modules/pkg{i}/lib"
+        pkg.mkdir(parents=True)
+        for j in range(FILES_PER_DIR):
+            (pkg / f"{j}.js").touch()
+    (root / ".gitignore").write_text("node_modules/\n", encoding="utf-8")
+    (root / "pyproject.toml").write_text(
+        '[tool.doitoml]\nprefix = ""\nvalidate = false\n',
+        encoding="utf-8",
+    )
+
+
+def rglob_then_filter(root: Path) -> List[str]:
+    """Expand the full ``rglob``, then exclude, as earlier versions did."""
+    exclude = re.compile("node_modules")
+    found = []
+    for path in root.rglob("*.js"):
+        rel = Path(os.path.relpath(path.as_posix(), root.as_posix())).as_posix()
+        if not exclude.search(rel):
+            found += [path.as_posix()]
+    return sorted(found)
+
+
+def main(argv: List[str]) -> int:
+    """Time each approach on a fresh directory cache."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("ignored_dirs", nargs="?", type=int, default=2000)
+    opts = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        make_tree(root, opts.ignored_dirs)
+        doitoml = DoiTOML([root / "pyproject.toml"], cwd=root, update_env=False)
+        source = doitoml.config.sources[""]
+        dsl = doitoml.entry_points.dsl["doitoml-colon-glob"]
+
+        def expand(raw_token: str) -> Callable[[], List[str]]:
+            def run() -> List[str]:
+                doitoml.directory_cache = DirectoryCache()
+                match = dsl.pattern.search(raw_token)
+                return dsl.expand_token(source, match)  # type: ignore
+
+            return run
+
+        expected = None
+        for label, func in [
+            ("rglob + filter", lambda: rglob_then_filter(root)),
+            ("pruned exclude", expand(":rglob::.::*.js::!node_modules")),
+            ("gitignore", expand(":rglob::.::*.js::/gitignore/")),
+        ]:
+            start = time.perf_counter()
+            found = func()
+            elapsed = time.perf_counter() - start
+            expected = expected or found
+            same = "ok" if found == expected else "MISMATCH"
+            print(f"{label:>15} {elapsed:8.3f}s {len(found):6} paths {same}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
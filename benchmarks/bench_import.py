@@ -0,0 +1,134 @@
+"""Benchmark the time to import ``doitoml``, against a budget.
+
+Each scenario runs a fresh interpreter with ``python -X importtime``, and parses
+its output:
+
+- ``api``: ``import doitoml``, as a ``dodo.py`` using ``DoiTOML`` would
+- ``loader``: ``import doitoml.loaders``, after ``doit`` itself is imported, as
+  ``doit list`` would
+
+The fastest of ``--repeat`` runs of each must fit in its budget, and must not have
+imported any module only needed to run tasks, or by optional plugins.
+
+Usage: ``python benchmarks/bench_import.py [--scenario api] [--budget-scale 2]``
+"""
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, NamedTuple, Tuple
+
+
+class Scenario(NamedTuple):
+
+    """A module to import, with a budget in milliseconds."""
+
+    #: modules already imported, and not counted
+    before: Tuple[str, ...]
+    #: the module to time
+    module: str
+    #: the most milliseconds ``module`` may take to import
+    budget: float
+    #: modules which must not be imported
+    forbidden: Tuple[str, ...]
+
+
+#: only needed by optional plugins
+PLUGIN_MODULES = ("jinja2", "jsone", "jsonschema", "yaml")
+
+SCENARIOS = {
+    "api": Scenario(
+        before=(),
+        module="doitoml",
+        budget=60,
+        forbidden=(
+            "doit",
+            "importlib.metadata",
+            "pprint",
+            "subprocess",
+            *PLUGIN_MODULES,
+        ),
+    ),
+    "loader": Scenario(
+        before=("doit.cmd_base",),
+        module="doitoml.loaders",
+        budget=20,
+        forbidden=PLUGIN_MODULES,
+    ),
+}
+
+#: cumulative microseconds, by module name
+ImportTimes = Dict[str, int]
+
+
+def import_times(scenario: Scenario) -> ImportTimes:
+    """Import a module in a fresh interpreter, parsing ``-X importtime``."""
+    imports = [*scenario.before, scenario.module]
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    proc = subprocess.run(  # noqa: S603
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(imports)}"],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times: ImportTimes = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _self_us, cumulative_us, name = line.split(":", 1)[1].split("|")
+        times[name.strip()] = int(cumulative_us)
+    return times
+
+
+def bench_scenario(name: str, scenario: Scenario, repeat: int, scale: float) -> bool:
+    """Print the best import time of a scenario, returning whether it passed."""
+    # the first run may write bytecode
+    best = import_times(scenario)
+    for _ in range(repeat):
+        times = import_times(scenario)
+        if times[scenario.module] < best[scenario.module]:
+            best = times
+    ms = best[scenario.module] / 1000
+    budget = scenario.budget * scale
+    forbidden = sorted(set(scenario.forbidden) & set(best))
+    slowest = sorted(
+        ((us, mod) for mod, us in best.items() if mod.startswith("doitoml")),
+        reverse=True,
+    )[:5]
+    ok = ms <= budget and not forbidden
+    print(f"{name:>8} {ms:8.1f}ms {budget:8.1f}ms  {'ok' if ok else 'OVER BUDGET'}")
+    for us, mod in slowest:
+        print(f"{'':>8} {us / 1000:8.1f}ms  {mod}")
+    if forbidden:
+        print(f"{'':>8} imported: {', '.join(forbidden)}")
+    return ok
+
+
+def main(argv: List[str]) -> int:
+    """Run some or all scenarios, failing if any is over budget."""
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--budget-scale",
+        type=float,
+        default=1.0,
+        help="multiply every budget, e.g. on slower machines",
+    )
+    opts = parser.parse_args(argv)
+
+    print(f"{'scenario':>8} {'import':>10} {'budget':>10}")
+    results = [
+        bench_scenario(name, SCENARIOS[name], opts.repeat, opts.budget_scale)
+        for name in opts.scenario or SCENARIOS
+    ]
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,155 @@
+"""Benchmark ``DoiTOML`` initialization on synthetic monorepos, against baselines.
+
+Each scenario writes a monorepo with ``monorepo.py``, then times:
+
+- ``init``: constructing a ``DoiTOML``
+- ``tasks``: ``DoiTOML.tasks()``, and generating every ``doit`` task from them
+- ``doit_list``: ``doit list`` through the ``DoitomlLoader``, without a config cache
+- ``doit_list_cached``: ``doit list`` again, with a warm config cache
+
+The fastest of ``--repeat`` runs is compared to ``baselines.json``: the benchmark
+fails if any is slower than its baseline by more than ``--threshold``. Baselines
+are only meaningful on the machine they were recorded on: re-record them with
+``--save`` before comparing changes.
+
+Usage: ``python benchmarks/bench_init.py [--scenario wide] [--save]``
+"""
+import argparse
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from doitoml import DoiTOML
+from monorepo import Shape, make_monorepo
+
+HERE = Path(__file__).parent
+BASELINES = HERE / "baselines.json"
+
+SCENARIOS = {
+    "small": Shape(),
+    "wide": Shape(sources=100, tasks=20, refs=2, tree_dirs=5),
+    "deep": Shape(sources=5, rglobs=4, tree_dirs=500, tree_files=10),
+    "templated": Shape(sources=20, tasks=2, templates=10),
+    "monorepo": Shape(sources=50, tasks=20, refs=3, rglobs=2, gets=3, templates=2),
+}
+
+Timings = Dict[str, float]
+
+
+def best_of(repeat: int, func: Callable[[], object]) -> float:
+    """Get the fastest time of a number of runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def doit_list(root: Path, *args: str) -> None:
+    """Run ``doit list`` in a monorepo, failing loudly."""
+    subprocess.check_call(  # noqa: S603
+        [sys.executable, "-m", "doit", "list", "--all", *args],
+        cwd=str(root),
+        stdout=subprocess.DEVNULL,
+    )
+
+
+def bench_scenario(shape: Shape, repeat: int) -> Timings:
+    """Time each phase of loading a single scenario."""
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        ppt = make_monorepo(root, shape)
+
+        def init() -> DoiTOML:
+            return DoiTOML([ppt], cwd=root, update_env=False, fail_quietly=False)
+
+        doitoml = init()
+
+        def tasks() -> None:
+            for task_func in doitoml.tasks().values():
+                [*task_func()]
+
+        timings = {
+            "init": best_of(repeat, init),
+            "tasks": best_of(repeat, tasks),
+            "doit_list": best_of(
+                repeat,
+                lambda: doit_list(root, "--no-doitoml-cache"),
+            ),
+        }
+        cache_dir = root / ".doitoml_cache"
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        doit_list(root)
+        timings["doit_list_cached"] = best_of(repeat, lambda: doit_list(root))
+    return timings
+
+
+def compare(
+    results: Dict[str, Timings],
+    baselines: Dict[str, Timings],
+    threshold: float,
+) -> List[str]:
+    """Print each timing against its baseline, returning any regressions."""
+    regressions = []
+    print(f"{'scenario':>10} {'metric':>17} {'seconds':>9} {'baseline':>9}  ratio")
+    for scenario, timings in results.items():
+        for metric, seconds in timings.items():
+            baseline = baselines.get(scenario, {}).get(metric)
+            ratio = seconds / baseline if baseline else None
+            flag = ""
+            if ratio is not None and ratio > threshold:
+                flag = " REGRESSION"
+                regressions += [f"{scenario} {metric}"]
+            print(
+                f"{scenario:>10} {metric:>17} {seconds:>9.3f} "
+                f"{baseline or float('nan'):>9.3f} {ratio or float('nan'):>6.2f}{flag}",
+            )
+    return regressions
+
+
+def main(argv: List[str]) -> int:
+    """Run some or all scenarios, and compare them to (or save) baselines."""
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--threshold", type=float, default=1.5)
+    parser.add_argument("--baselines", type=Path, default=BASELINES)
+    parser.add_argument("--save", action="store_true", help="save new baselines")
+    opts = parser.parse_args(argv)
+
+    baselines: Dict[str, Timings] = {}
+    if opts.baselines.exists():
+        baselines = json.loads(opts.baselines.read_text(encoding="utf-8"))
+
+    results = {
+        name: bench_scenario(SCENARIOS[name], opts.repeat)
+        for name in opts.scenario or SCENARIOS
+    }
+
+    regressions = compare(results, baselines, opts.threshold)
+
+    if opts.save:
+        baselines.update(results)
+        opts.baselines.write_text(
+            json.dumps(baselines, indent=2, sort_keys=True) + "\n",
+            encoding="utf-8",
+        )
+        return 0
+
+    if regressions:
+        print(f"slower than {opts.threshold}x baseline: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,96 @@
+"""Benchmark many ``jinja2`` templated tasks sharing one template.
+
+Compares compiling the template for every task, as earlier versions did, to
+compiling it once, and to loading it from a warm bytecode cache.
+
+Usage: ``python benchmarks/bench_jinja2.py 500``
+"""
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import jinja2
+import tomli_w
+from doitoml import DoiTOML
+from doitoml.templaters.jinja2 import Jinja2
+
+TEMPLATE = """
+{% for v in tokens[":versions"] %}
+{% if v.startswith("1.") %}
+- name: old-v{{ loop.index }}
+  doc: build {{ v }} with {{ env.get("USER", "nobody") | upper }}
+  actions: [[echo, "{{ v }}", "{{ paths[":dist"] | join(" ") }}"]]
+{% else %}
+- name: new-v{{ loop.index }}
+  doc: build {{ v }} with {{ env.get("USER", "nobody") | lower }}
+  actions: [[echo, "{{ v | replace(".", "-") }}", "{{ tokens | length }}"]]
+{% endif %}
+{% endfor %}
+"""
+
+
+def make_tasks(root: Path, task_count: int) -> Path:
+    """Write a ``pyproject.toml`` where many tasks share one template."""
+    tasks: Dict[str, Any] = {f"t{i}": {"yaml": TEMPLATE} for i in range(task_count)}
+    config = {
+        "prefix": "",
+        "validate": False,
+        "paths": {"dist": ["dist"]},
+        "tokens": {"versions": ["1.0.0", "2.0.0"]},
+        "templates": {"jinja2": {"tasks": tasks}},
+    }
+    ppt = root / "pyproject.toml"
+    ppt.write_text(tomli_w.dumps({"tool": {"doitoml": config}}), encoding="utf-8")
+    return ppt
+
+
+def compile_every_time(_self: Jinja2, template: str) -> jinja2.Template:
+    """Compile a template for every task, as earlier versions did."""
+    return jinja2.Template(template)
+
+
+def main(argv: List[str]) -> int:
+    """Time loading many templated tasks, with and without compiled templates."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("tasks", nargs="?", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    opts = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        ppt = make_tasks(root, opts.tasks)
+        cache_dir = root / "cache"
+
+        def load(label: str) -> float:
+            if label == "cold":
+                shutil.rmtree(cache_dir, ignore_errors=True)
+            start = time.perf_counter()
+            DoiTOML(
+                [ppt],
+                cwd=root,
+                update_env=False,
+                fail_quietly=False,
+                cache_dir=None if label in {"every", "once"} else cache_dir,
+            )
+            # don't reuse the resolved config
+            (cache_dir / "config.json").unlink(missing_ok=True)
+            return time.perf_counter() - start
+
+        get_template = Jinja2.get_template
+        print(f"{opts.tasks} tasks sharing one template")
+        for label in ["every", "once", "cold", "warm"]:
+            Jinja2.get_template = (  # type: ignore
+                compile_every_time if label == "every" else get_template
+            )
+            best = min(load(label) for _ in range(opts.repeat))
+            print(f"{label:>8} {best:8.3f}s")
+        Jinja2.get_template = get_template  # type: ignore
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
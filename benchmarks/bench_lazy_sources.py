@@ -0,0 +1,52 @@
+"""Benchmark loading all sources, and only those needed by one selected task.
+
+Uses the same sources as ``bench_sources.py``. Each run starts with an empty parse
+cache, and ends with the ``doit`` task functions for the selected tasks.
+
+Usage: ``python benchmarks/bench_lazy_sources.py 1000``
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from bench_sources import make_sources
+from doitoml import DoiTOML
+
+
+def main(argv: List[str]) -> int:
+    """Time loading sources, and resolving tasks, with and without selectors."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("packages", nargs="?", type=int, default=1000)
+    parser.add_argument("--select", default="pkg0:t0")
+    parser.add_argument("--repeat", type=int, default=3)
+    opts = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        ppt = make_sources(root, opts.packages)
+
+        def load(selectors: Optional[List[str]]) -> Tuple[float, int, int]:
+            start = time.perf_counter()
+            doitoml = DoiTOML(
+                [ppt],
+                cwd=root,
+                update_env=False,
+                fail_quietly=False,
+                selectors=selectors,
+            )
+            doitoml.tasks(selectors)
+            seconds = time.perf_counter() - start
+            return seconds, len(doitoml.config.sources), len(doitoml.config.tasks)
+
+        print(f"{'':>10} {'load':>10} {'sources':>8} {'tasks':>8}")
+        for label, selectors in [("all", None), (opts.select, [opts.select])]:
+            seconds, sources, tasks = min(load(selectors) for _ in range(opts.repeat))
+            print(f"{label:>10} {seconds * 1000:8.1f}ms {sources:8} {tasks:8}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,76 @@
+"""Count ``Path.resolve`` calls while loading the examples, with and without memo.
+
+Usage: ``python benchmarks/bench_paths.py``
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+from unittest import mock
+
+from doitoml import DoiTOML
+from doitoml.utils.path import PATH_CACHE_SIZE, PathCache
+from monorepo import Shape, make_monorepo
+
+HERE = Path(__file__).parent
+EXAMPLES = HERE.parent / "examples"
+
+
+def count_resolves(root: Path, maxsize: int) -> Tuple[int, float]:
+    """Count calls to ``Path.resolve`` while loading and generating all tasks."""
+    calls = [0]
+    original = Path.resolve
+
+    def counted(self: Path, *args: Any, **kwargs: Any) -> Path:
+        calls[0] += 1
+        return original(self, *args, **kwargs)
+
+    patch_size = mock.patch.object(PathCache.__init__, "__defaults__", (maxsize,))
+    with patch_size, mock.patch.object(Path, "resolve", counted):
+        start = time.perf_counter()
+        doitoml = DoiTOML(
+            cwd=root,
+            discover_config_paths=True,
+            update_env=False,
+            fail_quietly=False,
+        )
+        for func in doitoml.tasks().values():
+            [*func()]
+        elapsed = time.perf_counter() - start
+    return calls[0], elapsed
+
+
+def main(argv: List[str]) -> int:
+    """Compare resolving every path to resolving each path once."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.parse_args(argv)
+    # needed by the ``py-js-web`` example
+    os.environ.setdefault("CONDA_EXE", "conda")
+    print(f"{'example':>14} {'before':>8} {'after':>8} {'seconds':>17}")
+    with tempfile.TemporaryDirectory() as td:
+        roots: Dict[str, Path] = {}
+        for example in sorted(EXAMPLES.glob("*/pyproject.toml")):
+            root = roots[example.parent.name] = Path(td) / example.parent.name
+            shutil.copytree(example.parent, root)
+        roots["(deep)"] = Path(td) / "deep"
+        make_monorepo(roots["(deep)"], Shape(sources=5, rglobs=4, tree_dirs=200))
+
+        for name, root in roots.items():
+            try:
+                before, before_s = count_resolves(root, 0)
+                after, after_s = count_resolves(root, PATH_CACHE_SIZE)
+            except Exception as err:
+                print(f"{name:>14} {type(err).__name__}: {err}")
+                continue
+            print(
+                f"{name:>14} {before:>8} {after:>8} {before_s:>8.3f} {after_s:>8.3f}",
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
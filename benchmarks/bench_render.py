@@ -0,0 +1,85 @@
+"""Benchmark reusing templated tasks rendered by an earlier run.
+
+Each JSON-e task maps over the results of a ``:glob``, and each Jinja2 task loops
+over a token. The config cache is removed before every run, so only the render
+cache can be reused.
+
+Usage: ``python benchmarks/bench_render.py 100 --files 200``
+"""
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import tomli_w
+from doitoml import DoiTOML
+from doitoml.constants import CACHE
+
+JINJA2_TASK = """
+{% for v in tokens[":versions"] %}
+- name: v{{ loop.index }}
+  actions: [[echo, "{{ v }}"]]
+{% endfor %}
+"""
+
+
+def make_tasks(root: Path, task_count: int, file_count: int) -> Path:
+    """Write a ``pyproject.toml`` with many templated tasks, and files to glob."""
+    src = root / "src"
+    src.mkdir()
+    for i in range(file_count):
+        (src / f"f{i}.py").touch()
+    jsone: Dict[str, Any] = {
+        f"e{i}": {
+            "$map": [":glob::src::*.py"],
+            "each(v,j)": {"name": "f${j}", "actions": [["echo", f"{i}", "${v}"]]},
+        }
+        for i in range(task_count)
+    }
+    jinja2 = {f"j{i}": {"yaml": JINJA2_TASK} for i in range(task_count)}
+    config = {
+        "prefix": "",
+        "validate": False,
+        "tokens": {"versions": [f"1.{i}" for i in range(10)]},
+        "templates": {"json-e": {"tasks": jsone}, "jinja2": {"tasks": jinja2}},
+    }
+    ppt = root / "pyproject.toml"
+    ppt.write_text(tomli_w.dumps({"tool": {"doitoml": config}}), encoding="utf-8")
+    return ppt
+
+
+def main(argv: List[str]) -> int:
+    """Time loading templated tasks with a cold, and a warm, render cache."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("tasks", nargs="?", type=int, default=100)
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    opts = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        ppt = make_tasks(root, opts.tasks, opts.files)
+        cache_dir = root / CACHE.DIR
+
+        def load(warm: bool) -> Tuple[float, float]:
+            if not warm:
+                shutil.rmtree(cache_dir, ignore_errors=True)
+            (cache_dir / CACHE.CONFIG).unlink(missing_ok=True)
+            start = time.perf_counter()
+            doitoml = DoiTOML([ppt], cwd=root, fail_quietly=False, cache_dir=cache_dir)
+            templaters = doitoml.timings.templaters.values()
+            return time.perf_counter() - start, sum(t.total for t in templaters)
+
+        print(f"{opts.tasks} JSON-e and Jinja2 tasks, over {opts.files} files")
+        print(f"{'':>8} {'total':>8} {'templaters':>10}")
+        for label in ["cold", "warm"]:
+            best = min(load(label == "warm") for _ in range(opts.repeat))
+            print(f"{label:>8} {best[0]:7.3f}s {best[1]:9.3f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
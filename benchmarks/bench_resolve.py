@@ -0,0 +1,76 @@
+"""Benchmark resolving chains of cross-referenced ``paths`` and ``tokens``.
+
+Each ``path`` refers to the next, declared in the worst order for resolvers that
+make repeated passes over all sources, and the last expands a glob.
+
+Usage: ``python benchmarks/bench_resolve.py 25 50 100``
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import tomli_w
+from doitoml import DoiTOML
+from doitoml.config import Config
+
+
+def make_chain(root: Path, depth: int) -> Path:
+    """Write a ``pyproject.toml`` with a chain of ``depth`` references."""
+    paths: Dict[str, List[str]] = {
+        f"p{i}": [f"::p{i + 1}", f"f{i}.txt"] for i in range(depth - 1)
+    }
+    paths[f"p{depth - 1}"] = [":glob::.::*.txt"]
+    tokens = {f"t{i}": [f"::p{i}", f"::t{i + 1}"] for i in range(depth - 1)}
+    tokens[f"t{depth - 1}"] = ["echo"]
+    for i in range(depth):
+        (root / f"f{i}.txt").touch()
+    ppt = root / "pyproject.toml"
+    config = {"paths": paths, "tokens": tokens, "validate": False}
+    ppt.write_text(tomli_w.dumps({"tool": {"doitoml": config}}), encoding="utf-8")
+    return ppt
+
+
+def bench_one(depth: int) -> Dict[str, Any]:
+    """Time building a ``DoiTOML`` from a chain, counting resolved specs."""
+    calls = [0]
+    original = Config.resolve_one_path_spec
+
+    def counted(*args: Any, **kwargs: Any) -> Any:
+        calls[0] += 1
+        return original(*args, **kwargs)
+
+    with tempfile.TemporaryDirectory() as td:
+        ppt = make_chain(Path(td), depth)
+        Config.resolve_one_path_spec = counted  # type: ignore
+        start = time.perf_counter()
+        try:
+            DoiTOML([ppt], cwd=Path(td), update_env=False, fail_quietly=False)
+            error = None
+        except Exception as err:
+            error = type(err).__name__
+        finally:
+            elapsed = time.perf_counter() - start
+            Config.resolve_one_path_spec = original  # type: ignore
+    return {"depth": depth, "seconds": elapsed, "specs": calls[0], "error": error}
+
+
+def main(argv: List[str]) -> int:
+    """Run the benchmark for a number of chain depths."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("depths", nargs="*", type=int, default=[25, 50, 100, 200])
+    opts = parser.parse_args(argv)
+    print(f"{'depth':>6} {'seconds':>9} {'specs':>9}  error")
+    for depth in opts.depths:
+        result = bench_one(depth)
+        print(
+            f"{result['depth']:>6} {result['seconds']:>9.3f} {result['specs']:>9}"
+            f"  {result['error'] or ''}",
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,66 @@
+"""Benchmark validating resolved config with ``jsonschema``, and a generated validator.
+
+Usage: ``python benchmarks/bench_schema.py 5000``
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, List
+
+from bench_tasks import make_tasks
+from doitoml import DoiTOML
+from doitoml.schema import LATEST_SCHEMA
+from doitoml.schema.compiler import load_validator
+from doitoml.schema.validator import latest
+
+
+def best_of(repeat: int, func: Callable[[], Any]) -> float:
+    """Get the fastest time of a number of runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv: List[str]) -> int:
+    """Time validating many resolved tasks, and generating the validator."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("tasks", nargs="?", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    opts = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        ppt = make_tasks(root, opts.tasks)
+        doitoml = DoiTOML([ppt], cwd=root, update_env=False, fail_quietly=False)
+        instance = dict(doitoml.config.get_context())
+        if latest.compiled(instance) != latest.jsonschema_errors(instance):
+            print("the generated validator disagrees with jsonschema")
+            return 1
+
+        cache_dir = root / "schema"
+        timings = {
+            "jsonschema": best_of(
+                opts.repeat,
+                lambda: latest.jsonschema_errors(instance),
+            ),
+            "compiled": best_of(opts.repeat, lambda: latest.compiled(instance)),
+            "generate": best_of(opts.repeat, lambda: load_validator(LATEST_SCHEMA)),
+            "from disk": best_of(
+                opts.repeat,
+                lambda: load_validator(LATEST_SCHEMA, cache_dir),
+            ),
+        }
+
+    print(f"{len(instance['tasks'])} resolved tasks")
+    for label, seconds in timings.items():
+        print(f"{label:>12} {seconds * 1000:10.2f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
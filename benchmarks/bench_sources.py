@@ -0,0 +1,62 @@
+"""Benchmark finding many nested config sources.
+
+The root lists every package, and each package lists a ``package.json`` next to
+it, and the root again. Each run starts with an empty parse cache.
+
+Usage: ``python benchmarks/bench_sources.py 1000``
+"""
+import argparse
+import json
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List
+
+from doitoml import DoiTOML
+from monorepo import write_pyproject
+
+
+def make_sources(root: Path, package_count: int) -> Path:
+    """Write a root ``pyproject.toml``, and two sources per package."""
+    config_paths = []
+    for i in range(package_count):
+        pkg = root / f"packages/pkg{i}"
+        pkg.mkdir(parents=True)
+        tasks: Dict[str, Any] = {
+            f"t{j}": {"actions": [["echo", f"{i}", f"{j}"]]} for j in range(10)
+        }
+        pkg_json = {"name": f"pkg{i}", "doitoml": {"prefix": f"js{i}", "tasks": tasks}}
+        (pkg / "package.json").write_text(json.dumps(pkg_json), encoding="utf-8")
+        config = {
+            "prefix": f"pkg{i}",
+            "config_paths": ["package.json", "../../pyproject.toml"],
+            "tasks": tasks,
+        }
+        write_pyproject(pkg / "pyproject.toml", {"doitoml": config})
+        config_paths += [f"packages/pkg{i}/pyproject.toml"]
+    config = {"prefix": "", "validate": False, "config_paths": config_paths}
+    return write_pyproject(root / "pyproject.toml", {"doitoml": config})
+
+
+def main(argv: List[str]) -> int:
+    """Time finding, and reading, all nested sources."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("packages", nargs="?", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    opts = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        ppt = make_sources(root, opts.packages)
+        best = float("inf")
+        for _ in range(opts.repeat):
+            doitoml = DoiTOML([ppt], cwd=root, update_env=False, fail_quietly=False)
+            best = min(best, doitoml.timings.phases["find_config_sources"])
+
+    print(f"{len(doitoml.config.sources)} sources")
+    print(f"find_config_sources {best * 1000:10.1f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
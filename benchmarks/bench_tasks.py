@@ -0,0 +1,69 @@
+"""Benchmark the memory and time used to resolve many tasks, after parsing.
+
+Usage: ``python benchmarks/bench_tasks.py 20000``
+"""
+import argparse
+import gc
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, List
+
+import tomli_w
+from doitoml import DoiTOML
+
+
+def make_tasks(root: Path, task_count: int) -> Path:
+    """Write a ``pyproject.toml`` with many tasks, in groups of 100."""
+    tasks: Dict[str, Any] = {}
+    for i in range(task_count):
+        group = tasks.setdefault(f"g{i // 100}", {})
+        group[f"t{i}"] = {
+            "doc": f"task {i}",
+            "actions": [["echo", f"{i}"], ["touch", f"build/t{i}.txt"]],
+            "file_dep": [f"src/f{i % 10}.py"],
+            "targets": [f"build/t{i}.txt"],
+            "task_dep": [f"g{i // 100}:t{i - 1}"] if i % 100 else [],
+            "meta": {"doitoml": {"env": {"TASK": f"{i}"}}},
+        }
+    ppt = root / "pyproject.toml"
+    config = {"prefix": "", "validate": False, "tasks": tasks}
+    ppt.write_text(tomli_w.dumps({"tool": {"doitoml": config}}), encoding="utf-8")
+    return ppt
+
+
+def main(argv: List[str]) -> int:
+    """Measure resolving, and keeping, many already-parsed tasks."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("tasks", nargs="?", type=int, default=20000)
+    opts = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        ppt = make_tasks(root, opts.tasks)
+        doitoml = DoiTOML([ppt], cwd=root, update_env=False, fail_quietly=False)
+        config = doitoml.config
+
+        config.tasks = {}
+        gc.collect()
+        tracemalloc.start()
+        config.init_tasks()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        config.tasks = {}
+        gc.collect()
+        start = time.perf_counter()
+        config.init_tasks()
+        seconds = time.perf_counter() - start
+
+        mib = current / 2**20, peak / 2**20
+        print(f"{len(config.tasks)} tasks resolved in {seconds:.3f}s")
+        print(f"{mib[0]:8.2f} MiB held {mib[1]:8.2f} MiB peak")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,149 @@
+"""Generate a synthetic monorepo of ``doitoml`` sources.
+
+Usage: ``python benchmarks/monorepo.py path/to/repo --sources 50 --tasks 20``
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple
+
+import tomli_w
+
+
+class Shape(NamedTuple):
+
+    """The size of a synthetic monorepo."""
+
+    #: the number of packages, each a source in the root ``config_paths``
+    sources: int = 5
+    #: the number of plain tasks per source
+    tasks: int = 10
+    #: the number of other sources' ``paths`` referenced by each task
+    refs: int = 1
+    #: the number of ``:rglob`` tokens per source
+    rglobs: int = 1
+    #: the number of directories under each source's ``src``
+    tree_dirs: int = 10
+    #: the number of files in each of those directories
+    tree_files: int = 5
+    #: the number of ``:get::`` tokens per source
+    gets: int = 1
+    #: the number of ``jinja2`` and ``json-e`` templated tasks per source
+    templates: int = 0
+
+
+JINJA2_TASKS = """
+{% for v in tokens["PREFIX:versions"] %}
+- name: TASK-v{{ loop.index }}
+  actions: [[echo, "{{ v }}"]]
+{% endfor %}
+"""
+
+
+def make_monorepo(root: Path, shape: Shape) -> Path:
+    """Write a root ``pyproject.toml`` which references all packages."""
+    config_paths = [
+        make_package(root / f"packages/pkg{i}", i, shape).relative_to(root).as_posix()
+        for i in range(shape.sources)
+    ]
+    config = {
+        "prefix": "",
+        "config_paths": config_paths,
+        "paths": {"all_dist": ["::pkg*::dist"]},
+        "tasks": {"all": {"actions": [["echo", "::all_dist"]]}},
+    }
+    return write_pyproject(
+        root / "pyproject.toml",
+        {"doit": {"loader": "doitoml"}, "doitoml": config},
+    )
+
+
+def make_package(pkg: Path, idx: int, shape: Shape) -> Path:
+    """Write a single package with a ``src`` tree and a ``pyproject.toml``."""
+    for i in range(shape.tree_dirs):
+        src_dir = pkg / f"src/d{i}"
+        src_dir.mkdir(parents=True, exist_ok=True)
+        for j in range(shape.tree_files):
+            (src_dir / f"f{j}.py").touch()
+    (pkg / "package.json").write_text(
+        json.dumps({"version": f"1.0.{idx}", "scripts": {"build": "tsc"}}),
+        encoding="utf-8",
+    )
+
+    paths: Dict[str, List[str]] = {"dist": ["dist"]}
+    for i in range(shape.rglobs):
+        paths[f"src{i}"] = [f":rglob::src::*{i}.py::!d0/"]
+    tokens = {
+        f"get{i}": [":get::json::package.json::version"] for i in range(shape.gets)
+    }
+    tokens["versions"] = [f"1.0.{idx}", "2.0.0"]
+
+    tasks: Dict[str, Any] = {}
+    for i in range(shape.tasks):
+        others = [(idx - r - 1) % shape.sources for r in range(shape.refs)]
+        tasks[f"t{i}"] = {
+            "actions": [["echo", *[f"::{t}" for t in tokens]]],
+            "file_dep": [f"::{p}" for p in paths if p.startswith("src")],
+            "targets": [f"build/t{i}.txt"],
+            "task_dep": [f"pkg{idx}:t{i - 1}"] if i else [],
+            "clean": [f"::pkg{other}::dist" for other in others],
+        }
+
+    config: Dict[str, Any] = {
+        "prefix": f"pkg{idx}",
+        "paths": paths,
+        "tokens": tokens,
+        "tasks": tasks,
+    }
+    if shape.templates:
+        config["templates"] = make_templates(f"pkg{idx}", shape.templates)
+
+    return write_pyproject(pkg / "pyproject.toml", {"doitoml": config})
+
+
+def make_templates(prefix: str, count: int) -> Dict[str, Any]:
+    """Make ``jinja2`` and ``json-e`` templated tasks."""
+    yaml = JINJA2_TASKS.replace("PREFIX", prefix)
+    return {
+        "jinja2": {
+            "tasks": {
+                f"j{i}": {"yaml": yaml.replace("TASK", f"j{i}")} for i in range(count)
+            },
+        },
+        "json-e": {
+            "tasks": {
+                f"e{i}": {
+                    "$map": "::versions",
+                    "each(v,i)": {
+                        "name": f"e{i}-v${{i}}",
+                        "actions": [["echo", "${v}"]],
+                    },
+                }
+                for i in range(count)
+            },
+        },
+    }
+
+
+def write_pyproject(path: Path, tool: Dict[str, Any]) -> Path:
+    """Write a ``pyproject.toml``."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(tomli_w.dumps({"tool": tool}), encoding="utf-8")
+    return path
+
+
+def main(argv: List[str]) -> int:
+    """Write a synthetic monorepo to a directory."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("root", type=Path)
+    for field, default in Shape._field_defaults.items():
+        parser.add_argument(f"--{field.replace('_', '-')}", type=int, default=default)
+    opts = vars(parser.parse_args(argv))
+    root = opts.pop("root")
+    print(make_monorepo(root, Shape(**opts)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
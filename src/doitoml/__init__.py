@@ -1,5 +1,19 @@
 """Opinionated, declarative tasks for ``doit`` from well-known TOML and JSON files."""
-from ._version import __version__
+from typing import Any
+
 from .doitoml import DoiTOML
 
 __all__ = ["__version__", "DoiTOML"]
+
+#: the version, read from the package metadata when first used
+__version__: str
+
+
+def __getattr__(name: str) -> Any:
+    """Get ``__version__``, only when first used."""
+    if name == "__version__":
+        from . import _version
+
+        return _version.__version__
+    message = f"module {__name__!r} has no attribute {name!r}"
+    raise AttributeError(message)
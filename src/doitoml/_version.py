@@ -1,5 +1,19 @@
+from typing import Any
+
 from .constants import NAME
 
 __all__ = ["__version__"]
 
-__version__: str = __import__("importlib.metadata").metadata.version(NAME)
+#: the version, read from the package metadata when first used
+__version__: str
+
+
+def __getattr__(name: str) -> Any:
+    """Read ``__version__`` from the package metadata, only when first used."""
+    if name == "__version__":
+        from importlib.metadata import version
+
+        value = globals()["__version__"] = version(NAME)
+        return value
+    message = f"module {__name__!r} has no attribute {name!r}"
+    raise AttributeError(message)
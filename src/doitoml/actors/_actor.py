@@ -35,7 +35,10 @@ class Actor:
         source: "ConfigSource",
         action: Dict[str, Any],
     ) -> List[Dict[str, Any]]:
-        """Expand an action dict's tokens at the end of configuration."""
+        """Expand an action dict's tokens at the end of configuration.
+
+        The action is shared with the parsed source, and must not be changed.
+        """
 
     @abc.abstractmethod
     def perform_action(
@@ -34,11 +34,11 @@ class PyActor(Actor):
         args, kwargs = resolve_py_args(
             self.doitoml,
             source,
-            args_kwargs.pop("args", []),
-            args_kwargs.pop("kwargs", {}),
+            args_kwargs.get("args", []),
+            args_kwargs.get("kwargs", {}),
         )
-        args_kwargs.update(args=args, kwargs=kwargs)
-        return [action]
+        new_args_kwargs = {**args_kwargs, "args": args, "kwargs": kwargs}
+        return [{**action, "py": {path_dotted_func: new_args_kwargs}}]
 
     def perform_action(
         self,
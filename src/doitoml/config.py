@@ -1,16 +1,25 @@
 """Handles discovering, loading, and normalizing configuration."""
+import fnmatch
 import json
 import os
-import warnings
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
+from functools import partial
+from hashlib import sha256
 from pathlib import Path
-from pprint import pformat
+from types import MappingProxyType
 from typing import (
     TYPE_CHECKING,
     Any,
+    Callable,
     Dict,
+    Iterable,
+    Iterator,
     List,
+    Mapping,
+    NamedTuple,
     Optional,
+    Set,
     Tuple,
     Type,
     Union,
@@ -19,15 +28,18 @@ from typing import (
 
 from .constants import (
     DEFAULTS,
+    UTF8,
     DOIT_TASK,
     DOITOML_META,
     NAME,
+    REFERENCE,
 )
+from .dsl import PathRef
 from .errors import (
     ActionError,
+    CircularReferenceError,
     ConfigError,
     DoitomlError,
-    MissingDependencyError,
     NoActorError,
     NoConfigError,
     NoTemplaterError,
@@ -37,7 +49,6 @@ from .errors import (
     UnresolvedError,
     UnsafePathError,
 )
-from .schema._v0_schema import DoitomlSchema
 from .sources._config import ConfigParser, ConfigSource
 from .sources._source import Source
 from .types import (
@@ -50,14 +61,22 @@ from .types import (
     PrefixedTaskGenerator,
     PrefixedTasks,
     PrefixedTemplates,
+    Reference,
+    References,
     Strings,
     Task,
+    TaskMetadata,
 )
-from .utils.json import to_json
-from .utils.path import normalize_path
+from .tasks import TaskRecord
+from .utils.json import DoitomlEncoder, freeze
+from .utils.path import SafePaths
 
 if TYPE_CHECKING:
+    import re
+
     from .doitoml import DoiTOML
+    from .dsl import DSL
+    from .schema._v0_schema import DoitomlSchema
 
 
 Parsers = Dict[str, Type[Source]]
@@ -66,9 +85,60 @@ ConfigParsers = Dict[Tuple[str], Type[ConfigSource]]
 
 ConfigSources = Dict[str, ConfigSource]
 EnvDict = Dict[str, str]
+PendingTasks = Dict[Tuple[str, ...], Tuple[ConfigSource, Task]]
+#: get the paths of a ``file_dep`` or ``targets`` of a task, if they can be found
+TaskPathGetter = Callable[
+    [Tuple[str, ...], Mapping[str, Any], str],
+    Optional[Strings],
+]
+#: the tasks which make each path
+TargetIndex = Dict[str, List[Tuple[str, ...]]]
+
+
+class ReferenceNode(NamedTuple):
+
+    """A named value, the source that declared it, and the values it references."""
+
+    source: ConfigSource
+    value: Any
+    references: References
+
+
+ReferenceGraph = Dict[Reference, ReferenceNode]
+
+#: the most threads used to read and parse config sources at once
+SOURCE_THREADS = 8
+
+
+class SourceNode(NamedTuple):
+
+    """A config source, the resolved paths of its extra sources, or an error."""
+
+    source: ConfigSource
+    children: Strings
+    #: raised when the source is reached, as if read one-by-one
+    error: Optional[Exception]
 
 
-RETRIES = 11
+SourceGraph = Dict[str, SourceNode]
+
+
+class ContextCache(NamedTuple):
+
+    """The normalized config data, and the inputs it was built from."""
+
+    #: the ``env``, ``tokens``, ``paths``, ``templates`` and ``tasks``
+    inputs: Tuple[Dict[Any, Any], ...]
+    #: the size of each of the ``inputs``
+    sizes: Tuple[int, ...]
+    #: a copy of ``os.environ``
+    environ: Dict[str, str]
+    #: the data, as JSON
+    text: str
+    #: the data
+    data: Dict[str, Any]
+    #: hashes of some, or all, of the top-level keys of the data
+    digests: Dict[Tuple[str, ...], str]
 
 
 class Config:
@@ -85,9 +155,23 @@ class Config:
     tokens: PrefixedStrings
     update_env: Optional[bool]
     fail_quietly: Optional[bool]
-    discover_config_paths: Optional[bool]
+    #: ``False`` to not discover sources, or ``tree`` to find them in every directory
+    discover_config_paths: Optional[Union[bool, str]]
     validate: Optional[bool]
     safe_paths: List[str]
+    #: a fast check of ``safe_paths``, rebuilt if they change
+    _safe_paths: SafePaths
+    lazy_tasks: Optional[bool]
+    #: tasks found, but not yet resolved, when ``lazy_tasks``
+    pending_tasks: PendingTasks
+    #: ``doit`` selectors, naming the only tasks to load sources for
+    selectors: Strings
+    #: the only named values to resolve, if only some sources are loaded
+    needed_references: Optional[Set[Reference]]
+    #: working directories, shared by all the tasks that use them
+    _cwds: Dict[str, Path]
+    #: the normalized config data, until its inputs change
+    _context: Optional[ContextCache]
 
     def __init__(  # noqa: PLR0913
         self,
@@ -96,9 +180,11 @@ class Config:
         *,
         update_env: Optional[bool] = None,
         fail_quietly: Optional[bool] = None,
-        discover_config_paths: Optional[bool] = None,
+        discover_config_paths: Optional[Union[bool, str]] = None,
         validate: Optional[bool] = None,
         safe_paths: Optional[List[str]] = None,
+        lazy_tasks: Optional[bool] = None,
+        selectors: Optional[Strings] = None,
     ) -> None:
         """Create empty configuration and discover sources."""
         self.validate = validate
@@ -113,99 +199,146 @@ class Config:
         self.update_env = update_env
         self.fail_quietly = fail_quietly
         self.discover_config_paths = discover_config_paths
-        self.safe_paths = [normalize_path(p) for p in safe_paths or []]
-
-    def to_dict(self) -> DoitomlSchema:
+        self.safe_paths = [doitoml.path_cache.normalize(p) for p in safe_paths or []]
+        self._safe_paths = SafePaths(self.safe_paths)
+        self.selectors = [*(selectors or [])]
+        # only the selected tasks can be resolved from some sources
+        self.lazy_tasks = True if self.selectors else lazy_tasks
+        self.pending_tasks = {}
+        self.needed_references = None
+        self._cwds = {}
+        self._context = None
+
+    def to_dict(self) -> "DoitomlSchema":
         """Return a normalized subset of config data."""
-        env = dict(**self.env)
-        env.update(os.environ)
+        return cast("DoitomlSchema", json.loads(self.get_context_cache().text))
+
+    def get_context(self) -> Mapping[str, Any]:
+        """Get a read-only view of the normalized config data, e.g. for templates.
 
-        as_dict: DoitomlSchema = to_json(
+        Unlike ``to_dict``, the same data is shared by every caller: nested objects
+        and arrays are read-only too, and raise ``TypeError`` if changed.
+        """
+        return MappingProxyType(self.get_context_cache().data)
+
+    def get_context_cache(self) -> ContextCache:
+        """Get the normalized config data, only building it again if stale.
+
+        The data is stale if ``os.environ`` changes, or if ``env``, ``tokens``,
+        ``paths``, ``templates``, or ``tasks`` are replaced or change size: call
+        ``forget_context`` after changing any of their values in place.
+        """
+        inputs: Tuple[Dict[Any, Any], ...] = (
+            self.env,
+            self.tokens,
+            self.paths,
+            self.templates,
+            self.tasks,
+        )
+        sizes = tuple(map(len, inputs))
+        cached = self._context
+        if (
+            cached is not None
+            and cached.sizes == sizes
+            and all(old is new for old, new in zip(cached.inputs, inputs))
+            and cached.environ == os.environ
+        ):
+            return cached
+
+        environ = dict(os.environ)
+        text = json.dumps(
             {
-                "env": env,
+                "env": {**self.env, **environ},
                 "tokens": {":".join(k): v for k, v in self.tokens.items()},
                 "paths": {":".join(k): v for k, v in self.paths.items()},
                 "templates": self.templates,
                 "tasks": {":".join(k): v for k, v in self.tasks.items()},
             },
+            cls=DoitomlEncoder,
+            sort_keys=True,
         )
-
-        return as_dict
+        data = freeze(json.loads(text))
+        self._context = ContextCache(inputs, sizes, environ, text, data, {})
+        return self._context
+
+    def get_context_digest(self, keys: Optional[Iterable[str]] = None) -> str:
+        """Hash some, or all, of the top-level keys of the normalized config data."""
+        cached = self.get_context_cache()
+        slot = tuple(sorted(cached.data if keys is None else set(keys)))
+        digest = cached.digests.get(slot)
+        if digest is None:
+            subset = {key: cached.data[key] for key in slot if key in cached.data}
+            text = cached.text if keys is None else json.dumps(subset, sort_keys=True)
+            digest = cached.digests[slot] = sha256(text.encode(UTF8)).hexdigest()
+        return digest
+
+    def forget_context(self) -> None:
+        """Build the normalized config data again when next needed."""
+        self._context = None
 
     def initialize(self) -> None:
-        """Perform a few passes to configure everything."""
-        self.sources = self.find_config_sources()
+        """Perform a few passes to configure everything, unless already cached."""
+        config_cache = self.doitoml.config_cache
+        phase = self.doitoml.timings.phase
+
+        with phase("config_cache.load"):
+            if config_cache.load(self):
+                return
+
+        with phase("find_config_sources"):
+            self.sources = self.find_config_sources()
         # load top-level config values from the first config
         top_config = [*self.sources.values()][0]
         for key in DEFAULTS.ALL_FROM_FIRST_CONFIG:
             if getattr(self, key, None) is None:
                 setattr(self, key, top_config.raw_config.get(key, True))
 
-        unresolved_env: EnvDict = {}
-        unresolved_paths: PrefixedStrings = {}
-        unresolved_tokens: PrefixedStrings = {}
-        retry = RETRIES
+        # ... then only keep the sources the selected tasks need
+        if self.selectors:
+            with phase("find_needed_sources"):
+                self.find_needed_sources()
 
-        # .. allow some retries for cross (but not circular) references
-        while retry:
-            retry -= 1
-            try:
-                unresolved_env = self.init_env(unresolved_env, RETRIES)
-                unresolved_paths = self.init_paths(unresolved_paths, RETRIES)
-                unresolved_tokens = self.init_tokens(unresolved_tokens, RETRIES)
-            except UnresolvedError:  # pragma: no cover
-                pass
-            if not any([unresolved_env, unresolved_paths, unresolved_tokens]):
-                break
-
-        if not retry:
-            message = [f"Gave up after {RETRIES} retries!"]
-            if unresolved_env:
-                message += [
-                    f"Failed to resolve environment variables: "
-                    f"{pformat(unresolved_env)}",
-                ]
-
-            if unresolved_paths:
-                message += [f"Failed to resolve paths: {pformat(unresolved_paths)}"]
-
-            if unresolved_tokens:
-                message += [
-                    f"Failed to resolve tokens: {pformat(unresolved_tokens)}",
-                ]
-
-            raise UnresolvedError("\n".join(message))
+        # ... then env, paths, and tokens, in the order they reference one another
+        with phase("init_references"):
+            self.init_references()
 
         # ... then templates
-        self.init_templates()
+        with phase("init_templates"):
+            self.init_templates()
 
         # ... then find the tasks
-        self.init_tasks()
+        with phase("init_tasks"):
+            self.init_tasks()
+
+        with phase("render_cache.save"):
+            self.doitoml.render_cache.save()
 
         self.maybe_validate()
 
+        if not self.pending_tasks:
+            with phase("config_cache.save"):
+                config_cache.save(self)
+
     def maybe_validate(self) -> None:
-        """Validate if requested, or."""
+        """Validate if requested, skipping parts already known to be valid."""
         if self.validate is False:
             return
 
-        try:
-            from .schema.validator import latest
-
-            has_jsonschema = True
-            jsonschema_error = None
-        except MissingDependencyError as err:
-            has_jsonschema = False
-            jsonschema_error = str(err)
+        validation_cache = self.doitoml.validation_cache
+        with self.doitoml.timings.phase("validation_cache.load"):
+            unvalidated = validation_cache.unvalidated(self.get_context())
 
-        if not has_jsonschema:  # pragma: no cover
-            message = (
-                f"Validation was requested, but cannot validate: {jsonschema_error}"
-            )
-            warnings.warn(message, stacklevel=1)
+        if not unvalidated:
             return
 
-        latest.validate(self.to_dict())
+        from .schema.validator import latest
+
+        with self.doitoml.timings.phase("maybe_validate"):
+            latest.validate(*unvalidated.values())
+
+        validation_cache.add({*unvalidated})
+        with self.doitoml.timings.phase("validation_cache.save"):
+            validation_cache.save()
 
     def find_config_sources(self) -> ConfigSources:
         """Find all directly and referenced configuration sources."""
@@ -217,18 +350,24 @@ class Config:
 
         if not unchecked_paths:
             path = self.doitoml.cwd / DEFAULTS.CONFIG_PATH
-            if path.exists():
+            if self.path_exists(path):
                 unchecked_paths += [path]
 
         if unchecked_paths and not self.safe_paths:
-            self.safe_paths = [normalize_path(unchecked_paths[0].parent)]
+            normalize = self.doitoml.path_cache.normalize
+            self.safe_paths = [normalize(unchecked_paths[0].parent)]
 
-        while unchecked_paths:
-            config_path = unchecked_paths.pop(0)
-            config_source = self.load_config_source(
-                Path(self.check_safe_path(config_path)),
-            )
-            self.find_one_config_source(config_source, config_sources)
+        roots = [
+            self.load_config_source(Path(self.check_safe_path(config_path)))
+            for config_path in unchecked_paths
+        ]
+        graph = self.build_source_graph(roots)
+        resolve = self.doitoml.path_cache.resolve
+
+        for node in self.sort_source_graph(graph, [resolve(r.path) for r in roots]):
+            if node.error is not None:
+                raise node.error
+            self.claim_prefix(node.source, config_sources)
 
         if not config_sources:
             message = "No ``doitoml`` config found"
@@ -236,33 +375,107 @@ class Config:
 
         return config_sources
 
-    def find_one_config_source(
+    def build_source_graph(self, roots: List[ConfigSource]) -> SourceGraph:
+        """Find all config sources breadth-first, reading each level in threads.
+
+        Each resolved path is only used once: a source with no ``doitoml`` config
+        is left out, unless another source of the same path has some. Errors are
+        kept in the graph, to be raised in the same order as the sources.
+        """
+        graph: SourceGraph = {}
+        resolve = self.doitoml.path_cache.resolve
+        level = roots
+
+        while level:
+            errors = self.read_config_sources(level)
+            next_level: List[ConfigSource] = []
+            for config_source, error in zip(level, errors):
+                key = resolve(config_source.path)
+                if key in graph:
+                    continue
+                if error is not None:
+                    graph[key] = SourceNode(config_source, [], error)
+                    continue
+                if not config_source.raw_config:
+                    continue
+                child_keys: Strings = []
+                try:
+                    for child in config_source.extra_config_sources(self.doitoml):
+                        child_key = resolve(child.path)
+                        child_keys += [child_key]
+                        if child_key not in graph:
+                            next_level += [child]
+                except Exception as err:  # noqa: BLE001
+                    error_key = f"{key}#{len(child_keys)}"
+                    graph[error_key] = SourceNode(config_source, [], err)
+                    child_keys += [error_key]
+                graph[key] = SourceNode(config_source, child_keys, None)
+            level = next_level
+
+        return graph
+
+    def read_config_sources(
         self,
-        config_source: ConfigSource,
-        sources: ConfigSources,
-    ) -> None:
-        """Discover a config source and its potentially-nested extra sources."""
-        if config_source in sources.values() or not config_source.raw_config:
-            return
+        sources: List[ConfigSource],
+    ) -> List[Optional[Exception]]:
+        """Read and parse some config sources, in threads if there are many."""
+        if len(sources) < 2:  # noqa: PLR2004
+            return [self.read_config_source(source) for source in sources]
+
+        workers = min(len(sources), SOURCE_THREADS)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return [*pool.map(self.read_config_source, sources)]
+
+    def read_config_source(self, source: ConfigSource) -> Optional[Exception]:
+        """Read and parse a config source, returning any error."""
+        try:
+            source.raw_config  # noqa: B018
+        except Exception as err:  # noqa: BLE001
+            return err
+        return None
 
-        self.claim_prefix(config_source, sources)
+    def sort_source_graph(self, graph: SourceGraph, roots: Strings) -> List[SourceNode]:
+        """Order config sources depth-first, as listed, each exactly once.
 
-        for extra_source in config_source.extra_config_sources(self.doitoml):
-            self.find_one_config_source(extra_source, sources)
+        This is the order in which sources claim prefixes and ``env`` variables.
+        """
+        ordered: List[SourceNode] = []
+        visited = set()
+        stack = [*reversed(roots)]
+
+        while stack:
+            key = stack.pop()
+            node = graph.get(key)
+            if node is None or key in visited:
+                continue
+            visited.add(key)
+            ordered += [node]
+            stack += reversed(node.children)
+
+        return ordered
 
     def find_fallback_config_sources(self) -> Paths:
-        """Find sources."""
+        """Find sources in the working directory, or anywhere under it."""
         unchecked = []
 
-        if self.discover_config_paths is not False:
+        if self.discover_config_paths == DEFAULTS.DISCOVER_TREE:
+            with self.doitoml.timings.phase("discover_tree"):
+                unchecked += self.doitoml.tree_discovery.find(self.doitoml.cwd)
+        elif self.discover_config_paths is not False:
             for parser in self.doitoml.entry_points.config_parsers.values():
                 for well_known in parser.well_known:
                     path = self.doitoml.cwd / well_known
-                    if path.exists():
+                    if self.path_exists(path):
                         unchecked += [path]
 
         return unchecked
 
+    def path_exists(self, path: Path) -> bool:
+        """Check whether a path exists, remembering the answer for the config cache."""
+        exists = path.exists()
+        self.doitoml.config_cache.record_exists(str(path), exists)
+        return exists
+
     def claim_prefix(self, source: ConfigSource, sources: ConfigSources) -> None:
         """Claim a prefix for a source."""
         prefix = source.prefix
@@ -286,84 +499,383 @@ class Config:
     def load_config_source(self, config_path: Path) -> ConfigSource:
         """Maybe load a configuration source."""
         config_parser = self.get_config_parser(config_path)
-        return config_parser(config_path)
-
-    def init_env(self, unresolved_env: EnvDict, retries: int) -> EnvDict:
-        """Initialize the global environment variable."""
-        for source in self.sources.values():
-            self.init_source_env(source, unresolved_env)
-
-        while unresolved_env and retries:
-            retries -= 1
-            unresolved_env = self.init_env(unresolved_env, 0)
-
-        return unresolved_env
-
-    def init_source_env(self, source: ConfigSource, unresolved_env: EnvDict) -> None:
-        """Initialize the env declared in a single source."""
-        env = self.env
-        raw_config = source.raw_config
-        for env_key, env_value in raw_config.get("env", {}).items():
-            if env_key in env:
-                self.doitoml.log.info(
-                    "$%s already set to `%s`: not setting with `%s` from %s",
-                    env_key,
-                    env[env_key],
-                    env_value,
-                    source,
-                )
+        registry = self.doitoml.source_registry
+        return cast(ConfigSource, registry.load(config_path, config_parser))
+
+    def init_references(self) -> None:
+        """Resolve all ``env``, ``paths``, and ``tokens``, each exactly once."""
+        graph = self.build_reference_graph()
+        needed = self.needed_references
+        if needed is not None:
+            graph = {ref: node for ref, node in graph.items() if ref in needed}
+        unresolved: Dict[Reference, Any] = {}
+
+        for ref in self.sort_reference_graph(graph):
+            node = graph[ref]
+            if any(dep in unresolved for dep in node.references):
+                unresolved[ref] = node.value
                 continue
+            self.resolve_one_reference(ref, node, unresolved)
 
-            new_key_value = self.resolve_one_env(source, env_value)
+        if unresolved:
+            raise UnresolvedError(self.format_unresolved(unresolved))
+
+    def build_reference_graph(self) -> ReferenceGraph:
+        """Find all named values in all sources, and the values they reference."""
+        graph: ReferenceGraph = {}
+        sources = [*self.sources.values()]
+
+        for source in sources:
+            for env_key, env_value in source.raw_config.get(REFERENCE.ENV, {}).items():
+                ref = (REFERENCE.ENV, "", env_key)
+                claimed_by = graph.get(ref)
+                if claimed_by is not None:
+                    self.doitoml.log.info(
+                        "$%s already set to `%s` by %s: not setting with `%s` from %s",
+                        env_key,
+                        claimed_by.value,
+                        claimed_by.source,
+                        env_value,
+                        source,
+                    )
+                    continue
+                graph[ref] = ReferenceNode(source, env_value, [])
+
+        for kind in [REFERENCE.PATHS, REFERENCE.TOKENS]:
+            for source in sources:
+                for key, specs in source.raw_config.get(kind, {}).items():
+                    graph[kind, source.prefix, key] = ReferenceNode(source, specs, [])
+
+        for ref, node in graph.items():
+            specs = [node.value] if ref[0] == REFERENCE.ENV else node.value
+            for spec in specs:
+                node.references.extend(
+                    dep
+                    for dep in self.find_spec_references(node.source, str(spec))
+                    if dep != ref and dep in graph
+                )
 
-            if new_key_value is None:
-                unresolved_env[env_key] = env_value
-            else:
-                env[env_key] = new_key_value
-                unresolved_env.pop(env_key, None)
+        return graph
 
-    def resolve_one_env(self, source: ConfigSource, env_value: Any) -> Optional[str]:
-        """Resolve a single env member."""
-        new_value = str(env_value)
-        for dsl in self.doitoml.entry_points.dsl.values():
-            match = dsl.pattern.search(new_value)
-            if match is not None:
-                try:
-                    resolved = dsl.transform_token(
-                        source,
-                        match,
-                        new_value or env_value,
+    def find_needed_sources(self) -> None:
+        """Only keep the sources, and named values, needed by the selected tasks.
+
+        The tasks named by ``selectors``, their ``task_dep`` and ``setup``, and the
+        tasks with ``targets`` in their ``file_dep``, are found in the raw config of
+        every source, then the values they reference. Any task may use any ``env``,
+        so the sources declaring it are always kept. Each source kept also needs
+        the values its ``skip`` use. All sources are kept if any has ``templates``,
+        which can see everything, if any selector names no known task, or if the
+        paths of a ``file_dep``, or any ``targets``, can't be found before resolving
+        named values.
+        """
+        raw_tasks: PendingTasks = {}
+        for prefix, source in self.sources.items():
+            raw_config = source.raw_config
+            if raw_config.get("templates"):
+                return
+            raw_tasks.update(
+                (prefixes, (source, task))
+                for prefixes, task in self.find_raw_tasks(
+                    (prefix,),
+                    raw_config.get("tasks", {}),
+                )
+                if task.get(DOIT_TASK.ACTIONS)
+            )
+
+        graph = self.build_reference_graph()
+        selected = self.select_tasks(
+            self.selectors,
+            {prefixes: task for prefixes, (_, task) in raw_tasks.items()},
+            get_paths=partial(self.get_raw_task_paths, graph, raw_tasks),
+        )
+        if selected is None:
+            return
+
+        unchecked_prefixes = [next(iter(self.sources))]
+        unchecked: References = [ref for ref in graph if ref[0] == REFERENCE.ENV]
+        for prefixes in selected:
+            source, task = raw_tasks[prefixes]
+            unchecked_prefixes += [source.prefix]
+            unchecked += self.find_value_references(source, task)
+
+        needed_prefixes: Set[str] = set()
+        needed: Set[Reference] = set()
+        while unchecked_prefixes or unchecked:
+            if unchecked_prefixes:
+                prefix = unchecked_prefixes.pop()
+                if prefix not in needed_prefixes:
+                    needed_prefixes.add(prefix)
+                    unchecked += self.find_source_references(self.sources[prefix])
+                continue
+            ref = unchecked.pop()
+            if ref in needed or ref not in graph:
+                continue
+            needed.add(ref)
+            node = graph[ref]
+            unchecked_prefixes += [node.source.prefix]
+            unchecked += node.references
+
+        self.doitoml.log.debug(
+            "Loading %s of %s sources for %s",
+            len(needed_prefixes),
+            len(self.sources),
+            self.selectors,
+        )
+        self.sources = {
+            prefix: source
+            for prefix, source in self.sources.items()
+            if prefix in needed_prefixes
+        }
+        self.needed_references = needed
+        self.doitoml.config_cache.uncacheable("only some sources were loaded")
+
+    def get_raw_task_paths(
+        self,
+        graph: ReferenceGraph,
+        raw_tasks: PendingTasks,
+        prefixes: Tuple[str, ...],
+        task: Mapping[str, Any],
+        field: str,
+    ) -> Optional[Strings]:
+        """Get the normalized paths of a field of a raw task, if they can be found."""
+        source = raw_tasks[prefixes][0]
+        paths = self.find_raw_paths(graph, source, task.get(field, []))
+        if paths is None:
+            return None
+        return [self.doitoml.path_cache.normalize(path) for path in paths]
+
+    def find_raw_paths(
+        self,
+        graph: ReferenceGraph,
+        source: ConfigSource,
+        specs: List[Any],
+        seen: Tuple[Reference, ...] = (),
+    ) -> Optional[Strings]:
+        """Find the paths of raw path specs, without resolving any named values.
+
+        Only plain paths, and references to ``paths`` of plain paths, can be found:
+        any other token, or an unknown or circular reference, gives ``None``.
+        """
+        paths: Strings = []
+        for spec in map(str, specs):
+            found = [spec]
+            dsl_match = self.match_one_dsl(spec)
+            if dsl_match is not None:
+                dsl, match = dsl_match
+                if not isinstance(dsl, PathRef):
+                    return None
+                found = []
+                for ref in dsl.get_references(source, match, spec):
+                    node = graph.get(ref)
+                    if node is None:
+                        continue
+                    if ref[0] != REFERENCE.PATHS or ref in seen:
+                        return None
+                    ref_paths = self.find_raw_paths(
+                        graph,
+                        node.source,
+                        node.value,
+                        (*seen, ref),
                     )
-                    if resolved is None:  # pragma: no cover
+                    if ref_paths is None:
                         return None
-                    return str(resolved[0])
-                except DoitomlError:
+                    found += ref_paths
+                if not found:
                     return None
-        return new_value
+            try:
+                paths += [self.resolve_safe_path(source.path.parent, p) for p in found]
+            except DoitomlError:
+                return None
+        return paths
 
-    def init_paths(
+    def find_raw_tasks(
         self,
-        unresolved_paths: PrefixedStrings,
-        retries: int,
-    ) -> PrefixedStrings:
-        """Find all paths in all sources."""
-        for source in self.sources.values():
-            self.init_source_paths(source, unresolved_paths)
-
-        while unresolved_paths and retries:
-            retries -= 1
-            unresolved_paths = self.init_paths(
-                unresolved_paths,
-                0,
+        prefixes: Tuple[str, ...],
+        task_or_group: Any,
+    ) -> Iterator[Tuple[Tuple[str, ...], Task]]:
+        """Find a raw task, or a task group and all the tasks and groups in it."""
+        if not isinstance(task_or_group, dict):
+            return
+        yield prefixes, cast(Task, task_or_group)
+        if task_or_group.get(DOIT_TASK.ACTIONS):
+            return
+        for subtask_prefix, subtask_or_group in task_or_group.items():
+            yield from self.find_raw_tasks(
+                (*prefixes, subtask_prefix),
+                subtask_or_group,
             )
 
-        return unresolved_paths
+    def find_source_references(self, source: ConfigSource) -> References:
+        """Find the named values needed to load a source: its ``env`` and skips."""
+        refs: References = [
+            (REFERENCE.ENV, "", env_key)
+            for env_key in source.raw_config.get(REFERENCE.ENV, {})
+        ]
+        raw_tasks = source.raw_config.get("tasks", {})
+        for _, task in self.find_raw_tasks((source.prefix,), raw_tasks):
+            meta = task.get(DOIT_TASK.META)
+            dt_meta = meta.get(NAME) if isinstance(meta, dict) else None
+            if isinstance(dt_meta, dict):
+                skip = dt_meta.get(DOITOML_META.SKIP)
+                refs += self.find_value_references(source, skip)
+        return refs
+
+    def find_value_references(self, source: ConfigSource, value: Any) -> References:
+        """Find the named values referenced by any spec in a raw value."""
+        if isinstance(value, str):
+            return self.find_spec_references(source, value)
+        values: Iterable[Any] = []
+        if isinstance(value, dict):
+            values = value.values()
+        elif isinstance(value, list):
+            values = value
+        refs: References = []
+        for item in values:
+            refs += self.find_value_references(source, item)
+        return refs
+
+    def find_spec_references(self, source: ConfigSource, spec: str) -> References:
+        """Find the named values a single spec references."""
+        dsl_match = self.match_one_dsl(spec)
+        if dsl_match is None:
+            return []
+        dsl, match = dsl_match
+        return dsl.get_references(source, match, spec)
+
+    def sort_reference_graph(self, graph: ReferenceGraph) -> References:
+        """Order named values so each comes after all the values it references."""
+        ordered: References = []
+        # ``False`` while a value's references are being visited, then ``True``
+        visited: Dict[Reference, bool] = {}
+
+        for root in graph:
+            if root in visited:
+                continue
+            visited[root] = False
+            stack = [(root, iter(graph[root].references))]
+            while stack:
+                ref, deps = stack[-1]
+                for dep in deps:
+                    dep_visited = visited.get(dep)
+                    if dep_visited is None:
+                        visited[dep] = False
+                        stack += [(dep, iter(graph[dep].references))]
+                        break
+                    if dep_visited is False:
+                        cycle = [r for r, _ in stack]
+                        cycle = [*cycle[cycle.index(dep) :], dep]
+                        message = "Circular reference: " + " -> ".join(
+                            self.format_reference(r) for r in cycle
+                        )
+                        raise CircularReferenceError(message)
+                else:
+                    stack.pop()
+                    visited[ref] = True
+                    ordered += [ref]
+
+        return ordered
+
+    def resolve_one_reference(
+        self,
+        ref: Reference,
+        node: ReferenceNode,
+        unresolved: Dict[Reference, Any],
+    ) -> None:
+        """Resolve a single named value, after all the values it references."""
+        kind, prefix, key = ref
+
+        if kind == REFERENCE.ENV:
+            new_key_value = self.resolve_one_env(node.source, node.value)
+            if new_key_value is None:
+                unresolved[ref] = node.value
+            else:
+                self.env[key] = new_key_value
+            return
+
+        found, unresolved_specs = self.resolve_some_path_specs(
+            node.source,
+            node.value,
+            source_relative=kind == REFERENCE.PATHS,
+        )
+
+        if unresolved_specs:
+            unresolved[ref] = unresolved_specs
+        elif kind == REFERENCE.PATHS:
+            normalize = self.doitoml.path_cache.normalize
+            self.paths[prefix, key] = sorted({normalize(p) for p in found})
+        else:
+            self.tokens[prefix, key] = found
+
+    def format_reference(self, ref: Reference) -> str:
+        """Format a named value for errors, as it would be referenced."""
+        kind, prefix, key = ref
+        if kind == REFERENCE.ENV:
+            return f"${{{key}}}"
+        name = f"::{prefix}::{key}" if prefix else f"::{key}"
+        return f"{kind} {name}"
+
+    def format_unresolved(self, unresolved: Dict[Reference, Any]) -> str:
+        """Format all unresolved values for errors."""
+        by_kind: Dict[str, Dict[Any, Any]] = {}
+        for (kind, prefix, key), value in unresolved.items():
+            by_kind.setdefault(kind, {})[
+                key if kind == REFERENCE.ENV else (prefix, key)
+            ] = value
+
+        from pprint import pformat
+
+        titles = {
+            REFERENCE.ENV: "environment variables",
+            REFERENCE.PATHS: "paths",
+            REFERENCE.TOKENS: "tokens",
+        }
+
+        return "\n".join(
+            f"Failed to resolve {title}: {pformat(by_kind[kind])}"
+            for kind, title in titles.items()
+            if kind in by_kind
+        )
+
+    def match_one_dsl(self, spec: str) -> Optional[Tuple["DSL", "re.Match[str]"]]:
+        """Find the first DSL, by rank, that matches a spec."""
+        return self.doitoml.entry_points.dsl_index.match(spec)
+
+    def resolve_one_env(self, source: ConfigSource, env_value: Any) -> Optional[str]:
+        """Resolve a single env member."""
+        new_value = str(env_value)
+        dsl_match = self.match_one_dsl(new_value)
+        if dsl_match is None:
+            return new_value
+        dsl, match = dsl_match
+        try:
+            resolved = self.transform_token(dsl, source, match, new_value or env_value)
+        except DoitomlError:
+            return None
+        if resolved is None:  # pragma: no cover
+            return None
+        return str(resolved[0])
+
+    def transform_token(
+        self,
+        dsl: "DSL",
+        source: ConfigSource,
+        match: "re.Match[str]",
+        raw_token: str,
+    ) -> Strings:
+        """Transform a token with a DSL, recording the time it took."""
+        timings = self.doitoml.timings
+        with timings.timer(timings.dsl, type(dsl).__name__, raw_token):
+            return dsl.transform_token(source, match, raw_token)
 
     def check_safe_path(self, path: PathOrString) -> str:
         """Check if some paths are safe."""
-        norm_path = normalize_path(path)
+        norm_path = self.doitoml.path_cache.normalize(path)
 
-        if any(norm_path.startswith(safe) for safe in self.safe_paths):
+        if self._safe_paths.prefixes != tuple(self.safe_paths):
+            self._safe_paths = SafePaths(self.safe_paths)
+
+        if norm_path in self._safe_paths:
             return str(path)
 
         nl = "\n  - "
@@ -374,67 +886,11 @@ class Config:
         )
         raise UnsafePathError(message)
 
-    def init_tokens(
-        self,
-        unresolved_tokens: PrefixedStrings,
-        retries: int,
-    ) -> PrefixedStrings:
-        """Find all commands in all sources."""
-        for source in self.sources.values():
-            self.init_source_tokens(source, unresolved_tokens)
-
-        while unresolved_tokens and retries:
-            retries -= 1
-            unresolved_tokens = self.init_tokens(
-                unresolved_tokens,
-                0,
-            )
-
-        return unresolved_tokens
-
-    def init_source_paths(
-        self,
-        source: ConfigSource,
-        unresolved_paths: PrefixedStrings,
-    ) -> None:
-        """Find the prefixed paths declared in a single source."""
-        raw_config = source.raw_config
-        path_key: str
-        for path_key, path_specs in raw_config.get("paths", {}).items():
-            found_paths, unresolved_specs = self.resolve_some_path_specs(
-                source,
-                path_specs,
-                source_relative=True,
-            )
-
-            if unresolved_specs:
-                unresolved_paths[source.prefix, path_key] = unresolved_specs
-                continue
-            self.paths[source.prefix, path_key] = sorted(
-                {normalize_path(p) for p in found_paths},
-            )
-            unresolved_paths.pop((source.prefix, path_key), None)
-
-    def init_source_tokens(
-        self,
-        source: ConfigSource,
-        unresolved_tokens: PrefixedStrings,
-    ) -> None:
-        """Find the prefixed paths declared in a single source."""
-        raw_config = source.raw_config
-        path_key: str
-        for path_key, path_specs in raw_config.get(DEFAULTS.TOKENS, {}).items():
-            found_tokens, unresolved_specs = self.resolve_some_path_specs(
-                source,
-                path_specs,
-                source_relative=False,
-            )
-
-            if unresolved_specs:
-                unresolved_tokens[source.prefix, path_key] = unresolved_specs
-                continue
-            self.tokens[source.prefix, path_key] = found_tokens
-            unresolved_tokens.pop((source.prefix, path_key), None)
+    def resolve_safe_path(self, cwd: Path, path: PathOrString) -> str:
+        """Resolve a path relative to a directory, and check that it is safe."""
+        return self.check_safe_path(
+            self.doitoml.path_cache.resolve(os.path.join(cwd, path)),  # noqa: PTH118
+        )
 
     def resolve_one_path_spec(
         self,
@@ -450,21 +906,20 @@ class Config:
         cwd = cwd or source.path.parent
 
         resolved = []
-        for dsl in self.doitoml.entry_points.dsl.values():
-            match = dsl.pattern.search(spec)
-            if match is not None:
-                resolved = dsl.transform_token(source, match, spec)
-                if resolved is None:
-                    return None
-                break
+        dsl_match = self.match_one_dsl(spec)
+        if dsl_match is not None:
+            dsl, match = dsl_match
+            resolved = self.transform_token(dsl, source, match, spec)
+            if resolved is None:
+                return None
 
         if resolved:
             if source_relative:
-                return [self.check_safe_path((cwd / r).resolve()) for r in resolved]
+                return [self.resolve_safe_path(cwd, r) for r in resolved]
             return resolved
 
         if source_relative:
-            return [self.check_safe_path((cwd / spec).resolve())]
+            return [self.resolve_safe_path(cwd, spec)]
 
         return [spec]
 
@@ -477,47 +932,65 @@ class Config:
 
     def init_tasks(self) -> None:
         """Initialize all intermediate task representations."""
+        timings = self.doitoml.timings
         for prefix, source in self.sources.items():
-            raw_tasks = deepcopy(source.raw_config.get("tasks", {}))
-
-            if prefix in self.templates:
-                raw_templates = self.templates[prefix]
-                templaters = self.doitoml.entry_points.templaters
-                for templater_name, templater_kinds in raw_templates.items():
-                    templater = templaters.get(templater_name)
-                    if templater is None:
-                        message = (
-                            f"Templater {templater_name} not one of "
-                            f"""{", ".join(templaters.keys())}"""
-                        )
-                        raise NoTemplaterError(message)
-                    templater_tasks = deepcopy(templater_kinds.get("tasks", {}))
+            with timings.timer(timings.sources, prefix, str(source.path)):
+                self.init_one_source_tasks(prefix, source)
+
+    def init_one_source_tasks(self, prefix: str, source: ConfigSource) -> None:
+        """Initialize the tasks of a single source."""
+        timings = self.doitoml.timings
+        # only the top level is copied: tasks are never changed while resolved
+        raw_tasks = source.raw_config.get("tasks", {})
+
+        if prefix in self.templates:
+            raw_tasks = dict(raw_tasks)
+            # templates can see all environment variables
+            self.doitoml.config_cache.record_environ()
+            raw_templates = self.templates[prefix]
+            templaters = self.doitoml.entry_points.templaters
+            render_cache = self.doitoml.render_cache
+            for templater_name, templater_kinds in raw_templates.items():
+                templater = templaters.get(templater_name)
+                if templater is None:
+                    message = (
+                        f"Templater {templater_name} not one of "
+                        f"""{", ".join(templaters.keys())}"""
+                    )
+                    raise NoTemplaterError(message)
+                templater_tasks = deepcopy(templater_kinds.get("tasks", {}))
 
-                    if not isinstance(templater_tasks, dict):
-                        message = (
-                            f"Expected dictionary of tasks in {source}, found: "
-                            f"{templater_tasks}"
+                if not isinstance(templater_tasks, dict):
+                    message = (
+                        f"Expected dictionary of tasks in {source}, found: "
+                        f"{templater_tasks}"
+                    )
+                    raise TemplaterError(message)
+                for task_name, task in templater_tasks.items():
+                    with timings.timer(timings.templaters, templater_name, task_name):
+                        templated = render_cache.transform_task(
+                            templater_name,
+                            templater,
+                            source,
+                            task,
                         )
-                        raise TemplaterError(message)
-                    for task_name, task in templater_tasks.items():
-                        templated = templater.transform_task(source, task)
-                        if isinstance(templated, dict):
-                            raw_tasks[task_name] = templated
-                        else:
-                            raw_tasks[task_name] = {t["name"]: t for t in templated}
-
-            for task_prefix, task in self.resolve_one_task_or_group(
-                source,
-                (prefix,),
-                raw_tasks,
-            ):
-                claimed_prefix = self.tasks.get(task_prefix)
-                if claimed_prefix:  # pragma: no cover
-                    # not sure how we'd get here
-                    pfx = ":".join(task_prefix)
-                    message = f"""{source} cannot claim {pfx}: {claimed_prefix}"""
-                    raise ConfigError(message)
-                self.tasks[task_prefix] = task
+                    if isinstance(templated, dict):
+                        raw_tasks[task_name] = templated
+                    else:
+                        raw_tasks[task_name] = {t["name"]: t for t in templated}
+
+        for task_prefix, task in self.resolve_one_task_or_group(
+            source,
+            (prefix,),
+            raw_tasks,
+        ):
+            claimed_prefix = self.tasks.get(task_prefix)
+            if claimed_prefix:  # pragma: no cover
+                # not sure how we'd get here
+                pfx = ":".join(task_prefix)
+                message = f"""{source} cannot claim {pfx}: {claimed_prefix}"""
+                raise ConfigError(message)
+            self.tasks[task_prefix] = task
 
     def resolve_one_task_or_group(
         self,
@@ -545,6 +1018,9 @@ class Config:
 
         if maybe_old_actions:
             task = cast(Task, task_or_group)
+            if self.lazy_tasks:
+                self.pending_tasks[prefixes] = (source, task)
+                return
             yield from self.resolve_one_task(source, prefixes, task)
             return
 
@@ -556,6 +1032,176 @@ class Config:
                 subtask_or_group,
             )
 
+    def resolve_pending_tasks(self, selectors: Optional[Strings] = None) -> None:
+        """Resolve pending tasks named by ``doit`` selectors, or all of them."""
+        if not self.pending_tasks:
+            return
+
+        timings = self.doitoml.timings
+        if self.needed_references is not None:
+            # the loaded sources may not resolve any other tasks
+            selected = self.select_tasks(self.selectors, strict=False)
+        else:
+            selected = self.select_tasks(selectors) if selectors else None
+        for prefixes in [*self.pending_tasks]:
+            if selected is not None and prefixes not in selected:
+                continue
+            source, task = self.pending_tasks.pop(prefixes)
+            with timings.timer(timings.sources, source.prefix, ":".join(prefixes)):
+                for task_prefix, new_task in self.resolve_one_task(
+                    source,
+                    prefixes,
+                    task,
+                ):
+                    self.tasks[task_prefix] = new_task
+
+        self.maybe_validate()
+
+        if not self.pending_tasks:
+            with self.doitoml.timings.phase("config_cache.save"):
+                self.doitoml.config_cache.save(self)
+
+    def select_tasks(
+        self,
+        selectors: Strings,
+        tasks: Optional[Mapping[Tuple[str, ...], Mapping[str, Any]]] = None,
+        *,
+        strict: bool = True,
+        get_paths: Optional[TaskPathGetter] = None,
+    ) -> Optional[List[Tuple[str, ...]]]:
+        """Find tasks named by ``doit`` selectors, following their dependencies.
+
+        As in ``doit``, a task depends on the tasks named in its ``task_dep`` and
+        ``setup``, and on the tasks with ``targets`` in its ``file_dep``.
+
+        Return ``None`` if any selector or dependency names no known task, as
+        it may come from elsewhere, e.g. a ``dodo.py``, and need any task, or if
+        the paths of a ``file_dep`` or ``targets`` can't be found, unless not
+        ``strict``. By default, the resolved and pending tasks are known, and
+        their paths are found with ``get_task_paths``.
+        """
+        if tasks is None:
+            pending = {
+                prefixes: task for prefixes, (_, task) in self.pending_tasks.items()
+            }
+            tasks = {**self.tasks, **pending}
+        get_paths = get_paths or self.get_task_paths
+        names = {prefixes: self.get_task_names(prefixes) for prefixes in tasks}
+        targets: Optional[TargetIndex] = None
+        selected: List[Tuple[str, ...]] = []
+        unchecked = [*selectors]
+        checked = set()
+
+        while unchecked:
+            selector = unchecked.pop(0)
+            if selector in checked:
+                continue
+            checked.add(selector)
+            matched = [
+                prefixes
+                for prefixes, task_names in names.items()
+                if any(fnmatch.fnmatch(name, selector) for name in task_names)
+            ]
+            if not matched and strict:
+                return None
+            for prefixes in matched:
+                if prefixes in selected:
+                    continue
+                selected += [prefixes]
+                deps, targets = self.find_task_dependencies(
+                    prefixes,
+                    tasks,
+                    get_paths,
+                    targets,
+                    strict=strict,
+                )
+                if deps is None:
+                    return None
+                unchecked += deps
+
+        return selected
+
+    def find_task_dependencies(
+        self,
+        prefixes: Tuple[str, ...],
+        tasks: Mapping[Tuple[str, ...], Mapping[str, Any]],
+        get_paths: TaskPathGetter,
+        targets: Optional[TargetIndex],
+        *,
+        strict: bool = True,
+    ) -> Tuple[Optional[Strings], Optional[TargetIndex]]:
+        """Name the tasks a task depends on, and the targets index, once built.
+
+        The dependencies are ``None`` if ``strict``, and the paths of a ``file_dep``,
+        or any ``targets``, can't be found.
+        """
+        task = tasks[prefixes]
+        deps: Strings = [
+            name for field in DOIT_TASK.TASK_LISTS for name in task.get(field, [])
+        ]
+        if not task.get(DOIT_TASK.FILE_DEP):
+            return deps, targets
+        if targets is None:
+            targets = self.index_targets(tasks, get_paths, strict=strict)
+        file_dep = get_paths(prefixes, task, DOIT_TASK.FILE_DEP)
+        if file_dep is None or targets is None:
+            return (None if strict else deps), targets
+        deps += [
+            self.get_task_names(maker)[1]
+            for path in file_dep
+            for maker in targets.get(path, [])
+        ]
+        return deps, targets
+
+    def index_targets(
+        self,
+        tasks: Mapping[Tuple[str, ...], Mapping[str, Any]],
+        get_paths: TaskPathGetter,
+        *,
+        strict: bool = True,
+    ) -> Optional[TargetIndex]:
+        """Find the tasks which make each path, if all ``targets`` can be found."""
+        index: TargetIndex = {}
+        for prefixes, task in tasks.items():
+            if not task.get(DOIT_TASK.TARGETS):
+                continue
+            paths = get_paths(prefixes, task, DOIT_TASK.TARGETS)
+            if paths is None:
+                if strict:
+                    return None
+                continue
+            for path in paths:
+                index.setdefault(path, []).append(prefixes)
+        return index
+
+    def get_task_paths(
+        self,
+        prefixes: Tuple[str, ...],
+        task: Mapping[str, Any],
+        field: str,
+    ) -> Optional[Strings]:
+        """Get the normalized paths of a field of a resolved, or pending, task."""
+        normalize = self.doitoml.path_cache.normalize
+        if prefixes in self.tasks:
+            return [normalize(path) for path in task.get(field, [])]
+        pending = self.pending_tasks.get(prefixes)
+        if pending is None:
+            return None
+        try:
+            paths, unresolved = self.resolve_some_path_specs(
+                pending[0],
+                task.get(field, []),
+                source_relative=True,
+            )
+        except DoitomlError:
+            return None
+        return None if unresolved else [normalize(path) for path in paths]
+
+    def get_task_names(self, prefixes: Tuple[str, ...]) -> Tuple[str, str]:
+        """Get the ``doit`` group and task names for a task."""
+        parts = prefixes if prefixes[0] else prefixes[1:]
+        return parts[0], f"""{parts[0]}:{":".join(parts[1:])}"""
+
     def resolve_one_skip(self, source: ConfigSource, skip: Any) -> bool:
         """Maybe skip discovery of task (and all its children)."""
         if skip is None:
@@ -569,9 +1215,9 @@ class Config:
             json_val = json.loads(str(found[0]).lower().strip())
             return bool(json_val)
         if isinstance(skip, dict):
-            for key, skipper in self.doitoml.entry_points.skippers.items():
-                if key in skip:
-                    return skipper.should_skip(source, skip[key])
+            skippers = self.doitoml.entry_points.skippers.ranked(skip)
+            for key, skipper in skippers.items():
+                return skipper.should_skip(source, skip[key])
 
         message = f"Skip in {source} is ambiguous: {skip}"
         raise SkipError(message)
@@ -599,7 +1245,7 @@ class Config:
             message = f"{source} task {prefixes} had unresolved paths: {unresolved}"
             raise UnresolvedError(message)
 
-        yield prefixes, new_task
+        yield prefixes, TaskRecord.from_task(prefixes, source, new_task)
 
     def resolve_task_actions(self, source: ConfigSource, task: Task) -> List[str]:
         """Get the new actions (and unresolved paths) for a task."""
@@ -638,7 +1284,8 @@ class Config:
         uptodate: Dict[str, Any],
     ) -> Tuple[Dict[str, Any], Strings]:
         """Transform a single uptodate."""
-        for key, updater in self.doitoml.entry_points.updaters.items():
+        updaters = self.doitoml.entry_points.updaters.ranked(uptodate)
+        for key, updater in updaters.items():
             args = uptodate.get(key)
             if args:
                 return {key: updater.transform_uptodate(source, args)}, []
@@ -647,17 +1294,19 @@ class Config:
 
     def normalize_task_meta(self, source: ConfigSource, task: Task) -> Task:
         """Normalize task metadata."""
-        new_task = deepcopy(task)
-        meta = cast(dict, cast(dict, new_task).setdefault(DOIT_TASK.META, {}))
-        dt_meta = cast(dict, meta.setdefault(NAME, {}))
+        new_task = cast(Task, dict(task))
+        meta = dict(cast(dict, task.get(DOIT_TASK.META) or {}))
+        dt_meta = meta[NAME] = dict(meta.get(NAME) or {})
+        new_task[DOIT_TASK.META] = cast(TaskMetadata, meta)
         raw_cwd = self.resolve_one_path_spec(
             source,
             dt_meta.get(DOITOML_META.CWD, str(source.path.parent)),
             source_relative=True,
         )
-        dt_cwd = Path(
-            self.check_safe_path(raw_cwd[0] if raw_cwd else str(source.path.parent)),
-        )
+        cwd = self.check_safe_path(raw_cwd[0] if raw_cwd else str(source.path.parent))
+        dt_cwd = self._cwds.get(cwd)
+        if dt_cwd is None:
+            dt_cwd = self._cwds[cwd] = Path(cwd)
         dt_log_paths = self.build_log_paths(
             source,
             dt_meta.get(DOITOML_META.LOG),
@@ -666,7 +1315,7 @@ class Config:
         dt_meta[DOITOML_META.LOG] = dt_log_paths
         dt_meta[DOITOML_META.CWD] = dt_cwd
         dt_meta[DOITOML_META.SOURCE] = source
-        env = dt_meta.setdefault(DOITOML_META.ENV, {})
+        env = dt_meta[DOITOML_META.ENV] = dict(dt_meta.get(DOITOML_META.ENV) or {})
         for env_key, env_value in env.items():
             new_key_value = self.resolve_one_env(source, env_value)
             env[env_key] = env_value if new_key_value is None else new_key_value
@@ -0,0 +1,374 @@
+"""A persistent cache of fully-resolved configuration."""
+import hashlib
+import json
+import os
+import platform
+import sys
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Mapping, Optional, Tuple, cast
+
+from . import _version
+from .constants import (
+    CACHE,
+    DEFAULTS,
+    DOIT_TASK,
+    DOITOML_META,
+    NAME,
+    UTF8,
+)
+from .errors import ConfigError
+from .sources._config import WrapperConfigSource
+from .tasks import TaskRecord
+from .utils.fs import DirectoryCache, digest_listing, replace_text
+
+if TYPE_CHECKING:
+    from .config import Config
+    from .doitoml import DoiTOML
+    from .sources._config import ConfigSource
+    from .sources._source import Parser, Source
+
+#: top-level options which are read from the first config source
+CACHED_OPTIONS = (DEFAULTS.UPDATE_ENV, DEFAULTS.FAIL_QUIETLY, DEFAULTS.VALIDATE)
+
+
+class ConfigCache:
+
+    """A cache of the resolved ``Config`` of a ``DoiTOML``, stored as JSON.
+
+    A cached config is only reused if every input observed while resolving it is
+    unchanged: the content of every source file read, the environment variables
+    referenced, the installed ``entry_points``, the entries of every directory
+    listed, and whether the paths checked by skippers, or missing files read by
+    ``:get`` tokens with a default, exist.
+
+    Directories are only listed again if their ``mtime_ns`` changed.
+    """
+
+    #: a reference to the parent
+    doitoml: "DoiTOML"
+    #: the cache file, if enabled
+    path: Optional[Path]
+    #: whether the last ``load`` reused the cache
+    hit: bool
+    #: why the last ``load`` did not reuse the cache
+    reasons: List[str]
+    #: environment variables read while resolving, and their values
+    env: Dict[str, Optional[str]]
+    #: paths checked for existence while resolving
+    exists: Dict[str, bool]
+    #: whether all environment variables were visible while resolving
+    environ: bool
+    #: why the resolved config can't be cached
+    uncacheable_reasons: List[str]
+    #: the options given to the config, before resolving
+    _options: Dict[str, Any]
+
+    def __init__(self, doitoml: "DoiTOML", cache_dir: Optional[Path] = None) -> None:
+        """Create a cache, stored in ``cache_dir``, if given."""
+        self.doitoml = doitoml
+        self.path = Path(cache_dir) / CACHE.CONFIG if cache_dir else None
+        self.hit = False
+        self.reasons = []
+        self.env = {}
+        self.exists = {}
+        self.environ = False
+        self.uncacheable_reasons = []
+        self._options = {}
+
+    def record_env(self, key: str, value: Optional[str]) -> None:
+        """Remember the first value seen for an environment variable."""
+        self.env.setdefault(key, value)
+
+    def record_exists(self, path: str, exists: bool) -> None:
+        """Remember whether a path existed."""
+        self.exists.setdefault(path, exists)
+
+    def record_environ(self) -> None:
+        """Remember that all environment variables were visible, e.g. to templates."""
+        self.environ = True
+
+    def uncacheable(self, reason: str) -> None:
+        """Prevent the resolved config from being cached."""
+        self.uncacheable_reasons += [reason]
+
+    def load(self, config: "Config") -> bool:
+        """Restore a config from the cache, if all of its inputs are unchanged."""
+        if self.path is None:
+            return False
+
+        self._options = self.get_options(config)
+
+        try:
+            cached = json.loads(self.path.read_text(encoding=UTF8))
+            self.reasons = self.check(cached)
+        except FileNotFoundError:
+            self.reasons = ["no cache"]
+            self.create()
+        except (OSError, ValueError, KeyError, TypeError) as err:
+            self.reasons = [f"unreadable cache: {err}"]
+
+        if not self.reasons:
+            try:
+                self.restore(config, cached["config"])
+                self.hit = True
+            except (KeyError, TypeError, ConfigError) as err:
+                self.reasons = [f"unusable cache: {err}"]
+
+        if self.reasons:
+            self.doitoml.log.info("Config cache miss: %s", "; ".join(self.reasons))
+
+        return self.hit
+
+    def save(self, config: "Config") -> None:
+        """Store a config, and all of its inputs, if possible."""
+        if self.path is None:
+            return
+
+        if self.uncacheable_reasons:
+            self.doitoml.log.info(
+                "Config not cached: %s",
+                "; ".join(self.uncacheable_reasons),
+            )
+            return
+
+        try:
+            cached = {
+                "version": CACHE.VERSION,
+                "inputs": self.get_inputs(),
+                "config": self.dump(config),
+            }
+            text = json.dumps(cached, indent=2, sort_keys=True)
+            replace_text(self.path, text)
+        except (OSError, TypeError, ValueError, ConfigError) as err:
+            self.doitoml.log.info("Config not cached: %s", err)
+
+    def create(self) -> None:
+        """Create an empty cache file before resolving, as it may be listed."""
+        if self.path is None:  # pragma: no cover
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.touch()
+        except OSError as err:  # pragma: no cover
+            self.doitoml.log.info("Config cache not created: %s", err)
+
+    def check(self, cached: Dict[str, Any]) -> List[str]:
+        """Find why cached inputs are no longer valid, if they aren't."""
+        if cached.get("version") != CACHE.VERSION:
+            return ["cache format changed"]
+
+        inputs = cached["inputs"]
+        reasons = [
+            f"{key} changed"
+            for key, value in [
+                ("runtime", self.get_runtime()),
+                ("options", self._options),
+                ("entry_points", self.get_entry_points()),
+            ]
+            if inputs[key] != value
+        ]
+        if reasons:
+            return reasons
+
+        reasons += [
+            f"file changed: {path}"
+            for path, digest in inputs["files"].items()
+            if self.digest(path) != digest
+        ]
+        reasons += [
+            f"directory changed: {path}"
+            for path, (mtime_ns, listing_digest) in inputs["dirs"].items()
+            if self.mtime(path) != mtime_ns
+            and digest_listing(DirectoryCache().scandir(path)) != listing_digest
+        ]
+        reasons += [
+            f"environment variable changed: {key}"
+            for key, value in inputs["env"].items()
+            if os.environ.get(key) != value
+        ]
+        reasons += [
+            f"path {'removed' if exists else 'added'}: {path}"
+            for path, exists in inputs["exists"].items()
+            if Path(path).exists() != exists
+        ]
+        if inputs["environ"] not in [None, self.environ_digest()]:
+            reasons += ["environment variables changed"]
+
+        discovered = inputs.get("discovered")
+        if discovered is not None and discovered != self.get_discovered():
+            reasons += ["discovered config sources changed"]
+
+        return reasons
+
+    def get_inputs(self) -> Dict[str, Any]:
+        """Gather everything observed while resolving a config."""
+        directory_cache = self.doitoml.directory_cache
+        paths = [*self.doitoml.parse_cache.paths(), *directory_cache.ignore_files]
+        return {
+            "runtime": self.get_runtime(),
+            "options": self._options,
+            "entry_points": self.get_entry_points(),
+            "files": {path: self.digest(path) for path in sorted(set(paths))},
+            "dirs": {
+                path: [mtime_ns, digest_listing(directory_cache.listdir(path))]
+                for path, mtime_ns in sorted((directory_cache.mtimes or {}).items())
+            },
+            "env": self.env,
+            "exists": self.exists,
+            "environ": self.environ_digest() if self.environ else None,
+            "discovered": self.doitoml.tree_discovery.found,
+        }
+
+    def get_runtime(self) -> Dict[str, str]:
+        """Describe the running python and platform."""
+        return {
+            "doitoml": _version.__version__,
+            "platform": platform.platform(),
+            "python": sys.version,
+        }
+
+    def get_options(self, config: "Config") -> Dict[str, Any]:
+        """Describe the options given to a config, before it is resolved."""
+        options = json.loads(
+            json.dumps(
+                {
+                    "cwd": str(self.doitoml.cwd),
+                    "config_paths": [str(p) for p in config.config_paths],
+                    "discover_config_paths": config.discover_config_paths,
+                    "safe_paths": config.safe_paths,
+                    **{key: getattr(config, key) for key in CACHED_OPTIONS},
+                },
+            ),
+        )
+        return cast(Dict[str, Any], options)
+
+    def get_discovered(self) -> List[str]:
+        """Find the config sources in every directory, as when last cached."""
+        found = self.doitoml.tree_discovery.find(self.doitoml.cwd)
+        return [path.as_posix() for path in found]
+
+    def get_entry_points(self) -> List[List[Optional[str]]]:
+        """Describe all installed ``entry_points``, and the versions providing them."""
+        return self.doitoml.entry_points.cache.describe()
+
+    def digest(self, path: str) -> Optional[str]:
+        """Hash the contents of a file, if it exists."""
+        try:
+            return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+        except OSError:
+            return None
+
+    def mtime(self, path: str) -> Optional[int]:
+        """Get the ``mtime_ns`` of a path, if it exists."""
+        try:
+            return os.stat(path).st_mtime_ns  # noqa: PTH116
+        except OSError:
+            return None
+
+    def environ_digest(self) -> str:
+        """Hash all environment variables."""
+        as_json = json.dumps(dict(os.environ), sort_keys=True)
+        return hashlib.sha256(as_json.encode(UTF8)).hexdigest()
+
+    def dump(self, config: "Config") -> Dict[str, Any]:
+        """Describe a resolved config as JSON-compatible data."""
+        return {
+            "sources": {
+                prefix: self.dump_source(source)
+                for prefix, source in config.sources.items()
+            },
+            "options": {key: getattr(config, key) for key in CACHED_OPTIONS},
+            "safe_paths": config.safe_paths,
+            "env": config.env,
+            "paths": [[list(key), value] for key, value in config.paths.items()],
+            "tokens": [[list(key), value] for key, value in config.tokens.items()],
+            "templates": config.templates,
+            "tasks": [
+                [list(key), self.dump_task(task)] for key, task in config.tasks.items()
+            ],
+        }
+
+    def restore(self, config: "Config", cached: Dict[str, Any]) -> None:
+        """Update a config with previously-resolved values."""
+        config.sources = {
+            prefix: self.load_source(source)
+            for prefix, source in cached["sources"].items()
+        }
+        for key, value in cached["options"].items():
+            setattr(config, key, value)
+        config.safe_paths = cached["safe_paths"]
+        config.env = cached["env"]
+        config.paths = {tuple(key): value for key, value in cached["paths"]}
+        config.tokens = {tuple(key): value for key, value in cached["tokens"]}
+        config.templates = cached["templates"]
+        config.tasks = {
+            tuple(key): self.load_task(config, tuple(key), task)
+            for key, task in cached["tasks"]
+        }
+
+    def dump_source(self, source: "ConfigSource") -> Dict[str, Any]:
+        """Describe how to load a config source again."""
+        entry_points = self.doitoml.entry_points
+        if isinstance(source, WrapperConfigSource):
+            child = source.child_source
+            parser_name = self.find_parser_name(entry_points.parsers.loaded, child)
+            return {
+                "path": str(child.path),
+                "parser": parser_name,
+                "bits": source.bit_prefix,
+            }
+        parser_name = self.find_parser_name(entry_points.config_parsers.loaded, source)
+        return {"path": str(source.path), "config_parser": parser_name}
+
+    def find_parser_name(self, parsers: Dict[str, Any], source: "Source") -> str:
+        """Find the name of the parser which loaded a source."""
+        registry = self.doitoml.source_registry
+        for name, parser in parsers.items():
+            if registry.get(source.path, parser) is source:
+                return str(name)
+        message = f"Cannot find the parser for {source}"
+        raise ConfigError(message)
+
+    def load_source(self, cached: Dict[str, Any]) -> "ConfigSource":
+        """Load a config source from its description."""
+        entry_points = self.doitoml.entry_points
+        registry = self.doitoml.source_registry
+        path = Path(cached["path"])
+        if "bits" in cached:
+            parser: "Parser" = entry_points.parsers[cached["parser"]]
+            return WrapperConfigSource(registry.load(path, parser), cached["bits"])
+        config_parser = entry_points.config_parsers[cached["config_parser"]]
+        return registry.load(path, config_parser)  # type: ignore
+
+    def dump_task(self, task: Mapping[str, Any]) -> Dict[str, Any]:
+        """Replace the paths and source in a task's metadata with strings."""
+        meta = cast(dict, task[DOIT_TASK.META])
+        dt_meta = meta[NAME]
+        log: Tuple[Optional[Path], Optional[Path]] = dt_meta[DOITOML_META.LOG]
+        return {
+            **task,
+            DOIT_TASK.META: {
+                **meta,
+                NAME: {
+                    **dt_meta,
+                    DOITOML_META.CWD: str(dt_meta[DOITOML_META.CWD]),
+                    DOITOML_META.LOG: [None if p is None else str(p) for p in log],
+                    DOITOML_META.SOURCE: dt_meta[DOITOML_META.SOURCE].prefix,
+                },
+            },
+        }
+
+    def load_task(
+        self,
+        config: "Config",
+        prefixes: Tuple[str, ...],
+        cached: Dict[str, Any],
+    ) -> TaskRecord:
+        """Restore the paths and source in a task's metadata."""
+        dt_meta = cached[DOIT_TASK.META][NAME]
+        dt_meta[DOITOML_META.CWD] = Path(dt_meta[DOITOML_META.CWD])
+        dt_meta[DOITOML_META.LOG] = tuple(
+            None if p is None else Path(p) for p in dt_meta[DOITOML_META.LOG]
+        )
+        source = config.sources[dt_meta[DOITOML_META.SOURCE]]
+        return TaskRecord.from_task(prefixes, source, cached)
@@ -28,6 +28,8 @@ class DEFAULTS:
     FAIL_QUIETLY: Literal["fail_quietly"] = "fail_quietly"
     #: the key for controlling validation
     VALIDATE: Literal["validate"] = "validate"
+    #: find config in every directory, instead of only the working directory
+    DISCOVER_TREE: Literal["tree"] = "tree"
     #: the values that will be read from the first config file
     ALL_FROM_FIRST_CONFIG = (UPDATE_ENV, FAIL_QUIETLY, VALIDATE, CONFIG_PATH)
 
@@ -60,12 +62,30 @@ class DOIT_TASK:
     ACTIONS: Literal["actions"] = "actions"
     #: field for arbitrary data in tasks
     META: Literal["meta"] = "meta"
+    #: files a task needs, which may be the ``targets`` of other tasks
+    FILE_DEP: Literal["file_dep"] = "file_dep"
+    #: files a task makes
+    TARGETS: Literal["targets"] = "targets"
     #: field for task up-to-date checks (might overload `file_dep` and `task_dep`)
     UPTODATE: Literal["uptodate"] = "uptodate"
     #: ``doit`` task items known to be lists
     LIST_KEYS = ("file_dep", "task_dep", "targets", "actions", "clean")
     #: ``doit`` keys that are always paths
     RELATIVE_LISTS = ("file_dep", "targets", "clean")
+    #: ``doit`` keys that name other tasks
+    TASK_LISTS = ("task_dep", "setup")
+
+
+class REFERENCE:
+
+    """Kinds of named values that may reference one another."""
+
+    #: environment variables, shared by all sources
+    ENV: Literal["env"] = "env"
+    #: paths, relative to their source
+    PATHS: Literal["paths"] = "paths"
+    #: shell tokens
+    TOKENS: Literal["tokens"] = "tokens"
 
 
 class DOITOML_META:
@@ -84,8 +104,42 @@ class DOITOML_META:
     SOURCE: Literal["source"] = "source"
 
 
+class CACHE:
+
+    """Names of files and directories for persistent caches."""
+
+    #: the directory for all ``doitoml`` caches, next to the ``doit`` dep file
+    DIR: Literal[".doitoml_cache"] = ".doitoml_cache"
+    #: resolved configuration
+    CONFIG: Literal["config.json"] = "config.json"
+    #: tasks rendered by templaters
+    TEMPLATES: Literal["templates.json"] = "templates.json"
+    #: compiled ``jinja2`` templates
+    JINJA2: Literal["jinja2"] = "jinja2"
+    #: hashes of configuration which passed validation
+    VALIDATED: Literal["validated.json"] = "validated.json"
+    #: directories and files found while discovering config sources
+    DISCOVERED: Literal["discovered.json"] = "discovered.json"
+    #: installed ``entry_points``, in the user cache directory
+    ENTRY_POINTS: Literal["entry_points.json"] = "entry_points.json"
+    #: validators generated from schemas, in the user cache directory
+    SCHEMA: Literal["schema"] = "schema"
+    #: bump when the format of any cache changes
+    VERSION = 1
+
+
 #: all the false things
 FALSEY = ["", "false", "0", "0.0", "{}", "[]", "null", "none"]
 
 #: fnmatch triggers
 FNMATCH_WILDCARDS = "*?["
+
+
+class ENV_VARS:
+
+    """Environment variables which configure ``doitoml`` itself."""
+
+    #: a path to write ``Timings`` as JSON, after the ``doit`` loader loads tasks
+    TIMINGS: Literal["DOITOML_TIMINGS"] = "DOITOML_TIMINGS"
+    #: a directory for caches shared by all projects, or empty to disable them
+    USER_CACHE_DIR: Literal["DOITOML_USER_CACHE_DIR"] = "DOITOML_USER_CACHE_DIR"
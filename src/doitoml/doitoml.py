@@ -1,19 +1,22 @@
 """Opinionated, declarative ``doit`` tasks from TOML, JSON, YAML, and more."""
 import logging
 import os
-import subprocess
 import sys
 from io import TextIOBase
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple, Union, cast
 
-import doit.action
-import doit.tools
-
 from .config import Config
+from .config_cache import ConfigCache
 from .constants import DOIT_TASK, DOITOML_META, NAME
 from .entry_points import EntryPoints
 from .errors import DoitomlError, EnvVarError, TaskError
+from .schema._cache import ValidationCache
+from .sources._cache import ParseCache, SourceRegistry
+from .sources._discover import TreeDiscovery
+from .templaters._cache import RenderCache
+from .tasks import TaskRecord
+from .timings import Timings
 from .types import (
     Action,
     ExecutionContext,
@@ -24,7 +27,9 @@ from .types import (
     TaskFunction,
     TaskGenerator,
 )
-from .utils.path import ensure_parents
+from .utils.env import LayeredEnv
+from .utils.fs import DirectoryCache
+from .utils.path import PathCache, ensure_parents
 
 MaybeLogLevel = Optional[Union[str, int]]
 
@@ -37,6 +42,19 @@ class DoiTOML:
     log: logging.Logger
     entry_points: EntryPoints
     cwd: Path
+    parse_cache: ParseCache
+    source_registry: SourceRegistry
+    directory_cache: DirectoryCache
+    path_cache: PathCache
+    config_cache: ConfigCache
+    render_cache: RenderCache
+    validation_cache: ValidationCache
+    tree_discovery: TreeDiscovery
+    timings: Timings
+    #: the directory for persistent caches, if enabled
+    cache_dir: Optional[Path]
+    #: a snapshot of ``os.environ``, shared by all subtasks
+    _base_env: Optional[LayeredEnv] = None
 
     def __init__(
         self,
@@ -47,12 +65,29 @@ class DoiTOML:
         fail_quietly: Optional[bool] = None,
         log: Optional[logging.Logger] = None,
         log_level: MaybeLogLevel = None,
-        discover_config_paths: Optional[bool] = None,
+        discover_config_paths: Optional[Union[bool, str]] = None,
         validate: Optional[bool] = None,
         safe_paths: Optional[List[str]] = None,
+        persist_directory_cache: Optional[bool] = None,
+        cache_dir: Optional[Path] = None,
+        lazy_tasks: Optional[bool] = None,
+        selectors: Optional[List[str]] = None,
     ) -> None:
         """Initialize a ``doitoml`` task generator."""
         self.cwd = Path(cwd) if cwd else Path.cwd()
+        self.cache_dir = cache_dir
+        self.timings = Timings(self)
+        self.parse_cache = ParseCache(self.timings)
+        self.source_registry = SourceRegistry()
+        self.directory_cache = DirectoryCache(
+            persist=persist_directory_cache,
+            track_mtimes=cache_dir is not None,
+        )
+        self.path_cache = PathCache()
+        self.config_cache = ConfigCache(self, cache_dir)
+        self.render_cache = RenderCache(self, cache_dir)
+        self.validation_cache = ValidationCache(self, cache_dir)
+        self.tree_discovery = TreeDiscovery(self, cache_dir)
         try:
             self.log = self.init_log(log, log_level)
             self.entry_points = EntryPoints(self)
@@ -63,23 +98,30 @@ class DoiTOML:
                 discover_config_paths=discover_config_paths,
                 validate=validate,
                 safe_paths=safe_paths,
+                lazy_tasks=lazy_tasks,
+                selectors=selectors,
             )
             # initialize late for ``entry_points`` that reference ``self.entry_points``
-            self.entry_points.initialize()
+            with self.timings.phase("entry_points"):
+                self.entry_points.initialize()
             self.config.initialize()
 
         except DoitomlError as err:
-            if fail_quietly or (
-                fail_quietly is None and self.config and self.config.fail_quietly
-            ):
-                self.log.error("%s: %s", type(err).__name__, err)
-                sys.exit(1)
-            else:
-                raise err
+            self.fail(err, fail_quietly)
 
         if self.config.update_env:
             self.update_env()
 
+    def fail(self, err: DoitomlError, fail_quietly: Optional[bool] = None) -> None:
+        """Exit with a short log message if ``fail_quietly``, or raise."""
+        if fail_quietly or (
+            fail_quietly is None and self.config and self.config.fail_quietly
+        ):
+            self.log.error("%s: %s", type(err).__name__, err)
+            sys.exit(1)
+        else:
+            raise err
+
     def init_log(
         self,
         log: Optional[logging.Logger] = None,
@@ -96,9 +138,11 @@ class DoiTOML:
         config_paths: PathOrStrings,
         update_env: Optional[bool] = None,
         fail_quietly: Optional[bool] = None,
-        discover_config_paths: Optional[bool] = None,
+        discover_config_paths: Optional[Union[bool, str]] = None,
         validate: Optional[bool] = None,
         safe_paths: Optional[List[str]] = None,
+        lazy_tasks: Optional[bool] = None,
+        selectors: Optional[List[str]] = None,
     ) -> Config:
         """Initialize configuration."""
         return Config(
@@ -109,23 +153,38 @@ class DoiTOML:
             discover_config_paths=discover_config_paths,
             validate=validate,
             safe_paths=safe_paths,
+            lazy_tasks=lazy_tasks,
+            selectors=selectors,
         )
 
-    def tasks(self) -> Dict[str, TaskFunction]:
-        """Generate functions compatible with the default ``doit`` loader style."""
-        tasks = {}
-
-        task_groups = self.group_tasks(self.config.tasks)
-        for task_name, subtasks in task_groups.items():
-            if not task_name:
-                subgroup = self.group_tasks(subtasks)
-                for subtask_name, sub2_tasks in subgroup.items():
-                    task = self.build_task_group(subtask_name, sub2_tasks)
+    def tasks(self, selectors: Optional[List[str]] = None) -> Dict[str, TaskFunction]:
+        """Generate functions compatible with the default ``doit`` loader style.
+
+        With ``lazy_tasks``, only resolve the tasks named by ``doit`` selectors,
+        and the tasks they depend on. With ``selectors``, only the tasks they name
+        can be resolved.
+        """
+        self._base_env = None
+        with self.timings.phase("tasks"):
+            try:
+                self.config.resolve_pending_tasks(selectors)
+            except DoitomlError as err:
+                self.fail(err)
+
+            tasks = {}
+
+            task_groups = self.group_tasks(self.config.tasks)
+            for task_name, subtasks in task_groups.items():
+                if not task_name:
+                    subgroup = self.group_tasks(subtasks)
+                    for subtask_name, sub2_tasks in subgroup.items():
+                        task = self.build_task_group(subtask_name, sub2_tasks)
+                        tasks[task.__name__] = task
+                else:
+                    task = self.build_task_group(task_name, subtasks)
                     tasks[task.__name__] = task
-            else:
-                task = self.build_task_group(task_name, subtasks)
-                tasks[task.__name__] = task
 
+        self.timings.log_summary()
         return tasks
 
     def group_tasks(self, tasks: PrefixedTasks) -> GroupedTasks:
@@ -137,6 +196,7 @@ class DoiTOML:
 
     def get_env(self, key: str, default: Optional[str] = None) -> str:
         """Get an environment variable from the real (or in-progress) environment."""
+        self.config_cache.record_env(key, os.environ.get(key))
         value = os.environ.get(key, self.config.env.get(key, default))
         if value is None:
             message = f"{key} was not found in any environment, no default given"
@@ -146,6 +206,13 @@ class DoiTOML:
     def update_env(self) -> None:
         """Update environment variables."""
         os.environ.update(self.config.env)
+        self._base_env = None
+
+    def get_base_env(self) -> LayeredEnv:
+        """Get the environment shared by all subtasks, taken when first needed."""
+        if self._base_env is None:
+            self._base_env = LayeredEnv.from_environ()
+        return self._base_env
 
     def build_task_group(
         self,
@@ -166,19 +233,24 @@ class DoiTOML:
         task.__doc__ = f"... {len(subtasks)} {prefix} tasks"
         return task
 
-    def build_subtask(self, task_name: Tuple[str, ...], raw_task: Task) -> Task:
+    def build_subtask(
+        self,
+        task_name: Tuple[str, ...],
+        raw_task: Union[Task, TaskRecord],
+    ) -> Task:
         """Build a single generated ``doit`` task."""
         name = ":".join(task_name)
         task: Task = {"name": name}
-        task.update(raw_task)
+        task.update(
+            raw_task.to_task() if isinstance(raw_task, TaskRecord) else raw_task,
+        )
 
         meta = cast(dict, task.get(DOIT_TASK.META, {}))
         dt_meta = meta.get(NAME, {})
         cwd = dt_meta.get(DOITOML_META.CWD) or self.cwd
         env = dt_meta.get(DOITOML_META.ENV, {})
         log_paths = dt_meta.get(DOITOML_META.LOG)
-        cmd_env = dict(os.environ)
-        cmd_env.update(env)
+        cmd_env = self.get_base_env().layer(env)
 
         execution_context = ExecutionContext(
             cwd=cwd,
@@ -198,6 +270,8 @@ class DoiTOML:
         execution_context: ExecutionContext,
     ) -> List[Action]:
         """Build all actions in a subtask."""
+        import doit.tools
+
         old_actions = task[DOIT_TASK.ACTIONS]
         new_actions: List[Any] = [(doit.tools.create_folder, [execution_context.cwd])]
 
@@ -260,6 +334,8 @@ class DoiTOML:
         if isinstance(action, (str, list)) and (is_shell or is_tokens):
             popen_kwargs = {"cwd": execution_context.cwd, "env": execution_context.env}
             if not any(execution_context.log_paths):
+                import doit.tools
+
                 return [doit.tools.CmdAction(action, **popen_kwargs, shell=is_shell)]
 
             args = [action] if isinstance(action, str) else list(map(str, action))
@@ -278,6 +354,8 @@ class DoiTOML:
         execution_context: ExecutionContext,
     ) -> bool:
         """Run a process, capturing the output to files."""
+        import subprocess
+
         stdout, stderr = ensure_parents(*execution_context.log_paths)
 
         out = stdout.open(execution_context.log_mode) if stdout else None
@@ -290,6 +368,10 @@ class DoiTOML:
             )
         streams: Dict[str, Any] = {"stdout": out, "stderr": err}
 
+        env = popen_kwargs["env"]
+        if isinstance(env, LayeredEnv):
+            popen_kwargs = {**popen_kwargs, "env": env.to_dict()}
+
         rc = subprocess.call(args, **streams, **popen_kwargs)  # noqa: S603
 
         for stream in streams.values():
@@ -6,17 +6,32 @@ import json
 import os
 import re
 from pathlib import Path
-from typing import TYPE_CHECKING, Any, Dict, List, Tuple, cast
-
-from doitoml.constants import FNMATCH_WILDCARDS
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    cast,
+)
+
+from doitoml.constants import FNMATCH_WILDCARDS, REFERENCE
 
 from .errors import DslError
-from .types import Strings
+from .types import References, Strings
+from .utils.fs import PRUNE_UNSAFE
 
 if TYPE_CHECKING:
     from .doitoml import DoiTOML
     from .sources._config import ConfigSource
     from .sources._source import Source
+    from .utils.fs import Pruner
+
+#: regular expressions to find, and their replacements
+Replacers = List[Tuple["re.Pattern[str]", str]]
 
 
 class DSL:
@@ -29,6 +44,12 @@ class DSL:
     #: the rank of the DSL
     rank = 100
 
+    #: literal strings, one of which a matching token must start with, if known
+    starts_with: Tuple[str, ...] = ()
+
+    #: literal strings, one of which a matching token must contain, if known
+    contains: Tuple[str, ...] = ()
+
     def __init__(self, doitoml: "DoiTOML") -> None:
         """Create a DSL and remember its parent."""
         self.doitoml = doitoml
@@ -47,6 +68,19 @@ class DSL:
     ) -> Strings:
         """Transform a token into one or more strings."""
 
+    def get_references(
+        self,
+        source: "ConfigSource",
+        match: re.Match[str],
+        raw_token: str,
+    ) -> References:
+        """Advertise the ``env``, ``paths``, or ``tokens`` a token may need.
+
+        A DSL that reads other configuration values should list them here, so
+        they are resolved before this token is transformed.
+        """
+        return []
+
 
 class PathRef(DSL):
 
@@ -57,6 +91,19 @@ class PathRef(DSL):
 
     pattern = re.compile(r"^::((?P<prefix>[^:]*)::)?(?P<ref>[^:]+)$")
 
+    starts_with = ("::",)
+
+    #: prefixes matching each wildcard prefix, for the sources they were found in
+    _prefix_index: Dict[str, Strings]
+    #: the sources the ``_prefix_index`` was built from
+    _indexed_sources: Optional[Mapping[str, "ConfigSource"]]
+
+    def __init__(self, doitoml: "DoiTOML") -> None:
+        """Create a path reference DSL with an empty prefix index."""
+        super().__init__(doitoml)
+        self._prefix_index = {}
+        self._indexed_sources = None
+
     def transform_token(
         self,
         source: "ConfigSource",
@@ -65,29 +112,59 @@ class PathRef(DSL):
         **kwargs: Any,
     ) -> Strings:
         """Expand a path name (with optional prefix) to a previously-found value."""
-        groups = match.groupdict()
-        ref: str = groups["ref"]
-        prefix = source.prefix if groups["prefix"] is None else groups["prefix"]
-
+        ref: str = match.groupdict()["ref"]
         config = self.doitoml.config
+        found = False
+        tokens: Strings = []
+
+        for prefix in self.find_prefixes(source, match):
+            key = (prefix, ref)
+            # a token shadows a path of the same name
+            from_named = config.tokens.get(key)
+            if from_named is None:
+                from_named = config.paths.get(key)
+            if from_named is not None:
+                found = True
+                tokens += from_named
+
+        return tokens if found else None  # type: ignore
+
+    def get_references(
+        self,
+        source: "ConfigSource",
+        match: re.Match[str],
+        raw_token: str,
+    ) -> References:
+        """Find the named ``paths`` and ``tokens`` in all matching prefixes."""
+        ref: str = match.groupdict()["ref"]
+        return [
+            (kind, prefix, ref)
+            for prefix in self.find_prefixes(source, match)
+            for kind in [REFERENCE.PATHS, REFERENCE.TOKENS]
+        ]
+
+    def find_prefixes(self, source: "ConfigSource", match: re.Match[str]) -> Strings:
+        """Find the prefixes a token references, which may contain wildcards."""
+        prefix: str = match.groupdict()["prefix"]
+        if prefix is None:
+            return [source.prefix]
 
         if any(c in prefix for c in FNMATCH_WILDCARDS):
-            prefixes = fnmatch.filter(sorted(config.sources), prefix)
-        else:
-            prefixes = [prefix]
-
-        prefix_tokens: Dict[str, List[str]] = {}
+            return [*self.match_prefixes(prefix)]
 
-        for prefix in prefixes:
-            for named in [config.paths, config.tokens]:
-                from_named = named.get((prefix, ref))
-                if from_named is not None:
-                    prefix_tokens[prefix] = from_named
+        return [prefix]
 
-        if prefix_tokens:
-            return sum(prefix_tokens.values(), [])
-
-        return None  # type: ignore
+    def match_prefixes(self, pattern: str) -> Strings:
+        """Find the sorted source prefixes matching a wildcard, once per sources."""
+        sources = self.doitoml.config.sources
+        if sources is not self._indexed_sources:
+            self._prefix_index = {}
+            self._indexed_sources = sources
+        matched = self._prefix_index.get(pattern)
+        if matched is None:
+            matched = fnmatch.filter(sorted(sources), pattern)
+            self._prefix_index[pattern] = matched
+        return matched
 
 
 class EnvReplacer(DSL):
@@ -96,6 +173,8 @@ class EnvReplacer(DSL):
 
     pattern = re.compile(r"\$\{([^\}]+)\}")
 
+    contains = ("${",)
+
     #: paths go before most other built-in DSL
     rank = 90
 
@@ -113,6 +192,19 @@ class EnvReplacer(DSL):
         """Replace all environment variable with their value in ``os.environ``."""
         return [self.pattern.sub(self._replacer, raw_token)]
 
+    def get_references(
+        self,
+        source: "ConfigSource",
+        match: re.Match[str],
+        raw_token: str,
+    ) -> References:
+        """Find all ``env`` not already set in ``os.environ``."""
+        return [
+            (REFERENCE.ENV, "", env_match[1])
+            for env_match in self.pattern.finditer(raw_token)
+            if env_match[1] not in os.environ
+        ]
+
 
 class Globber(DSL):
 
@@ -120,6 +212,16 @@ class Globber(DSL):
 
     pattern = re.compile(r"^:(?P<kind>(r?glob))::(?P<rest>:{0,2}.*)$")
 
+    starts_with = (":glob::", ":rglob::")
+
+    #: expanded tokens, keyed by the directory of their source
+    _expanded: Dict[Tuple[str, str], Strings]
+
+    def __init__(self, doitoml: "DoiTOML") -> None:
+        """Create a globber with no expanded tokens."""
+        super().__init__(doitoml)
+        self._expanded = {}
+
     def transform_token(
         self,
         source: "ConfigSource",
@@ -127,6 +229,14 @@ class Globber(DSL):
         raw_token: str,
         **kwargs: Any,
     ) -> Strings:
+        """Expand a token, reusing the result for tokens from the same directory."""
+        key = (source.path.parent.as_posix(), raw_token)
+        expanded = self._expanded.get(key)
+        if expanded is None:
+            expanded = self._expanded[key] = self.expand_token(source, match)
+        return [*expanded]
+
+    def expand_token(self, source: "ConfigSource", match: re.Match[str]) -> Strings:
         """Expand a token to zero or more :class:`pathlib.Path` based on (r)glob(s).
 
         Chunks are delimited by ``::``. The first chunk is a relative path.
@@ -139,19 +249,61 @@ class Globber(DSL):
           - the first is a :class:`re.Pattern` to `find`
           - the next is the `replacement` string
 
+        - ``/gitignore/``: exclude paths ignored by ``git``
+
         Order does not matter: all excludes an replacers will be applied `after`
         all matches are expanded.
+
+        Directories are only read once per ``DoiTOML``, by its ``directory_cache``,
+        and directories which are excluded are not walked.
         """
         groups = match.groupdict()
         kind = cast(str, groups["kind"])
         rest = cast(str, groups["rest"])
         root, glob_rest = rest.split("::", 1)
-        root_path = (source.path.parent / root).resolve()
+        root_path = Path(self.doitoml.path_cache.resolve(source.path.parent / root))
+        directory_cache = self.doitoml.directory_cache
+        globber = directory_cache.glob if kind == "glob" else directory_cache.rglob
+        patterns, excludes, replacers, gitignore = self.parse_chunks(glob_rest)
+        git_top: Optional[str] = None
+
+        if gitignore:
+            root_posix = root_path.as_posix()
+            git_top = directory_cache.git_top(root_posix) or root_posix
+
+        parent_posix = source.path.parent.as_posix()
+        prune = self.get_pruner(parent_posix, excludes, git_top)
+        new_value: List[str] = []
+
+        for glob in patterns:
+            new_value += globber(root_path, glob, prune)
+
+        final_value = []
+
+        for path in new_value:
+            as_posix = path
+            if git_top is not None and directory_cache.is_ignored(git_top, path):
+                continue
+            if excludes:
+                as_posix_rel = self.relative_posix(as_posix, parent_posix)
+                if as_posix_rel and any(ex.search(as_posix_rel) for ex in excludes):
+                    continue
+            for pattern, repl_value in replacers:
+                as_posix = pattern.sub(repl_value, as_posix)
+            final_value += [as_posix]
+
+        return sorted(set(final_value))
+
+    def parse_chunks(
+        self,
+        glob_rest: str,
+    ) -> Tuple[List[str], List[re.Pattern[str]], Replacers, bool]:
+        """Split chunks into patterns, excludes, replacers, and whether to use git."""
         globs = glob_rest.split("::")
-        globber = root_path.glob if kind == "glob" else root_path.rglob
-        new_value: List[Path] = []
+        patterns: List[str] = []
         excludes: List[re.Pattern[str]] = []
-        replacers: List[Tuple[re.Pattern[str], str]] = []
+        replacers: Replacers = []
+        gitignore = False
 
         while globs:
             glob = globs.pop(0)
@@ -163,25 +315,47 @@ class Globber(DSL):
                 repl_value = globs.pop(0)
                 replacers += [(re.compile(replacer), repl_value)]
                 continue
-            new_value += [*globber(glob)]
+            if glob == "/gitignore/":
+                gitignore = True
+                continue
+            patterns += [glob]
 
-        final_value = []
+        return patterns, excludes, replacers, gitignore
 
-        parent_posix = source.path.parent.as_posix()
+    def get_pruner(
+        self,
+        parent_posix: str,
+        excludes: List[re.Pattern[str]],
+        git_top: Optional[str],
+    ) -> Optional["Pruner"]:
+        """Build a callable to skip walking directories whose descendants are excluded.
+
+        An exclude can only prune a directory if it matches the directory's path with
+        a trailing ``/``, and can't depend on what follows, e.g. with ``$`` or ``(?=``.
+        """
+        prunable = [ex for ex in excludes if not PRUNE_UNSAFE.search(ex.pattern)]
 
-        for path in new_value:
-            as_posix = path.as_posix()
-            if excludes:
-                as_posix_rel = Path(
-                    os.path.relpath(str(as_posix), parent_posix),
-                ).as_posix()
-                if as_posix_rel and any(ex.search(as_posix_rel) for ex in excludes):
-                    continue
-            for pattern, repl_value in replacers:
-                as_posix = pattern.sub(repl_value, as_posix)
-            final_value += [as_posix]
+        if not prunable and git_top is None:
+            return None
 
-        return sorted(set(final_value))
+        directory_cache = self.doitoml.directory_cache
+
+        def prune(path: str) -> bool:
+            if git_top is not None and directory_cache.is_ignored(git_top, path):
+                return True
+            rel = self.relative_posix(path, parent_posix)
+            if rel == ".":
+                return False
+            rel = f"{rel}/"
+            return any(ex.search(rel) for ex in prunable)
+
+        return prune
+
+    def relative_posix(self, path: str, parent_posix: str) -> str:
+        """Get a POSIX path relative to a parent, avoiding ``relpath`` if possible."""
+        if path.startswith(f"{parent_posix}/") and "/.." not in path:
+            return path[len(parent_posix) + 1 :]
+        return Path(os.path.relpath(path, parent_posix)).as_posix()
 
 
 class Getter(DSL):
@@ -190,10 +364,13 @@ class Getter(DSL):
 
     _pattern: re.Pattern[str]
 
+    starts_with = (":get",)
+
     def __init__(self, doitoml: "DoiTOML") -> None:
         """Initialize and pre-calculate the pattern."""
         super().__init__(doitoml)
-        keys = sorted(self.doitoml.entry_points.parsers.keys())
+        # only the names: parsers are imported when first used
+        keys = self.doitoml.entry_points.parsers.names()
 
         self._pattern = re.compile(
             r"^:get(?P<default>\|[^:]*)?::(?P<parser>"
@@ -256,13 +433,78 @@ class Getter(DSL):
         parser = self.doitoml.entry_points.parsers.get(parser_name)
 
         if parser is None:  # pragma: no cover
-            message = f"parser {parser} is not supported"
+            message = f"parser {parser_name} is not supported"
             raise DslError(message)
 
-        get_path = (source.path.parent / path).resolve()
+        get_path = Path(self.doitoml.path_cache.resolve(source.path.parent / path))
+        registry = self.doitoml.source_registry
+        new_source = registry.get(get_path, parser)
+
+        if new_source is None:
+            if not get_path.exists():
+                # a ``:get|default`` token changes when the file is created
+                self.doitoml.config_cache.record_exists(str(get_path), False)
+                message = f"{get_path} does not exist, can't get {bits}"
+                raise DslError(message)
+            new_source = registry.load(get_path, parser)
 
-        if not get_path.exists():
-            message = f"{get_path} does not exist, can't get {bits}"
-            raise DslError(message)
-        new_source = parser(get_path)
         return new_source, bits
+
+
+#: a DSL, and the literals a token must start with, or contain, to be tried
+DslCandidate = Tuple[DSL, Tuple[str, ...], Tuple[str, ...]]
+
+
+class DslIndex:
+
+    """An index of DSL by the literal strings their tokens start with, or contain.
+
+    A single combined pattern finds the first DSL, by ``rank``, with a literal found
+    in a token: tokens which cannot match any DSL, like most plain strings, are
+    rejected without trying any other patterns. A DSL which advertises no literals is
+    always tried.
+    """
+
+    #: the DSL, and their literals, in rank order
+    ranked: List[DslCandidate]
+    #: a pattern with an empty group per DSL, matched if any of its literals are found
+    any_literal: re.Pattern[str]
+
+    def __init__(self, dsl: Mapping[str, DSL]) -> None:
+        """Build an index of DSL, already sorted by rank."""
+        self.ranked = []
+        alternatives = []
+        for one_dsl in dsl.values():
+            self.ranked += [(one_dsl, one_dsl.starts_with, one_dsl.contains)]
+            alternatives += [f"{self.lookahead(one_dsl)}()"]
+        self.any_literal = re.compile("|".join(alternatives) or "(?!)", re.DOTALL)
+
+    def lookahead(self, dsl: DSL) -> str:
+        """Build a pattern that matches at the start of a token with any literal."""
+        literals = [
+            *(re.escape(lit) for lit in dsl.starts_with),
+            *(f".*?{re.escape(lit)}" for lit in dsl.contains),
+        ]
+        return f"(?={'|'.join(literals)})" if literals else ""
+
+    def iter_candidates(self, token: str, first: int) -> Iterator[DSL]:
+        """Yield the first DSL with a literal found in a token, then any after it."""
+        yield self.ranked[first][0]
+        for dsl, starts_with, contains in self.ranked[first + 1 :]:
+            if (
+                not (starts_with or contains)
+                or token.startswith(starts_with)
+                or any(lit in token for lit in contains)
+            ):
+                yield dsl
+
+    def match(self, token: str) -> Optional[Tuple[DSL, re.Match[str]]]:
+        """Find the first DSL, by rank, which matches a token."""
+        found = self.any_literal.match(token)
+        if found is None:
+            return None
+        for dsl in self.iter_candidates(token, cast(int, found.lastindex) - 1):
+            match = dsl.pattern.search(token)
+            if match is not None:
+                return dsl, match
+        return None
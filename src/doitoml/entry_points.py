@@ -1,15 +1,31 @@
 """Loads entry points."""
+import hashlib
+import importlib
+import json
+import os
 import sys
-from typing import TYPE_CHECKING, Any, Dict, Tuple, Union
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+    cast,
+)
 
 from doitoml.errors import EntryPointError, MissingDependencyError
 
-from .constants import ENTRY_POINTS
-
-if sys.version_info < (3, 10):  # pragma: no cover
-    from importlib_metadata import entry_points
-else:  # pragma: no cover
-    from importlib.metadata import entry_points
+from .constants import CACHE, ENTRY_POINTS, NAME, UTF8
+from .dsl import DslIndex
+from .utils.path import get_user_cache_dir
 
 if TYPE_CHECKING:
     from .actors._actor import Actor
@@ -22,56 +38,278 @@ if TYPE_CHECKING:
     from .updaters._updater import Updater
 
 
+#: a plugin, created from an ``entry_point``
+T = TypeVar("T")
+
+#: the suffixes of directories with package metadata
+DIST_SUFFIXES = (".dist-info", ".egg-info")
+
+#: an ``entry_point`` described as its group, name, value, and package version
+DescribedEntryPoint = List[Optional[str]]
+
+
+class CachedEntryPoint(NamedTuple):
+
+    """An ``entry_point`` read from the cache, loaded without package metadata."""
+
+    name: str
+    value: str
+    group: str
+
+    def load(self) -> Any:
+        """Import the module named by ``value``, and get its attribute, if any."""
+        module_name, _, attrs = self.value.partition(":")
+        loaded = importlib.import_module(module_name.strip())
+        for attr in filter(None, attrs.strip().split(".")):
+            loaded = getattr(loaded, attr)
+        return loaded
+
+
+class EntryPointCache:
+
+    """The ``entry_points`` of all ``doitoml`` groups, stored in a user cache.
+
+    Finding ``entry_points`` reads the metadata of every installed package. The
+    result is stored, keyed by each ``sys.path`` entry, its modified time, and the
+    modified times of the package metadata it contains, so later runs with the
+    same packages installed only need to list those directories.
+    """
+
+    #: the cache file, if enabled
+    path: Optional[Path]
+    #: all ``entry_points`` by group, then name, once found
+    _by_group: Optional[Dict[str, Dict[str, Any]]]
+    #: all ``entry_points``, once found
+    _described: Optional[List[DescribedEntryPoint]]
+
+    def __init__(self, cache_dir: Optional[Path] = None) -> None:
+        """Create a cache, stored in ``cache_dir``, if given."""
+        self.path = Path(cache_dir) / CACHE.ENTRY_POINTS if cache_dir else None
+        self._by_group = None
+        self._described = None
+
+    def describe(self) -> List[DescribedEntryPoint]:
+        """Describe all ``entry_points``, from the cache if still valid."""
+        if self._described is None:
+            key = self.get_key() if self.path else None
+            described = self.load(key)
+            if described is None:
+                described = self.find()
+                self.save(key, described)
+            self._described = described
+        return self._described
+
+    def group(self, group: str) -> Dict[str, Any]:
+        """Get the ``entry_points`` of one group, by name."""
+        if self._by_group is None:
+            by_group: Dict[str, Dict[str, Any]] = {}
+            for ep_group, name, value, _version in self.describe():
+                entry_point = CachedEntryPoint(str(name), str(value), str(ep_group))
+                group_eps = by_group.setdefault(entry_point.group, {})
+                group_eps[entry_point.name] = entry_point
+            self._by_group = by_group
+        return dict(self._by_group.get(group, {}))
+
+    def find(self) -> List[DescribedEntryPoint]:
+        """Read all ``entry_points`` from the metadata of installed packages."""
+        if sys.version_info < (3, 10):  # pragma: no cover
+            from importlib_metadata import entry_points as entry_points_in_group
+        else:  # pragma: no cover
+            from importlib.metadata import entry_points as entry_points_in_group
+
+        described = []
+        for group in vars(ENTRY_POINTS).values():
+            if not (isinstance(group, str) and group.startswith(f"{NAME}.")):
+                continue
+            for entry_point in entry_points_in_group(group=group):
+                dist = getattr(entry_point, "dist", None)
+                version = dist.version if dist else None
+                described += [[group, entry_point.name, entry_point.value, version]]
+        return sorted(described, key=str)
+
+    def get_key(self) -> str:
+        """Hash where installed packages are, and when they last changed.
+
+        The version of ``doitoml`` is in the name of its own metadata directory, so
+        is not read here.
+        """
+        key: List[Any] = [CACHE.VERSION, sys.executable, sys.version]
+        for entry in sys.path:
+            try:
+                mtime_ns = Path(entry or ".").stat().st_mtime_ns
+                with os.scandir(entry or ".") as listing:
+                    dists = sorted(
+                        [child.name, child.stat().st_mtime_ns]
+                        for child in listing
+                        if child.name.endswith(DIST_SUFFIXES)
+                    )
+            except NotADirectoryError:
+                dists = []
+            except OSError:
+                mtime_ns, dists = None, []
+            key += [[entry, mtime_ns, dists]]
+        return hashlib.sha256(json.dumps(key).encode(UTF8)).hexdigest()
+
+    def load(self, key: Optional[str]) -> Optional[List[DescribedEntryPoint]]:
+        """Read the cached ``entry_points``, if found for the same ``key``."""
+        if self.path is None or key is None:
+            return None
+        try:
+            cached = json.loads(self.path.read_text(encoding=UTF8))
+            if cached["key"] == key:
+                return cast(List[DescribedEntryPoint], cached["entry_points"])
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        return None
+
+    def save(self, key: Optional[str], described: List[DescribedEntryPoint]) -> None:
+        """Store the ``entry_points``, replacing the file in one step."""
+        if self.path is None or key is None:
+            return
+        cached = {"key": key, "entry_points": described}
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_text(json.dumps(cached), encoding=UTF8)
+            tmp_path.replace(self.path)
+        except OSError:  # pragma: no cover
+            tmp_path.unlink(missing_ok=True)
+
+
+class EntryPointGroup(Mapping[str, T]):
+
+    """The plugins of one ``entry_points`` group, each imported when first needed.
+
+    Names are found in package metadata, without importing anything. Looking up
+    a name imports and creates only that plugin, while iterating creates them all,
+    sorted by ``rank``, then name. Plugins missing a dependency are skipped.
+    """
+
+    #: a reference to the parent
+    entry_points: "EntryPoints"
+    #: the ``entry_points`` group
+    group: str
+    #: the plugins created so far
+    loaded: Dict[str, T]
+    #: the ``entry_points`` not yet loaded, by name
+    _unloaded: Dict[str, Any]
+    #: all the plugins, in rank order, once all are loaded
+    _ranked: Optional[Dict[str, T]]
+
+    def __init__(self, entry_points: "EntryPoints", group: str) -> None:
+        """Find the names of the plugins in a group, without loading any."""
+        self.entry_points = entry_points
+        self.group = group
+        self.loaded = {}
+        self._unloaded = entry_points.cache.group(group)
+        self._ranked = None
+
+    def names(self) -> List[str]:
+        """List the names of all plugins, loaded or not, without loading any."""
+        return sorted({*self.loaded, *self._unloaded})
+
+    def ranked(self, names: Iterable[str]) -> Dict[str, T]:
+        """Get only the plugins with some names, in rank order."""
+        found = [(name, self.get(name)) for name in names]
+        return dict(
+            sorted(
+                ((name, plugin) for name, plugin in found if plugin is not None),
+                key=self.entry_points.rank_key,
+            ),
+        )
+
+    def __getitem__(self, name: str) -> T:
+        """Get a plugin, creating it if needed."""
+        plugin = self.loaded.get(name)
+        if plugin is None:
+            entry_point = self._unloaded.pop(name)
+            plugin = self.entry_points.load_entry_point(self.group, entry_point)
+            if plugin is None:
+                raise KeyError(name)
+            self.loaded[name] = plugin
+        return plugin
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the names of all plugins, creating them, in rank order."""
+        if self._ranked is None:
+            for name in [*self._unloaded]:
+                self.get(name)
+            self._ranked = dict(
+                sorted(self.loaded.items(), key=self.entry_points.rank_key),
+            )
+        return iter(self._ranked)
+
+    def __len__(self) -> int:
+        """Count all plugins, creating them."""
+        return sum(1 for _ in self)
+
+
 class EntryPoints:
 
     """A collection of named ``entry_points``."""
 
     doitoml: "DoiTOML"
-    dsl: Dict[str, "DSL"]
-    parsers: Dict[str, "Parser"]
-    config_parsers: Dict[str, "ConfigParser"]
-    actors: Dict[str, "Actor"]
-    templaters: Dict[str, "Templater"]
-    updaters: Dict[str, "Updater"]
-    skippers: Dict[str, "Skipper"]
+    cache: EntryPointCache
+    dsl: EntryPointGroup["DSL"]
+    dsl_index: DslIndex
+    parsers: EntryPointGroup["Parser"]
+    config_parsers: EntryPointGroup["ConfigParser"]
+    actors: EntryPointGroup["Actor"]
+    templaters: EntryPointGroup["Templater"]
+    updaters: EntryPointGroup["Updater"]
+    skippers: EntryPointGroup["Skipper"]
 
     def __init__(self, doitoml: "DoiTOML") -> None:
         """Create a new collection of loaded ``entry_points``."""
         self.doitoml = doitoml
+        self.cache = EntryPointCache(get_user_cache_dir())
 
     def initialize(self) -> None:
-        """Load all ``entry_points``."""
-        # load the parsers
+        """Find all ``entry_points``, only loading the DSL."""
         self.config_parsers = self.load_entry_point_group(ENTRY_POINTS.CONFIG)
         self.parsers = self.load_entry_point_group(ENTRY_POINTS.PARSER)
-        # load DSL, which might reference parsers
+        # load DSL, which might reference parser names
         self.dsl = self.load_entry_point_group(ENTRY_POINTS.DSL)
+        self.dsl_index = DslIndex(self.dsl)
         self.actors = self.load_entry_point_group(ENTRY_POINTS.ACTOR)
         self.templaters = self.load_entry_point_group(ENTRY_POINTS.TEMPLATER)
         self.updaters = self.load_entry_point_group(ENTRY_POINTS.UPDATER)
         self.skippers = self.load_entry_point_group(ENTRY_POINTS.SKIPPER)
 
-    def load_entry_point_group(self, group: str) -> Dict[str, Any]:
-        """Find and load ``entry_points`` from installed packages."""
-        eps = {}
+    def load_entry_point_group(self, group: str) -> EntryPointGroup[Any]:
+        """Find ``entry_points`` from installed packages, to load when needed."""
+        return EntryPointGroup(self, group)
 
-        for entry_point in entry_points(group=group):
-            try:
-                eps[entry_point.name] = entry_point.load()(self.doitoml)
-            except MissingDependencyError as err:
-                self.doitoml.log.info(
-                    "%s %s is missing a dependency: %s",
-                    group,
-                    entry_point.name,
-                    err,
-                )
-            except Exception as err:  # pragma: no cover
-                message = (
-                    f"{group} {entry_point.name} unexpectedly failed to load {err}"
-                )
-                raise EntryPointError(message) from err
-
-        return dict(sorted(eps.items(), key=self.rank_key))
+    def load_entry_point(self, group: str, entry_point: Any) -> Any:
+        """Load and create a single plugin, or ``None`` if missing a dependency."""
+        try:
+            plugin = entry_point.load()(self.doitoml)
+            self.check_cache_safe(group, entry_point, plugin)
+            return plugin
+        except MissingDependencyError as err:
+            self.doitoml.log.info(
+                "%s %s is missing a dependency: %s",
+                group,
+                entry_point.name,
+                err,
+            )
+        except Exception as err:  # pragma: no cover
+            message = f"{group} {entry_point.name} unexpectedly failed to load {err}"
+            raise EntryPointError(message) from err
+        return None
+
+    def check_cache_safe(self, group: str, entry_point: Any, plugin: Any) -> None:
+        """Prevent caching config if a plugin might not report what it reads.
+
+        Plugins from other packages must set ``cache_safe = True``, to promise they
+        only read files, environment variables, and directories through ``doitoml``.
+        """
+        module_name = entry_point.value.partition(":")[0]
+        if module_name.split(".")[0] == NAME or getattr(plugin, "cache_safe", False):
+            return
+        self.doitoml.config_cache.uncacheable(
+            f"{group} {entry_point.name} from {module_name} is not `cache_safe`",
+        )
 
     def rank_key(self, key_ep: Tuple[str, Any]) -> Tuple[Union[int, float], str]:
         """Return a sort key based on the ``entry_point``'s ``rank`` and key."""
@@ -46,6 +46,11 @@ class UnresolvedError(ConfigError):
     """A config error related to unresolved values."""
 
 
+class CircularReferenceError(UnresolvedError):
+
+    """A config error related to values which (eventually) reference themselves."""
+
+
 class PrefixError(ConfigError):
 
     """A config error related to prefixes of configuration files."""
@@ -1,29 +1,146 @@
 """Custom loaders for doit tasks."""
+import json
+import os
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, List
 
-from doit.cmd_base import DodoTaskLoader
+from doit.cmd_base import Command, DodoTaskLoader
+from doit.task import Task
 
+from .constants import CACHE, DEFAULTS, ENV_VARS, UTF8
 from .doitoml import DoiTOML
 
+#: a ``doit`` command line option to disable caching resolved configuration
+opt_doitoml_cache = {
+    "section": "task loader",
+    "name": "doitoml_cache",
+    "short": "",
+    "long": "doitoml-cache",
+    "inverse": "no-doitoml-cache",
+    "type": bool,
+    "default": True,
+    "help": (
+        "cache resolved ``doitoml`` configuration next to the dependency file "
+        "[default: %(default)s]"
+    ),
+}
+
+#: a ``doit`` command line option to only resolve the selected tasks
+opt_doitoml_lazy = {
+    "section": "task loader",
+    "name": "doitoml_lazy",
+    "short": "",
+    "long": "doitoml-lazy",
+    "inverse": "no-doitoml-lazy",
+    "type": bool,
+    "default": False,
+    "help": (
+        "only resolve ``doitoml`` tasks named on the command line, and the tasks "
+        "they depend on by ``task_dep``, ``setup``, or ``file_dep`` "
+        "[default: %(default)s]"
+    ),
+}
+
+#: a ``doit`` command line option to find config in every directory
+opt_doitoml_discover = {
+    "section": "task loader",
+    "name": "doitoml_discover",
+    "short": "",
+    "long": "doitoml-discover",
+    "inverse": "no-doitoml-discover",
+    "type": bool,
+    "default": False,
+    "help": (
+        "find ``doitoml`` config in every ``pyproject.toml`` and ``package.json`` "
+        "under the working directory [default: %(default)s]"
+    ),
+}
+
+#: a ``doit`` command line option to only load the sources the selected tasks need
+opt_doitoml_lazy_sources = {
+    "section": "task loader",
+    "name": "doitoml_lazy_sources",
+    "short": "",
+    "long": "doitoml-lazy-sources",
+    "inverse": "no-doitoml-lazy-sources",
+    "type": bool,
+    "default": False,
+    "help": (
+        "only load ``doitoml`` sources needed by the tasks named on the command "
+        "line, and the tasks they depend on by ``task_dep``, ``setup``, or "
+        "``file_dep``, and all ``env`` [default: %(default)s]"
+    ),
+}
+
 
 class DoitomlLoader(DodoTaskLoader):
 
     """A loader that looks for all known config files."""
 
     doitoml: DoiTOML
+    #: options for ``DoiTOML``, kept until the selected tasks are known
+    doitoml_options: Dict[str, Any]
+    #: whether to wait for the selected tasks before loading any sources
+    lazy_sources: bool
+
+    cmd_options = (
+        *DodoTaskLoader.cmd_options,
+        opt_doitoml_cache,
+        opt_doitoml_lazy,
+        opt_doitoml_discover,
+        opt_doitoml_lazy_sources,
+    )
 
     def setup(self, opt_values: Dict[str, Any]) -> None:
         """Discover tasks in all config files."""
         cwd = Path(opt_values["cwdPath"]) if opt_values["cwdPath"] else Path.cwd()
 
-        self.doitoml = DoiTOML(cwd=opt_values["cwdPath"], discover_config_paths=True)
+        cache_dir = None
+        dep_file = opt_values.get("dep_file")
+        if dep_file and opt_values.get("doitoml_cache", True):
+            cache_dir = (cwd / dep_file).parent / CACHE.DIR
+
+        self.doitoml_options = {
+            "cwd": opt_values["cwdPath"],
+            "discover_config_paths": (
+                DEFAULTS.DISCOVER_TREE if opt_values.get("doitoml_discover") else True
+            ),
+            "cache_dir": cache_dir,
+            "lazy_tasks": opt_values.get("doitoml_lazy", False),
+        }
+        self.lazy_sources = opt_values.get("doitoml_lazy_sources", False)
+        if not self.lazy_sources:
+            self.doitoml = DoiTOML(**self.doitoml_options)
 
         if (cwd / "dodo.py").exists():
             super().setup(opt_values)
 
-        tasks = self.doitoml.tasks()
+        # lazy tasks are added once ``load_tasks`` knows which are selected
+        lazy = self.lazy_sources or self.doitoml.config.lazy_tasks
+        self.add_tasks({} if lazy else self.doitoml.tasks())
+
+    def load_tasks(self, cmd: Command, pos_args: List[str]) -> List[Task]:
+        """Resolve any lazy tasks selected on the command line, then load tasks."""
+        selectors = [arg for arg in pos_args if arg[:1] != "-" and "=" not in arg]
+        if self.lazy_sources:
+            self.doitoml = DoiTOML(**self.doitoml_options, selectors=selectors)
+        if self.lazy_sources or self.doitoml.config.lazy_tasks:
+            self.add_tasks(self.doitoml.tasks(selectors))
+        tasks: List[Task] = super().load_tasks(cmd, pos_args)
+        self.maybe_dump_timings()
+        return tasks
+
+    def maybe_dump_timings(self) -> None:
+        """Write timings as JSON, if requested by an environment variable."""
+        timings_path = os.environ.get(ENV_VARS.TIMINGS)
+        if timings_path:
+            path = Path(timings_path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            timings = self.doitoml.timings.to_dict()
+            path.write_text(json.dumps(timings, indent=2), encoding=UTF8)
 
+    def add_tasks(self, tasks: Dict[str, Any]) -> None:
+        """Add task functions to the namespace."""
         if getattr(self, "namespace", None):
             self.namespace.update(tasks)  # type: ignore
         else:
@@ -1 +1,8 @@
 """optional schema for ``doitoml``."""
+from pathlib import Path
+
+#: the version of the latest schema
+LATEST_VERSION = "0"
+
+#: the latest schema, as TOML
+LATEST_SCHEMA = Path(__file__).parent / f"v{LATEST_VERSION}.schema.toml"
@@ -0,0 +1,125 @@
+"""A persistent cache of validated configuration."""
+import hashlib
+import json
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Mapping, Optional, Set
+
+from doitoml import _version
+from doitoml.constants import CACHE, UTF8
+from doitoml.utils.fs import replace_text
+
+from . import LATEST_SCHEMA
+
+if TYPE_CHECKING:
+    from doitoml.doitoml import DoiTOML
+
+
+class ValidationCache:
+
+    """Hashes of normalized config data which passed validation.
+
+    The data is split into the ``env``, ``paths``, and ``tokens``, and the tasks
+    of each source prefix, each shaped like a whole config, and keyed by a hash
+    of the schema and its JSON. Only the parts not yet known to be valid need
+    ``jsonschema``. Only the hashes used by the last run are stored.
+    """
+
+    #: a reference to the parent
+    doitoml: "DoiTOML"
+    #: the cache file, if enabled
+    path: Optional[Path]
+    #: the number of parts already known to be valid
+    hits: int
+    #: the number of parts validated
+    misses: int
+    #: the hash of the schema, once read
+    _schema_digest: Optional[str]
+    #: the hashes read from the cache file, once loaded
+    _loaded: Optional[Set[str]]
+    #: the hashes used by this run
+    _used: Set[str]
+
+    def __init__(self, doitoml: "DoiTOML", cache_dir: Optional[Path] = None) -> None:
+        """Create a cache, stored in ``cache_dir``, if given."""
+        self.doitoml = doitoml
+        self.path = Path(cache_dir) / CACHE.VALIDATED if cache_dir else None
+        self.hits = 0
+        self.misses = 0
+        self._schema_digest = None
+        self._loaded = None
+        self._used = set()
+
+    def unvalidated(self, context: Mapping[str, Any]) -> Dict[str, Any]:
+        """Get the parts of normalized config data not yet known to be valid."""
+        known = self.load() | self._used
+        parts: Dict[str, Any] = {}
+        for part in self.split(context):
+            digest = self.digest(part)
+            if digest in known:
+                self.hits += 1
+                self._used.add(digest)
+            else:
+                parts[digest] = part
+        return parts
+
+    def split(self, context: Mapping[str, Any]) -> List[Dict[str, Any]]:
+        """Split normalized config data into parts, each a valid config shape."""
+        empty: Dict[str, Any] = {"env": {}, "paths": {}, "tokens": {}, "tasks": {}}
+        by_prefix: Dict[str, Dict[str, Any]] = {}
+        for name, task in context["tasks"].items():
+            by_prefix.setdefault(name.split(":", 1)[0], {})[name] = task
+        return [
+            {**empty, **{k: context[k] for k in ["env", "paths", "tokens"]}},
+            *({**empty, "tasks": tasks} for _, tasks in sorted(by_prefix.items())),
+        ]
+
+    def digest(self, part: Dict[str, Any]) -> str:
+        """Hash part of the normalized config data, with the schema."""
+        if self._schema_digest is None:
+            schema = LATEST_SCHEMA.read_bytes()
+            self._schema_digest = hashlib.sha256(schema).hexdigest()
+        text = json.dumps([self._schema_digest, part], sort_keys=True)
+        return hashlib.sha256(text.encode(UTF8)).hexdigest()
+
+    def add(self, digests: Set[str]) -> None:
+        """Remember parts which passed validation."""
+        self.misses += len(digests)
+        self._used |= digests
+
+    def load(self) -> Set[str]:
+        """Read the cache file, if not yet read."""
+        if self._loaded is None:
+            self._loaded = set()
+            if self.path is not None:
+                try:
+                    cached = json.loads(self.path.read_text(encoding=UTF8))
+                    if cached["version"] == [CACHE.VERSION, _version.__version__]:
+                        self._loaded = set(cached["validated"])
+                except FileNotFoundError:
+                    self.create()
+                except (OSError, ValueError, KeyError, TypeError) as err:
+                    self.doitoml.log.info("Validation cache unreadable: %s", err)
+        return self._loaded
+
+    def save(self) -> None:
+        """Store the hashes used by this run, if any changed."""
+        if self.path is None or self._loaded is None or self._used == self._loaded:
+            return
+        cached = {
+            "version": [CACHE.VERSION, _version.__version__],
+            "validated": sorted(self._used),
+        }
+        try:
+            replace_text(self.path, json.dumps(cached))
+        except OSError as err:  # pragma: no cover
+            self.doitoml.log.info("Validation not cached: %s", err)
+
+    def create(self) -> None:
+        """Create an empty cache file while resolving, as it may be listed."""
+        if self.path is None:  # pragma: no cover
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.touch()
+        except OSError as err:  # pragma: no cover
+            self.doitoml.log.info("Validation cache not created: %s", err)
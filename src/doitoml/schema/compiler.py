@@ -0,0 +1,356 @@
+"""Generate Python validators from JSON Schema, for ``doitoml``'s own schema.
+
+Only the Draft 7 keywords used by ``doitoml`` are supported. Errors have the same
+``schema_path``, ``data_path``, and ``message`` as ``jsonschema`` would give.
+"""
+import hashlib
+import os
+import re
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Mapping, Optional, cast
+
+from doitoml import _version
+from doitoml.constants import CACHE, UTF8
+from doitoml.errors import SchemaError
+from doitoml.sources.toml._toml import tomllib
+
+#: a single validation error
+SchemaErrorDict = Dict[str, str]
+
+#: a function which finds all validation errors in an instance
+CompiledValidator = Callable[[Any], List[SchemaErrorDict]]
+
+#: bump when the generated source changes
+COMPILER_VERSION = 1
+
+#: keywords which never cause errors
+ANNOTATIONS = {"$comment", "$id", "$schema", "default", "definitions", "description"}
+ANNOTATIONS |= {"examples", "title"}
+
+#: expressions which check an instance is of a JSON type, as in Draft 7
+TYPE_CHECKS = {
+    "array": "isinstance(data, list)",
+    "boolean": "isinstance(data, bool)",
+    "integer": (
+        "(isinstance(data, int) and not isinstance(data, bool)) "
+        "or (isinstance(data, float) and data.is_integer())"
+    ),
+    "null": "data is None",
+    "number": "isinstance(data, (int, float)) and not isinstance(data, bool)",
+    "object": "isinstance(data, dict)",
+    "string": "isinstance(data, str)",
+}
+
+#: helpers shared by all generated validators
+PROLOGUE = """
+def _equal(one, two):
+    if isinstance(one, bool) or isinstance(two, bool):
+        return one is two
+    if isinstance(one, list) and isinstance(two, list):
+        return len(one) == len(two) and all(map(_equal, one, two))
+    if isinstance(one, dict) and isinstance(two, dict):
+        return one.keys() == two.keys() and all(_equal(one[k], two[k]) for k in one)
+    return one == two
+
+
+def _parts(link):
+    parts = []
+    while link is not None:
+        link, part = link
+        parts.append(part)
+    return parts[::-1]
+
+
+def _error(sp, keyword, dp, message):
+    schema_path = [p for parts in _parts(sp) for p in parts] + [*keyword]
+    return {
+        "schema_path": "#/" + "/".join(map(str, schema_path)),
+        "data_path": "#/" + "/".join(map(str, _parts(dp))),
+        "message": message,
+    }
+"""
+
+
+class SchemaCompiler:
+
+    """Generate the Python source of a validator for a JSON Schema.
+
+    Each subschema becomes a function, which appends errors to a list as tuples
+    of linked schema and data paths, only joined into strings if an error is
+    found. ``$ref`` becomes a call to the function of the referenced subschema.
+    """
+
+    #: the whole schema
+    schema: Mapping[str, Any]
+    #: the source of each function, in order
+    functions: List[str]
+    #: the source of each constant, in order
+    constants: List[str]
+    #: function names, by ``$ref``
+    refs: Dict[str, str]
+
+    def __init__(self, schema: Mapping[str, Any]) -> None:
+        """Prepare to generate a validator for a schema."""
+        self.schema = schema
+        self.functions = []
+        self.constants = []
+        self.refs = {}
+
+    def generate(self, header: str = "") -> str:
+        """Generate the source of a module with a ``validate`` function."""
+        root = self.node(self.schema)
+        return "\n".join(
+            [
+                f"# {header}".strip(),
+                PROLOGUE,
+                *self.constants,
+                "",
+                *self.functions,
+                "def validate(data):",
+                "    errors = []",
+                f"    {root}(data, None, None, errors)",
+                "    return [_error(*error) for error in errors]",
+                "",
+            ],
+        )
+
+    def constant(self, value: Any) -> str:
+        """Define a module-level constant, returning its name."""
+        name = f"_C{len(self.constants)}"
+        self.constants += [f"{name} = {value!r}"]
+        return name
+
+    def ref(self, ref: str) -> str:
+        """Get the name of the function for a local ``$ref``, defining it once."""
+        name = self.refs.get(ref)
+        if name is None:
+            if not ref.startswith("#"):
+                message = f"Only local $ref can be compiled, not {ref}"
+                raise SchemaError(message)
+            target: Any = self.schema
+            for part in filter(None, ref[1:].split("/")):
+                target = target[part.replace("~1", "/").replace("~0", "~")]
+            name = self.refs[ref] = "_ref_" + re.sub(r"\W", "_", ref[1:])
+            self.define(name, target)
+        return name
+
+    def node(self, schema: Mapping[str, Any]) -> str:
+        """Get the name of the function for a subschema, defining it if needed."""
+        if "$ref" in schema:
+            # as in Draft 7, other keywords next to ``$ref`` are ignored
+            return self.ref(schema["$ref"])
+        name = f"_v{len(self.functions)}"
+        self.define(name, schema)
+        return name
+
+    def define(self, name: str, schema: Mapping[str, Any]) -> None:
+        """Define the function for a subschema, in keyword order."""
+        if "$ref" in schema:
+            target = self.ref(schema["$ref"])
+            body = [f"{target}(data, dp, sp, errors)"]
+        else:
+            # reserve a slot, so nested subschemas get their own names
+            index = len(self.functions)
+            self.functions += [""]
+            body = []
+            for keyword in schema:
+                if keyword in ANNOTATIONS:
+                    continue
+                method = getattr(self, f"keyword_{keyword}", None)
+                if method is None:
+                    message = f"JSON Schema keyword {keyword!r} cannot be compiled"
+                    raise SchemaError(message)
+                body += method(schema)
+        lines = [f"def {name}(data, dp, sp, errors):"]
+        lines += [f"    {line}" for line in body or ["pass"]]
+        source = "\n".join([*lines, "", ""])
+        if "$ref" in schema:
+            self.functions += [source]
+        else:
+            self.functions[index] = source
+
+    def error(self, keyword: str, message: str) -> str:
+        """Build a statement which appends an error, after ``repr(data)``."""
+        return f"errors.append((sp, ({keyword!r},), dp, repr(data) + {message!r}))"
+
+    def keyword_type(self, schema: Mapping[str, Any]) -> List[str]:
+        """Check the JSON type."""
+        types = schema["type"]
+        types = types if isinstance(types, list) else [types]
+        checks = " or ".join(f"({TYPE_CHECKS[t]})" for t in types)
+        checks = checks[1:-1] if len(types) == 1 else checks
+        reprs = ", ".join(map(repr, types))
+        return [
+            f"if not ({checks}):",
+            f"    {self.error('type', f' is not of type {reprs}')}",
+        ]
+
+    def keyword_required(self, schema: Mapping[str, Any]) -> List[str]:
+        """Check required properties of an object."""
+        keys = self.constant(tuple(schema["required"]))
+        return [
+            "if isinstance(data, dict):",
+            f"    for key in {keys}:",
+            "        if key not in data:",
+            (
+                "            errors.append((sp, ('required',), dp, "
+                "repr(key) + ' is a required property'))"
+            ),
+        ]
+
+    def keyword_properties(self, schema: Mapping[str, Any]) -> List[str]:
+        """Check the named properties of an object."""
+        lines = ["if isinstance(data, dict):"]
+        for key, subschema in schema["properties"].items():
+            func = self.node(subschema)
+            lines += [
+                f"    if {key!r} in data:",
+                (
+                    f"        {func}(data[{key!r}], (dp, {key!r}), "
+                    f"(sp, ('properties', {key!r})), errors)"
+                ),
+            ]
+        return lines
+
+    def keyword_additionalProperties(  # noqa: N802
+        self,
+        schema: Mapping[str, Any],
+    ) -> List[str]:
+        """Check the properties of an object not named in ``properties``."""
+        additional = schema["additionalProperties"]
+        if "patternProperties" in schema:
+            message = "JSON Schema keyword 'patternProperties' cannot be compiled"
+            raise SchemaError(message)
+        if additional is True:
+            return []
+        known = schema.get("properties")
+        extras = "[*data]"
+        if known:
+            names = self.constant(frozenset(known))
+            extras = f"[key for key in data if key not in {names}]"
+        if additional is False:
+            return [
+                "if isinstance(data, dict):",
+                f"    extras = sorted({extras}, key=str)",
+                "    if extras:",
+                "        verb = 'was' if len(extras) == 1 else 'were'",
+                (
+                    "        errors.append((sp, ('additionalProperties',), dp, "
+                    "'Additional properties are not allowed (%s %s unexpected)' "
+                    "% (', '.join(map(repr, extras)), verb)))"
+                ),
+            ]
+        func = self.node(additional)
+        return [
+            "if isinstance(data, dict):",
+            "    sub_sp = (sp, ('additionalProperties',))",
+            f"    for key in {extras if known else 'data'}:",
+            f"        {func}(data[key], (dp, key), sub_sp, errors)",
+        ]
+
+    def keyword_items(self, schema: Mapping[str, Any]) -> List[str]:
+        """Check every item of an array."""
+        items = schema["items"]
+        if not isinstance(items, dict):
+            message = "Only a single JSON Schema for 'items' can be compiled"
+            raise SchemaError(message)
+        func = self.node(items)
+        return [
+            "if isinstance(data, list):",
+            "    sub_sp = (sp, ('items',))",
+            "    for index, item in enumerate(data):",
+            f"        {func}(item, (dp, index), sub_sp, errors)",
+        ]
+
+    def keyword_enum(self, schema: Mapping[str, Any]) -> List[str]:
+        """Check a value is one of some values."""
+        enum = schema["enum"]
+        values = self.constant(enum)
+        return [
+            f"if not any(_equal(value, data) for value in {values}):",
+            f"    {self.error('enum', f' is not one of {enum!r}')}",
+        ]
+
+    def keyword_minLength(self, schema: Mapping[str, Any]) -> List[str]:  # noqa: N802
+        """Check the length of a string."""
+        min_length = schema["minLength"]
+        message = " should be non-empty" if min_length == 1 else " is too short"
+        return [
+            f"if isinstance(data, str) and len(data) < {min_length!r}:",
+            f"    {self.error('minLength', message)}",
+        ]
+
+    def keyword_oneOf(self, schema: Mapping[str, Any]) -> List[str]:  # noqa: N802
+        """Check a value is valid under exactly one of some subschemas."""
+        one_of = schema["oneOf"]
+        funcs = ", ".join(self.node(subschema) for subschema in one_of)
+        reprs = self.constant([repr(subschema) for subschema in one_of])
+        none_valid = " is not valid under any of the given schemas"
+        return [
+            "valid = []",
+            f"for index, func in enumerate(({funcs},)):",
+            "    sub_errors = []",
+            "    func(data, dp, (sp, ('oneOf', index)), sub_errors)",
+            "    if not sub_errors:",
+            "        valid.append(index)",
+            "if not valid:",
+            f"    {self.error('oneOf', none_valid)}",
+            "elif len(valid) > 1:",
+            f"    each = ', '.join({reprs}[index] for index in [*valid[1:], valid[0]])",
+            (
+                "    errors.append((sp, ('oneOf',), dp, "
+                "repr(data) + ' is valid under each of ' + each))"
+            ),
+        ]
+
+
+def load_validator(path: Path, cache_dir: Optional[Path] = None) -> CompiledValidator:
+    """Get a validator for a schema in TOML, from ``cache_dir`` if already generated.
+
+    The generated source is stored by the hash of the schema, and of the compiler.
+    Its first line repeats that hash, with the hash of the rest of the source, and
+    is checked before it is run.
+    """
+    schema_bytes = path.read_bytes()
+    compiler = [COMPILER_VERSION, _version.__version__, Path(__file__).read_bytes()]
+    key = [CACHE.VERSION, *compiler, schema_bytes]
+    digest = hashlib.sha256(repr(key).encode(UTF8)).hexdigest()
+    cached = cache_dir / f"{path.stem}-{digest}.py" if cache_dir else None
+
+    source = None
+    if cached is not None:
+        source = read_verified(cached, digest)
+
+    if source is None:
+        schema = tomllib.loads(schema_bytes.decode(UTF8))
+        generated = SchemaCompiler(schema).generate(f"generated from {path.name}")
+        source = f"{get_checksum(digest, generated)}\n{generated}"
+        if cached is not None:
+            tmp_path = cached.with_name(f"{cached.name}.{os.getpid()}.tmp")
+            try:
+                cached.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path.write_text(source, encoding=UTF8)
+                tmp_path.replace(cached)
+            except OSError:  # pragma: no cover
+                tmp_path.unlink(missing_ok=True)
+
+    namespace: Dict[str, Any] = {}
+    filename = str(cached or path)
+    exec(compile(source, filename, "exec"), namespace)  # noqa: S102
+    return cast(CompiledValidator, namespace["validate"])
+
+
+def get_checksum(digest: str, generated: str) -> str:
+    """Get the first line of a cached validator, for a key and the generated source."""
+    source_digest = hashlib.sha256(generated.encode(UTF8)).hexdigest()
+    return f"# doitoml {digest} {source_digest}"
+
+
+def read_verified(cached: Path, digest: str) -> Optional[str]:
+    """Read a cached validator, if its first line matches the key and the source."""
+    try:
+        source = cached.read_text(encoding=UTF8)
+    except (OSError, ValueError):
+        return None
+    checksum, _, generated = source.partition("\n")
+    return source if checksum == get_checksum(digest, generated) else None
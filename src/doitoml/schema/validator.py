@@ -3,20 +3,17 @@
 import os
 from pathlib import Path
 from pprint import pformat
-from typing import Any, Mapping, Optional, cast
+from typing import TYPE_CHECKING, Any, List, Mapping, Optional, cast
 
+from doitoml.constants import CACHE
 from doitoml.errors import MissingDependencyError, SchemaError
 from doitoml.sources.toml._toml import tomllib
+from doitoml.utils.path import get_user_cache_dir
 
-HAS_JSONSCHEMA = False
+from .compiler import CompiledValidator, SchemaErrorDict, load_validator
 
-try:
-    from jsonschema import Draft7Validator, ValidationError
-
-    HAS_JSONSCHEMA = True
-except ImportError as err:
-    message = "install `doitoml[jsonschema]` or `jsonschema[format]`"
-    raise MissingDependencyError(message) from err
+if TYPE_CHECKING:
+    from jsonschema import Draft7Validator
 
 HERE = Path(__file__).parent
 
@@ -34,13 +31,16 @@ class Version:
     #: the cached schema
     _schema: Optional[AnyMapping]
     #: the cached validator
-    _validator: Optional[Draft7Validator]
+    _validator: Optional["Draft7Validator"]
+    #: the cached validator, generated from the schema
+    _compiled: Optional[CompiledValidator]
 
     def __init__(self, version: str) -> None:
         """Initialize a validator."""
         self.path = HERE / f"v{version}.schema.toml"
         self._schema = None
         self._validator = None
+        self._compiled = None
 
     @property
     def schema(self) -> AnyMapping:
@@ -50,19 +50,29 @@ class Version:
         return self._schema
 
     @property
-    def validator(self) -> Draft7Validator:
-        """Get the cached validator."""
+    def validator(self) -> "Draft7Validator":
+        """Get the cached ``jsonschema`` validator, only importing it when needed."""
         if self._validator is None:  # pragma: no cover
+            try:
+                from jsonschema import Draft7Validator
+            except ImportError as err:
+                message = "install `doitoml[jsonschema]` or `jsonschema[format]`"
+                raise MissingDependencyError(message) from err
             self._validator = Draft7Validator(schema=self.schema)
         return self._validator
 
-    def validate(self, instance: Any) -> None:
-        """Validate an instance.
-
-        Something better would be https://json-schema.org/draft/2020-12/output/schema
-        """
+    @property
+    def compiled(self) -> CompiledValidator:
+        """Get the cached validator generated from the schema, kept in a user cache."""
+        if self._compiled is None:
+            user_cache_dir = get_user_cache_dir()
+            cache_dir = user_cache_dir / CACHE.SCHEMA if user_cache_dir else None
+            self._compiled = load_validator(self.path, cache_dir)
+        return self._compiled
+
+    def jsonschema_errors(self, instance: Any) -> List[SchemaErrorDict]:
+        """Find errors with ``jsonschema``, as ``compiled`` should."""
         errors = []
-        error: ValidationError
 
         for error in self.validator.iter_errors(instance):
             schema_path = "/".join(list(map(str, error.relative_schema_path)))
@@ -74,6 +84,16 @@ class Version:
                     "message": error.message,
                 },
             ]
+        return errors
+
+    def validate(self, *instances: Any) -> None:
+        """Validate some instances, reporting all of their errors together.
+
+        Something better would be https://json-schema.org/draft/2020-12/output/schema
+        """
+        errors = []
+        for instance in instances:
+            errors += self.compiled(instance)
 
         if errors:
             message = f"Invalid doitoml data: {pformat(errors)}"
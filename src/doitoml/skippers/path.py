@@ -29,6 +29,8 @@ class Exists(Skipper):
             if not spec_paths:
                 return False
             for spec in spec_paths:
-                if not Path(spec).exists():
+                exists = Path(spec).exists()
+                self.doitoml.config_cache.record_exists(spec, exists)
+                if not exists:
                     return False
         return True
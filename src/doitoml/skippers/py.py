@@ -49,15 +49,14 @@ class Py(Skipper):
         if not isinstance(skip, dict):  # pragma: no cover
             message = f"{source} provided unknown skip args {skip}"
             raise PyError(message)
+        self.doitoml.config_cache.uncacheable(f"{source} skips with custom Python")
         path_dotted_func, args_kwargs = list(skip.items())[0]
         args, kwargs = resolve_py_args(
             self.doitoml,
             source,
-            args_kwargs.pop("args", []),
-            args_kwargs.pop("kwargs", {}),
+            args_kwargs.get("args", []),
+            args_kwargs.get("kwargs", {}),
         )
-        args_kwargs.update(args=args, kwargs=kwargs)
-        args, kwargs = args_kwargs["args"], args_kwargs["kwargs"]
         # TODO: improve
         execution_context = ExecutionContext(
             cwd=source.path.parent,
@@ -0,0 +1,124 @@
+"""Shared caches of sources and parsed data."""
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from doitoml.timings import Timings
+
+    from ._source import Parser, Source, TextSource
+
+#: the part of the cache key which does not change when a file is edited
+ParseCacheSlot = Tuple[str, str, Callable[..., Any]]
+#: the ``stat`` of a file when it was parsed
+ParseCacheStat = Tuple[int, int]
+
+
+class ParseCache:
+
+    """A cache of parsed text sources, shared by all sources of a ``DoiTOML``.
+
+    Entries are keyed by the resolved path, ``mtime_ns``, size, encoding, and
+    ``parse`` method of the source's class: a changed file will be read and parsed
+    again, while e.g. a ``pyproject.toml`` read as both a config source and by
+    ``:get::toml`` is only parsed once. Sources may be parsed in threads.
+    """
+
+    #: the number of times a parsed value was reused
+    hits: int
+    #: the number of times a source was read and parsed
+    misses: int
+    #: the parsed data, and the ``stat`` it was parsed at
+    _parsed: Dict[ParseCacheSlot, Tuple[ParseCacheStat, Any]]
+    #: resolved paths
+    _resolved: Dict[Path, str]
+    #: where to record the time spent reading and parsing, if anywhere
+    timings: Optional["Timings"]
+    #: guards the counts, when parsing in threads
+    _lock: threading.Lock
+
+    def __init__(self, timings: Optional["Timings"] = None) -> None:
+        """Create an empty cache."""
+        self.timings = timings
+        self.hits = 0
+        self.misses = 0
+        self._parsed = {}
+        self._resolved = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Count the cached sources."""
+        return len(self._parsed)
+
+    def paths(self) -> List[str]:
+        """List the resolved paths of all parsed sources."""
+        return sorted({slot[0] for slot in self._parsed})
+
+    def get(self, source: "TextSource") -> Any:
+        """Get the parsed data for a source, reading and parsing it if needed."""
+        slot = self.slot(source)
+        stat = source.path.stat()
+        stat_key = (stat.st_mtime_ns, stat.st_size)
+        cached = self._parsed.get(slot)
+
+        if cached is not None and cached[0] == stat_key:
+            with self._lock:
+                self.hits += 1
+            return cached[1]
+
+        with self._lock:
+            self.misses += 1
+        if self.timings is None:
+            parsed = source.parse(source.read())
+        else:
+            timings = self.timings
+            with timings.timer(timings.parsed, slot[0], type(source).__name__):
+                parsed = source.parse(source.read())
+        self._parsed[slot] = (stat_key, parsed)
+        return parsed
+
+    def slot(self, source: "TextSource") -> ParseCacheSlot:
+        """Get the ``stat``-independent part of the key for a source."""
+        resolved = self._resolved.get(source.path)
+        if resolved is None:
+            resolved = self._resolved[source.path] = str(source.path.resolve())
+        return (resolved, source.encoding, type(source).parse)
+
+    def invalidate(self, path: Optional[Path] = None) -> None:
+        """Forget all parsed data, or only the data parsed from a single path."""
+        if path is None:
+            self._parsed.clear()
+            return
+
+        resolved = str(Path(path).resolve())
+        for slot in [*self._parsed]:
+            if slot[0] == resolved:
+                self._parsed.pop(slot)
+
+
+class SourceRegistry:
+
+    """A registry of sources, so each path is only loaded once per parser."""
+
+    #: the sources, keyed by their resolved path and parser
+    _sources: Dict[Tuple[str, "Parser"], "Source"]
+
+    def __init__(self) -> None:
+        """Create an empty registry."""
+        self._sources = {}
+
+    def __len__(self) -> int:
+        """Count the registered sources."""
+        return len(self._sources)
+
+    def get(self, path: Path, parser: "Parser") -> Optional["Source"]:
+        """Get a previously-registered source, if any."""
+        return self._sources.get((str(path), parser))
+
+    def load(self, path: Path, parser: "Parser") -> "Source":
+        """Get a source for a resolved path, loading it with a parser if needed."""
+        key = (str(path), parser)
+        source = self._sources.get(key)
+        if source is None:
+            source = self._sources[key] = parser(path)
+        return source
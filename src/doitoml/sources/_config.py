@@ -47,7 +47,7 @@ class ConfigSource(Source):
                 child_source, bits = getter.get_source_with_key(self, match, path_spec)
                 yield WrapperConfigSource(child_source, bits)
             else:
-                path = (self.path.parent / path_spec).resolve()
+                path = Path(doitoml.path_cache.resolve(self.path.parent / path_spec))
                 yield doitoml.config.load_config_source(path)
 
     @abc.abstractproperty
@@ -0,0 +1,362 @@
+"""Discover config sources anywhere under a directory."""
+import json
+import os
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from doitoml import _version
+from doitoml.constants import CACHE, UTF8
+from doitoml.utils.fs import IgnoreRule, Listing, parse_ignore_line, replace_text
+
+if TYPE_CHECKING:
+    from doitoml.doitoml import DoiTOML
+    from doitoml.types import Paths
+
+#: the most threads used to read directories, or files, at once
+DISCOVERY_THREADS = 8
+
+#: the fewest directories, or files, worth reading in each thread
+DISCOVERY_CHUNK = 64
+
+#: directories never walked, as they hold vendored or generated files
+PRUNED_DIRS = ("__pycache__", "bower_components", "node_modules", "site-packages")
+
+#: files which mark a directory as an environment, which is never walked
+ENV_MARKERS = ("conda-meta", "pyvenv.cfg")
+
+#: the name of files with rules for paths to skip
+GITIGNORE = ".gitignore"
+
+#: a directory's ``mtime_ns``, the child directories to walk, and the files to check
+DirEntry = Tuple[int, List[str], List[str]]
+
+#: a file's ``mtime_ns`` and size
+FileStat = Tuple[int, int]
+
+#: a file's ``mtime_ns`` and size, and whether it has any ``doitoml`` config
+FileEntry = Tuple[int, int, bool]
+
+#: the directories walked, files checked, and ``.gitignore`` files found
+Walked = Tuple[Dict[str, DirEntry], Dict[str, FileEntry], Dict[str, FileStat]]
+
+#: ``.gitignore`` rules which apply in a directory, and the directory of each
+InheritedRules = List[Tuple[str, IgnoreRule]]
+
+T = TypeVar("T")
+
+
+class TreeDiscovery:
+
+    """Find config sources in every directory under a root, reusing unchanged parts.
+
+    Each level of directories is read in threads. Hidden directories, ``PRUNED_DIRS``,
+    environments, and paths matched by ``.gitignore`` files in the tree are not
+    walked. Every file with the name of a ``well_known`` config source is parsed
+    in threads, and kept if it has any ``doitoml`` config.
+
+    With a cache directory, a directory is only read again if its ``mtime_ns``
+    changed, and a file is only parsed again if its ``mtime_ns`` or size changed.
+    If any ``.gitignore`` changed, the whole tree is read again.
+    """
+
+    #: a reference to the parent
+    doitoml: "DoiTOML"
+    #: the cache file, if enabled
+    path: Optional[Path]
+    #: the number of directories read
+    scans: int
+    #: the number of files parsed
+    parsed: int
+    #: the POSIX-style paths of config sources found, in order, once found
+    found: Optional[List[str]]
+    #: the directories walked, by POSIX-style path
+    _dirs: Dict[str, DirEntry]
+    #: files which may be config sources, by POSIX-style path
+    _files: Dict[str, FileEntry]
+    #: the ``mtime_ns`` and size of each ``.gitignore``, by POSIX-style path
+    _ignore_files: Dict[str, FileStat]
+    #: what was found by an earlier walk, once loaded
+    _loaded: Optional[Walked]
+    #: ``.gitignore`` rules, by directory
+    _rules: Dict[str, InheritedRules]
+
+    def __init__(self, doitoml: "DoiTOML", cache_dir: Optional[Path] = None) -> None:
+        """Create a discovery, cached in ``cache_dir``, if given."""
+        self.doitoml = doitoml
+        self.path = Path(cache_dir) / CACHE.DISCOVERED if cache_dir else None
+        self.scans = 0
+        self.parsed = 0
+        self.found = None
+        self._dirs = {}
+        self._files = {}
+        self._ignore_files = {}
+        self._loaded = None
+        self._rules = {}
+
+    def find(self, root: Path) -> "Paths":
+        """Find the config sources under a directory, in the order they are used.
+
+        Sources in a directory come before those in its descendants, and each
+        directory's descendants are sorted by path.
+        """
+        if self.found is None:
+            names = self.get_names()
+            root_posix = root.resolve().as_posix()
+            dirs, files, ignore_files = self.load(root_posix, names)
+            if self.stat_all([*ignore_files]) != ignore_files:
+                dirs = {}
+            self.walk(root_posix, names, dirs)
+            if dirs and self._ignore_files != ignore_files:
+                # a ``.gitignore`` was added or removed: its rules apply to the tree
+                self.walk(root_posix, names, {})
+            self.found = self.check_files(root_posix, names, files)
+            self.save(root_posix, names)
+        return [Path(found) for found in self.found]
+
+    def get_names(self) -> List[str]:
+        """Get the names of ``well_known`` config sources, in parser order."""
+        names: Dict[str, None] = {}
+        for parser in self.doitoml.entry_points.config_parsers.values():
+            names.update({Path(known).name: None for known in parser.well_known})
+        return [*names]
+
+    def walk(
+        self,
+        root: str,
+        names: List[str],
+        dirs: Dict[str, DirEntry],
+    ) -> None:
+        """Walk the tree level by level, only reading changed directories."""
+        self._dirs = {}
+        self._rules = {}
+        level = [root]
+        while level:
+            next_level: List[str] = []
+            cached = [dirs.get(parent) for parent in level]
+            for parent, scanned in zip(level, self.map(self.scan, level, cached)):
+                mtime_ns, listing = scanned
+                if mtime_ns is None:
+                    continue
+                if listing is None:
+                    entry = dirs[parent]
+                else:
+                    self.scans += 1
+                    entry = self.prune(root, parent, mtime_ns, listing, names)
+                self._dirs[parent] = entry
+                next_level += [f"{parent}/{child}" for child in entry[1]]
+            level = next_level
+
+        self._ignore_files = self.stat_all(
+            [
+                f"{parent}/{GITIGNORE}"
+                for parent, entry in self._dirs.items()
+                if GITIGNORE in entry[2]
+            ],
+        )
+
+    def scan(
+        self,
+        path: str,
+        cached: Optional[DirEntry] = None,
+    ) -> Tuple[Optional[int], Optional[Listing]]:
+        """Get the ``mtime_ns`` of a directory, and its listing, if it changed."""
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns  # noqa: PTH116
+        except OSError:
+            return None, None
+        if cached is not None and cached[0] == mtime_ns:
+            return mtime_ns, None
+        listing: Listing = {}
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:  # pragma: no cover
+                        is_dir = False
+                    listing[entry.name] = (is_dir, entry.is_symlink())
+        except OSError:  # pragma: no cover
+            return None, None
+        return mtime_ns, listing
+
+    def prune(
+        self,
+        root: str,
+        parent: str,
+        mtime_ns: int,
+        listing: Listing,
+        names: List[str],
+    ) -> DirEntry:
+        """Find the child directories worth walking, and files worth checking."""
+        if any(marker in listing for marker in ENV_MARKERS):
+            return mtime_ns, [], []
+        rules = self.get_rules(root, parent)
+        children = sorted(
+            name
+            for name, (is_dir, is_symlink) in listing.items()
+            if is_dir
+            and not is_symlink
+            and name[0] != "."
+            and name not in PRUNED_DIRS
+            and not self.is_ignored(rules, f"{parent}/{name}", is_dir=True)
+        )
+        files = [
+            name
+            for name in [*names, GITIGNORE]
+            if name in listing
+            and not listing[name][0]
+            and (name == GITIGNORE or not self.is_ignored(rules, f"{parent}/{name}"))
+        ]
+        return mtime_ns, children, files
+
+    def get_rules(self, root: str, path: str) -> InheritedRules:
+        """Get the ``.gitignore`` rules of a directory, and all its parents."""
+        rules = self._rules.get(path)
+        if rules is None:
+            parent = posixpath.dirname(path)
+            rules = []
+            if path not in (root, parent):
+                rules += self.get_rules(root, parent)
+            ignore_file = Path(path, GITIGNORE)
+            if ignore_file.is_file():
+                text = ignore_file.read_text(encoding=UTF8)
+                rules += [
+                    (path, rule)
+                    for rule in filter(None, map(parse_ignore_line, text.splitlines()))
+                ]
+            self._rules[path] = rules
+        return rules
+
+    def is_ignored(
+        self,
+        rules: InheritedRules,
+        path: str,
+        is_dir: bool = False,
+    ) -> bool:
+        """Check whether the last matching ``.gitignore`` rule ignores a path."""
+        ignored = False
+        for base, rule in rules:
+            rel = path[len(base) + 1 :]
+            if (is_dir or not rule.dir_only) and rule.pattern.fullmatch(rel):
+                ignored = not rule.negate
+        return ignored
+
+    def check_files(
+        self,
+        root: str,
+        names: List[str],
+        files: Dict[str, FileEntry],
+    ) -> List[str]:
+        """Parse new, or changed, files, returning those with ``doitoml`` config."""
+        candidates = sorted(
+            (
+                (tuple(parent[len(root) + 1 :].split("/")) if parent != root else ()),
+                names.index(name),
+                f"{parent}/{name}",
+            )
+            for parent, (_, _, dir_files) in self._dirs.items()
+            for name in dir_files
+            if name != GITIGNORE
+        )
+        paths = [path for _, _, path in candidates]
+        stats = self.stat_all(paths)
+        unknown = {
+            path: None
+            for path, stat in stats.items()
+            if files.get(path, (0, 0, False))[:2] != stat
+        }
+
+        config = self.doitoml.config
+        sources = [config.load_config_source(Path(path)) for path in unknown]
+        errors = config.read_config_sources(sources) if sources else []
+        self.parsed += len(sources)
+
+        self._files = {
+            path: files[path] for path in stats if path in files and path not in unknown
+        }
+        for path, source, error in zip(unknown, sources, errors):
+            if error is not None:
+                self.doitoml.log.warning("Not discovering %s: %s", path, error)
+                continue
+            self._files[path] = (*stats[path], bool(source.raw_config))
+
+        return [path for path in paths if self._files.get(path, (0, 0, False))[2]]
+
+    def stat_all(self, paths: List[str]) -> Dict[str, FileStat]:
+        """Get the ``mtime_ns`` and size of files which exist, in threads."""
+        stats: Dict[str, FileStat] = {}
+        for path, stat in zip(paths, self.map(self.stat, paths)):
+            if stat is not None:
+                stats[path] = stat
+        return stats
+
+    def map(self, func: Callable[..., T], *items: List[Any]) -> List[T]:
+        """Call a function with each of some items, in chunks in threads if many."""
+        count = len(items[0])
+        if count < DISCOVERY_CHUNK * 2:
+            return [*map(func, *items)]
+        size = max(DISCOVERY_CHUNK, -(-count // DISCOVERY_THREADS))
+        chunks = [[part[i : i + size] for part in items] for i in range(0, count, size)]
+        with ThreadPoolExecutor(max_workers=len(chunks)) as pool:
+            results = pool.map(lambda chunk: [*map(func, *chunk)], chunks)
+            return [result for chunk in results for result in chunk]
+
+    def stat(self, path: str) -> Optional[FileStat]:
+        """Get the ``mtime_ns`` and size of a file, if it exists."""
+        try:
+            stat = os.stat(path)  # noqa: PTH116
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def get_key(self, root: str, names: List[str]) -> List[object]:
+        """Describe everything that changes which files could be found."""
+        version = [CACHE.VERSION, _version.__version__]
+        return [*version, root, names, [*PRUNED_DIRS], [*ENV_MARKERS]]
+
+    def load(self, root: str, names: List[str]) -> Walked:
+        """Read the directories, files, and ``.gitignore`` files of an earlier walk."""
+        self._loaded = ({}, {}, {})
+        if self.path is None:
+            return self._loaded
+        try:
+            cached = json.loads(self.path.read_text(encoding=UTF8))
+            if cached["key"] == json.loads(json.dumps(self.get_key(root, names))):
+                self._loaded = (
+                    {k: (v[0], v[1], v[2]) for k, v in cached["dirs"].items()},
+                    {k: (v[0], v[1], v[2]) for k, v in cached["files"].items()},
+                    {k: (v[0], v[1]) for k, v in cached["ignore_files"].items()},
+                )
+        except FileNotFoundError:
+            self.create()
+        except (OSError, ValueError, KeyError, TypeError, IndexError) as err:
+            self.doitoml.log.info("Discovery cache unreadable: %s", err)
+        return self._loaded
+
+    def save(self, root: str, names: List[str]) -> None:
+        """Store the directories, and files, of this walk, if any changed."""
+        current = (self._dirs, self._files, self._ignore_files)
+        if self.path is None or self._loaded == current:
+            return
+        cached = {
+            "key": self.get_key(root, names),
+            "dirs": self._dirs,
+            "files": self._files,
+            "ignore_files": self._ignore_files,
+        }
+        try:
+            replace_text(self.path, json.dumps(cached))
+        except OSError as err:  # pragma: no cover
+            self.doitoml.log.info("Discovery not cached: %s", err)
+
+    def create(self) -> None:
+        """Create an empty cache file while discovering, as it may be listed."""
+        if self.path is None:  # pragma: no cover
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.touch()
+        except OSError as err:  # pragma: no cover
+            self.doitoml.log.info("Discovery cache not created: %s", err)
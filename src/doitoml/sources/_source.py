@@ -10,6 +10,8 @@ from doitoml.errors import DoitomlError, ParseError
 if TYPE_CHECKING:
     from doitoml.doitoml import DoiTOML
 
+    from ._cache import ParseCache
+
 
 class Source:
 
@@ -35,10 +37,18 @@ class Source:
 
 class TextSource(Source):
     encoding: str
-
-    def __init__(self, path: Path, encoding: Optional[str] = None) -> None:
+    #: a cache of parsed data, shared with other sources
+    cache: Optional["ParseCache"]
+
+    def __init__(
+        self,
+        path: Path,
+        encoding: Optional[str] = None,
+        cache: Optional["ParseCache"] = None,
+    ) -> None:
         super().__init__(path)
         self.encoding = encoding or UTF8
+        self.cache = cache
 
     def read(self) -> str:
         """Read the source exists."""
@@ -53,8 +63,14 @@ class JsonLikeSource(TextSource):
     def parse(self, data: str) -> Any:
         """Parse the data."""
 
+    def read_parsed(self) -> Any:
+        """Read and parse the source, reusing cached data if available."""
+        if self.cache is None:
+            return self.parse(self.read())
+        return self.cache.get(self)
+
     def to_dict(self) -> Dict[str, Any]:
-        parsed = self.parse(self.read())
+        parsed = self.read_parsed()
         if isinstance(parsed, dict):
             return parsed
 
@@ -23,4 +23,4 @@ class JsonParser(Parser):
 
     def __call__(self, path: Path) -> JsonSource:
         """Find a JSON Source."""
-        return JsonSource(path)
+        return JsonSource(path, cache=self.doitoml.parse_cache)
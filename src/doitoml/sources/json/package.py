@@ -33,4 +33,4 @@ class PackageJsonParser(ConfigParser):
 
     def __call__(self, path: Path) -> PackageJson:
         """Parse a ``doitoml`` configuration from ``pyproject.toml``."""
-        return PackageJson(path)
+        return PackageJson(path, cache=self.doitoml.parse_cache)
@@ -25,4 +25,4 @@ class TomlParser(Parser):
 
     def __call__(self, path: Path) -> TomlSource:
         """Find a TOML Source."""
-        return TomlSource(path)
+        return TomlSource(path, cache=self.doitoml.parse_cache)
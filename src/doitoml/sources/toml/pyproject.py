@@ -31,4 +31,4 @@ class PyprojectTomlParser(ConfigParser):
 
     def __call__(self, path: Path) -> PyprojectToml:
         """Parse a ``doitoml`` configuration from ``pyproject.toml``."""
-        return PyprojectToml(path)
+        return PyprojectToml(path, cache=self.doitoml.parse_cache)
@@ -27,4 +27,4 @@ class YamlParser(Parser):
 
     def __call__(self, path: Path) -> YamlSource:
         """Find a YAML Source."""
-        return YamlSource(path)
+        return YamlSource(path, cache=self.doitoml.parse_cache)
@@ -0,0 +1,197 @@
+"""A compact representation of resolved tasks."""
+import sys
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterator, Mapping, Optional, Tuple, cast
+
+from .constants import DOIT_TASK, DOITOML_META, NAME
+from .types import LogPaths, Task
+
+if TYPE_CHECKING:
+    from .sources._config import ConfigSource
+
+
+def intern_prefixes(prefixes: Tuple[str, ...]) -> Tuple[str, ...]:
+    """Share the strings of task names, which repeat across many tasks."""
+    return tuple(map(sys.intern, prefixes))
+
+
+class TaskRecord(Mapping[str, Any]):
+
+    """A resolved task, much smaller than the ``doit`` task it will become.
+
+    Resolved fields are kept as tuples, the config source is kept by reference,
+    and any other values are shared with the task as found in the source.
+    As a read-only mapping, a record looks like the ``doit`` task, but a real
+    one is only built by ``to_task``, e.g. when ``doit`` asks for it.
+    """
+
+    __slots__ = (
+        "prefixes",
+        "source",
+        "actions",
+        "file_dep",
+        "targets",
+        "clean",
+        "uptodate",
+        "cwd",
+        "log",
+        "env",
+        "meta",
+        "doitoml_meta",
+        "extra",
+    )
+
+    #: the interned prefixes of the task
+    prefixes: Tuple[str, ...]
+    #: the config source which defined the task
+    source: "ConfigSource"
+    #: the resolved actions
+    actions: Tuple[Any, ...]
+    #: the resolved paths of ``file_dep``
+    file_dep: Tuple[Any, ...]
+    #: the resolved paths of ``targets``
+    targets: Tuple[Any, ...]
+    #: the resolved paths of ``clean``
+    clean: Tuple[Any, ...]
+    #: the resolved ``uptodate`` checks, if given, or an invalid value for the schema
+    uptodate: Optional[Any]
+    #: the working directory
+    cwd: Path
+    #: the paths of the stderr and stdout logs
+    log: LogPaths
+    #: the resolved environment variables, if any
+    env: Optional[Dict[str, str]]
+    #: any other ``meta``, if any
+    meta: Optional[Dict[str, Any]]
+    #: any other ``meta.doitoml``, e.g. ``skip``, if any
+    doitoml_meta: Optional[Dict[str, Any]]
+    #: any other ``doit`` fields, e.g. ``doc`` or ``task_dep``, if any
+    extra: Optional[Dict[str, Any]]
+
+    def __init__(  # noqa: PLR0913
+        self,
+        prefixes: Tuple[str, ...],
+        source: "ConfigSource",
+        actions: Tuple[Any, ...],
+        file_dep: Tuple[Any, ...],
+        targets: Tuple[Any, ...],
+        clean: Tuple[Any, ...],
+        uptodate: Optional[Any],
+        cwd: Path,
+        log: LogPaths,
+        env: Optional[Dict[str, str]] = None,
+        meta: Optional[Dict[str, Any]] = None,
+        doitoml_meta: Optional[Dict[str, Any]] = None,
+        extra: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Create a record from already-resolved values."""
+        self.prefixes = intern_prefixes(prefixes)
+        self.source = source
+        self.actions = actions
+        self.file_dep = file_dep
+        self.targets = targets
+        self.clean = clean
+        self.uptodate = uptodate
+        self.cwd = cwd
+        self.log = log
+        self.env = env or None
+        self.meta = meta or None
+        self.doitoml_meta = doitoml_meta or None
+        self.extra = extra or None
+
+    @classmethod
+    def from_task(
+        cls,
+        prefixes: Tuple[str, ...],
+        source: "ConfigSource",
+        task: Mapping[str, Any],
+    ) -> "TaskRecord":
+        """Create a record from a task with normalized ``meta``."""
+        known = {DOIT_TASK.ACTIONS, DOIT_TASK.UPTODATE, DOIT_TASK.META}
+        known.update(DOIT_TASK.RELATIVE_LISTS)
+        meta = dict(task[DOIT_TASK.META])
+        dt_meta = dict(meta.pop(NAME))
+        dt_meta.pop(DOITOML_META.SOURCE, None)
+        uptodate = task.get(DOIT_TASK.UPTODATE)
+        return cls(
+            prefixes,
+            source,
+            actions=tuple(task[DOIT_TASK.ACTIONS]),
+            file_dep=tuple(task.get("file_dep", ())),
+            targets=tuple(task.get("targets", ())),
+            clean=tuple(task.get("clean", ())),
+            uptodate=tuple(uptodate) if isinstance(uptodate, list) else uptodate,
+            cwd=dt_meta.pop(DOITOML_META.CWD),
+            log=tuple(dt_meta.pop(DOITOML_META.LOG)),
+            env=dt_meta.pop(DOITOML_META.ENV, None),
+            meta=meta,
+            doitoml_meta=dt_meta,
+            extra={k: v for k, v in task.items() if k not in known},
+        )
+
+    def get_meta(self) -> Dict[str, Any]:
+        """Build the ``meta`` of the task."""
+        return {
+            **(self.meta or {}),
+            NAME: {
+                **(self.doitoml_meta or {}),
+                DOITOML_META.CWD: self.cwd,
+                DOITOML_META.LOG: self.log,
+                DOITOML_META.SOURCE: self.source,
+                DOITOML_META.ENV: dict(self.env or {}),
+            },
+        }
+
+    def to_task(self) -> Task:
+        """Build a new ``doit`` task, sharing no lists with this record."""
+        task: Dict[str, Any] = {
+            key: list(value) if isinstance(value, list) else value
+            for key, value in (self.extra or {}).items()
+        }
+        task[DOIT_TASK.ACTIONS] = list(self.actions)
+        for field in DOIT_TASK.RELATIVE_LISTS:
+            task[field] = list(getattr(self, field))
+        if isinstance(self.uptodate, tuple):
+            task[DOIT_TASK.UPTODATE] = list(self.uptodate)
+        elif self.uptodate is not None:
+            task[DOIT_TASK.UPTODATE] = self.uptodate
+        task[DOIT_TASK.META] = self.get_meta()
+        return cast(Task, task)
+
+    def __getitem__(self, key: str) -> Any:
+        """Get a field, as it will appear in the ``doit`` task."""
+        if key == DOIT_TASK.META:
+            return self.get_meta()
+        if key == DOIT_TASK.ACTIONS or key in DOIT_TASK.RELATIVE_LISTS:
+            return getattr(self, key)
+        if key == DOIT_TASK.UPTODATE and self.uptodate is not None:
+            return self.uptodate
+        if self.extra is not None and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __contains__(self, key: object) -> bool:
+        """Check for a field, without building any."""
+        if key == DOIT_TASK.UPTODATE:
+            return self.uptodate is not None
+        if key in (DOIT_TASK.META, DOIT_TASK.ACTIONS, *DOIT_TASK.RELATIVE_LISTS):
+            return True
+        return self.extra is not None and key in self.extra
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the fields of the ``doit`` task."""
+        yield from self.extra or {}
+        yield DOIT_TASK.ACTIONS
+        yield from DOIT_TASK.RELATIVE_LISTS
+        if self.uptodate is not None:
+            yield DOIT_TASK.UPTODATE
+        yield DOIT_TASK.META
+
+    def __len__(self) -> int:
+        """Count the fields of the ``doit`` task."""
+        fields = 2 + len(DOIT_TASK.RELATIVE_LISTS) + (self.uptodate is not None)
+        return fields + len(self.extra or {})
+
+    def __repr__(self) -> str:
+        """Show the task name, and where it came from."""
+        return f"<{type(self).__name__} {':'.join(self.prefixes)} from {self.source}>"
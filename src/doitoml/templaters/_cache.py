@@ -0,0 +1,126 @@
+"""A persistent cache of templated tasks."""
+import json
+from copy import deepcopy
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+from doitoml import _version
+from doitoml.constants import CACHE, UTF8
+from doitoml.utils.fs import replace_text
+
+if TYPE_CHECKING:
+    from doitoml.doitoml import DoiTOML
+    from doitoml.sources._config import ConfigSource
+
+    from ._templater import Templater
+
+
+class RenderCache:
+
+    """Tasks rendered by templaters, stored as JSON, and reused across runs.
+
+    Entries are keyed by the templater name, and the key the templater gives for
+    a task: a hash of the template, and of the parts of the config it can see.
+    Templaters which don't give a key are never cached. Only entries used by
+    the last run are stored.
+    """
+
+    #: a reference to the parent
+    doitoml: "DoiTOML"
+    #: the cache file, if enabled
+    path: Optional[Path]
+    #: the number of tasks reused
+    hits: int
+    #: the number of tasks rendered
+    misses: int
+    #: the entries read from the cache file, once loaded
+    _loaded: Optional[Dict[str, Any]]
+    #: the entries used by this run
+    _used: Dict[str, Any]
+
+    def __init__(self, doitoml: "DoiTOML", cache_dir: Optional[Path] = None) -> None:
+        """Create a cache, stored in ``cache_dir``, if given."""
+        self.doitoml = doitoml
+        self.path = Path(cache_dir) / CACHE.TEMPLATES if cache_dir else None
+        self.hits = 0
+        self.misses = 0
+        self._loaded = None
+        self._used = {}
+
+    def transform_task(
+        self,
+        templater_name: str,
+        templater: "Templater",
+        source: "ConfigSource",
+        task: Any,
+    ) -> Any:
+        """Get a rendered task from the cache, or render it.
+
+        Cached tasks are copied, as the caller may change them.
+        """
+        key = None
+        if self.path is not None:
+            key = templater.get_cache_key(source, task)
+
+        if key is None:
+            return templater.transform_task(source, task)
+
+        key = f"{templater_name}:{key}"
+        if key in self._used:
+            self.hits += 1
+            return deepcopy(self._used[key])
+
+        loaded = self.load()
+        if key in loaded:
+            self.hits += 1
+            self._used[key] = loaded[key]
+            return deepcopy(loaded[key])
+
+        self.misses += 1
+        rendered = templater.transform_task(source, task)
+        try:
+            # only keep what survives the round trip unchanged, e.g. not YAML dates
+            copied = json.loads(json.dumps(rendered))
+            if copied == rendered:
+                self._used[key] = copied
+        except (TypeError, ValueError):
+            pass
+        return rendered
+
+    def load(self) -> Dict[str, Any]:
+        """Read the cache file, if not yet read."""
+        if self._loaded is None:
+            self._loaded = {}
+            if self.path is not None:
+                try:
+                    cached = json.loads(self.path.read_text(encoding=UTF8))
+                    if cached["version"] == [CACHE.VERSION, _version.__version__]:
+                        self._loaded = cached["rendered"]
+                except FileNotFoundError:
+                    self.create()
+                except (OSError, ValueError, KeyError, TypeError) as err:
+                    self.doitoml.log.info("Template cache unreadable: %s", err)
+        return self._loaded
+
+    def save(self) -> None:
+        """Store the entries used by this run, if any changed."""
+        if self.path is None or self._loaded is None or self._used == self._loaded:
+            return
+        cached = {
+            "version": [CACHE.VERSION, _version.__version__],
+            "rendered": self._used,
+        }
+        try:
+            replace_text(self.path, json.dumps(cached, sort_keys=True))
+        except OSError as err:  # pragma: no cover
+            self.doitoml.log.info("Templates not cached: %s", err)
+
+    def create(self) -> None:
+        """Create an empty cache file while resolving, as it may be listed."""
+        if self.path is None:  # pragma: no cover
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.touch()
+        except OSError as err:  # pragma: no cover
+            self.doitoml.log.info("Template cache not created: %s", err)
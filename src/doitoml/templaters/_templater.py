@@ -1,7 +1,7 @@
 """Task template base for ``doitoml``."""
 
 import abc
-from typing import TYPE_CHECKING, Any
+from typing import TYPE_CHECKING, Any, Optional
 
 if TYPE_CHECKING:
     from doitoml.doitoml import DoiTOML
@@ -21,3 +21,10 @@ class Templater:
     @abc.abstractmethod
     def transform_task(self, source: "ConfigSource", task: Any) -> Any:
         """Transform a template into tasks."""
+
+    def get_cache_key(self, source: "ConfigSource", task: Any) -> Optional[str]:  # noqa: ARG002
+        """Hash everything a transformed task depends on, or ``None`` to not cache it.
+
+        Tasks with the same key may reuse a task transformed by an earlier run.
+        """
+        return None
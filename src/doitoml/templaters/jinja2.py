@@ -1,9 +1,11 @@
 """JSON-E templates for ``doitoml``."""
 
-from copy import deepcopy
+import hashlib
+import json
 from pprint import pformat
-from typing import TYPE_CHECKING, Any, Optional
+from typing import TYPE_CHECKING, Any, Dict, Optional, Set
 
+from doitoml.constants import CACHE, UTF8
 from doitoml.errors import (
     Jinja2Error,
     MissingDependencyError,
@@ -11,6 +13,7 @@ from doitoml.errors import (
 
 try:
     import jinja2
+    import jinja2.meta
 except ImportError as err:
     message = "install ``doitoml[jinja2]`` or ``jinja2`` to use Jinja2 templates"
     raise MissingDependencyError(message) from err
@@ -19,13 +22,92 @@ except ImportError as err:
 from ._templater import Templater
 
 if TYPE_CHECKING:
+    from doitoml.doitoml import DoiTOML
     from doitoml.sources._config import ConfigSource
     from doitoml.sources._source import JsonLikeSource
 
 
 class Jinja2(Templater):
 
-    """A templater driven by Jinja2."""
+    """A templater driven by Jinja2.
+
+    Each template is compiled once per ``DoiTOML``, by one shared environment.
+    If the ``DoiTOML`` has a ``cache_dir``, compiled templates are also kept on
+    disk, so later runs can skip compiling them.
+    """
+
+    #: template sources, by the hash of their content
+    sources: Dict[str, str]
+    #: compiled templates, by the hash of their content
+    templates: Dict[str, "jinja2.Template"]
+    #: the context variables used by templates, by the hash of their content
+    variables: Dict[str, Set[str]]
+    #: the shared environment, created when first needed
+    _environment: Optional["jinja2.Environment"]
+
+    def __init__(self, doitoml: "DoiTOML") -> None:
+        """Create a templater with an empty template cache."""
+        super().__init__(doitoml)
+        self.sources = {}
+        self.templates = {}
+        self.variables = {}
+        self._environment = None
+
+    def get_environment(self) -> "jinja2.Environment":
+        """Get the shared environment, with a bytecode cache if enabled."""
+        if self._environment is None:
+            bytecode_cache = None
+            cache_dir = self.doitoml.cache_dir
+            if cache_dir is not None:
+                jinja_dir = cache_dir / CACHE.JINJA2
+                try:
+                    jinja_dir.mkdir(parents=True, exist_ok=True)
+                    bytecode_cache = jinja2.FileSystemBytecodeCache(str(jinja_dir))
+                except OSError as err:  # pragma: no cover
+                    self.doitoml.log.info("Jinja2 cache not created: %s", err)
+            self._environment = jinja2.Environment(
+                loader=jinja2.FunctionLoader(self.sources.get),
+                bytecode_cache=bytecode_cache,
+                # templates render data, e.g. YAML, never HTML
+                autoescape=False,  # noqa: S701
+                cache_size=0,
+            )
+        return self._environment
+
+    def get_template(self, template: str) -> "jinja2.Template":
+        """Get a compiled template, only compiling it once."""
+        key = hashlib.sha256(template.encode(UTF8)).hexdigest()
+        compiled = self.templates.get(key)
+        if compiled is None:
+            self.sources[key] = template
+            compiled = self.templates[key] = self.get_environment().get_template(key)
+        return compiled
+
+    def get_variables(self, template: str) -> Set[str]:
+        """Get the context variables used by a template, e.g. ``tokens``."""
+        key = hashlib.sha256(template.encode(UTF8)).hexdigest()
+        variables = self.variables.get(key)
+        if variables is None:
+            ast = self.get_environment().parse(template)
+            variables = self.variables[key] = jinja2.meta.find_undeclared_variables(
+                ast,
+            )
+        return variables
+
+    def get_cache_key(self, source: "ConfigSource", task: Any) -> Optional[str]:
+        """Hash the templates of a task, and only the context variables they use."""
+        if not isinstance(task, dict):
+            return None
+        parsers = self.doitoml.entry_points.parsers
+        templates = {k: v for k, v in task.items() if k in parsers}
+        if not all(isinstance(v, str) for v in templates.values()):
+            return None
+        variables: Set[str] = set()
+        for template in templates.values():
+            variables |= self.get_variables(template)
+        config = self.doitoml.config
+        key = [jinja2.__version__, templates, config.get_context_digest(variables)]
+        return hashlib.sha256(json.dumps(key).encode(UTF8)).hexdigest()
 
     def transform_task(self, source: "ConfigSource", task: Any) -> Any:
         """Transform a task template.
@@ -33,35 +115,35 @@ class Jinja2(Templater):
         ``paths``, ``tokens``, and ``env`` in context.
         """
         message: Optional[str] = None
-        context = deepcopy(self.doitoml.config.to_dict())
+        context = self.doitoml.config.get_context()
+        parsers = self.doitoml.entry_points.parsers
 
-        for parser_name, parser in self.doitoml.entry_points.parsers.items():
-            if parser_name in task:
-                template = task[parser_name]
-                rendered = jinja2.Template(template).render(**context)
-                tmp_source: JsonLikeSource = parser(None)  # type: ignore
-                try:
-                    return tmp_source.parse(rendered)
-                except Exception as err:  # noqa: BLE001
-                    message = (
-                        f"Failed to parse task in source {source}:"
-                        "\n"
-                        "task:\n"
-                        f"{pformat(task)}"
-                        "\n\n"
-                        "template:\n"
-                        f"{template}"
-                        "\n\n"
-                        "context:\n"
-                        f"{pformat(context)}"
-                        "\n\n"
-                        "rendered:\n"
-                        f"{rendered}"
-                        "\n\n"
-                        f"{type(err)}:"
-                        "\n"
-                        f"{err}"
-                    )
+        for parser_name, parser in parsers.ranked(task).items():
+            template = task[parser_name]
+            rendered = self.get_template(template).render(**context)
+            tmp_source: JsonLikeSource = parser(None)  # type: ignore
+            try:
+                return tmp_source.parse(rendered)
+            except Exception as err:  # noqa: BLE001
+                message = (
+                    f"Failed to parse task in source {source}:"
+                    "\n"
+                    "task:\n"
+                    f"{pformat(task)}"
+                    "\n\n"
+                    "template:\n"
+                    f"{template}"
+                    "\n\n"
+                    "context:\n"
+                    f"{pformat(context)}"
+                    "\n\n"
+                    "rendered:\n"
+                    f"{rendered}"
+                    "\n\n"
+                    f"{type(err)}:"
+                    "\n"
+                    f"{err}"
+                )
 
         raise Jinja2Error(
             message or f"Failed to find parseable Jinja2 output in {source} {task}",
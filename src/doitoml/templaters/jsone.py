@@ -1,8 +1,12 @@
 """JSON-E templates for ``doitoml``."""
 
+import hashlib
+import json
+import re
 from copy import deepcopy
 from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
+from doitoml.constants import UTF8
 from doitoml.errors import (
     JsonEError,
     MissingDependencyError,
@@ -22,10 +26,22 @@ if TYPE_CHECKING:
     from doitoml.sources._config import ConfigSource
 
 
+#: JSON-e builtins which depend on the current time, e.g. ``now`` and ``$fromNow``
+TIME_BUILTINS = re.compile(r"\b(?:now|fromNow)\b")
+
+#: the distribution which provides ``jsone``
+JSONE_DIST = "json-e"
+
+
 class JsonE(Templater):
 
     """A templater driven by JSON-e."""
 
+    #: the source and template last expanded for a cache key, and the expansion
+    _expanded: Optional[Tuple["ConfigSource", Any, Any]] = None
+    #: the installed version of ``json-e``, once read from its package metadata
+    _jsone_version: Optional[str] = None
+
     def _expand_dict_map(
         self,
         source: "ConfigSource",
@@ -83,11 +99,8 @@ class JsonE(Templater):
 
         return new_map
 
-    def transform_task(self, source: "ConfigSource", task: Any) -> Any:
-        """Transform a task template.
-
-        ``paths``, ``tokens``, and ``env`` in context.
-        """
+    def expand_task(self, source: "ConfigSource", task: Any) -> Any:
+        """Copy a task template, with its ``$map`` expanded."""
         if not task:
             message = f"Task template was unexpectedly empty {task}"
             raise JsonEError(message)
@@ -95,5 +108,47 @@ class JsonE(Templater):
         dollar_map = new_task.get("$map", None)
         if dollar_map is not None:
             new_task["$map"] = self._expand_map(source, dollar_map)
-        context = self.doitoml.config.to_dict()
+        return new_task
+
+    def get_cache_key(self, source: "ConfigSource", task: Any) -> Optional[str]:
+        """Hash the ``json-e`` version, the expanded task template, and the context.
+
+        Templates which might use the current time are never cached.
+        """
+        new_task = self.expand_task(source, task)
+        self._expanded = source, task, new_task
+        try:
+            template_text = json.dumps(new_task, sort_keys=True)
+        except (TypeError, ValueError):  # pragma: no cover
+            return None
+        jsone_version = self.get_jsone_version()
+        if jsone_version is None or TIME_BUILTINS.search(template_text):
+            return None
+        context_digest = self.doitoml.config.get_context_digest()
+        key = [jsone_version, template_text, context_digest]
+        return hashlib.sha256(json.dumps(key).encode(UTF8)).hexdigest()
+
+    def get_jsone_version(self) -> Optional[str]:
+        """Read the installed version of ``json-e``, if known, only when first used."""
+        if self._jsone_version is None:
+            from importlib.metadata import PackageNotFoundError, version
+
+            try:
+                self._jsone_version = version(JSONE_DIST)
+            except PackageNotFoundError:  # pragma: no cover
+                return None
+        return self._jsone_version
+
+    def transform_task(self, source: "ConfigSource", task: Any) -> Any:
+        """Transform a task template.
+
+        ``paths``, ``tokens``, and ``env`` in context.
+        """
+        expanded, self._expanded = self._expanded, None
+        if expanded and expanded[0] is source and expanded[1] is task:
+            # already expanded to find the cache key
+            new_task = expanded[2]
+        else:
+            new_task = self.expand_task(source, task)
+        context = dict(self.doitoml.config.get_context())
         return jsone.render(new_task, context)
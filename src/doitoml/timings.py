@@ -0,0 +1,146 @@
+"""Where the time goes while loading configuration and generating tasks."""
+import contextlib
+import heapq
+import time
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Tuple
+
+if TYPE_CHECKING:
+    from .doitoml import DoiTOML
+
+#: the number of slowest calls kept per plugin or source
+SLOWEST = 5
+
+
+class Timing:
+
+    """The calls to, and time spent in, a single plugin or source."""
+
+    #: the number of calls
+    calls: int
+    #: the total seconds spent in all calls
+    total: float
+    #: a min-heap of the slowest calls, with what they were called with
+    slowest: List[Tuple[float, str]]
+
+    def __init__(self) -> None:
+        """Create an empty timing."""
+        self.calls = 0
+        self.total = 0.0
+        self.slowest = []
+
+    def add(self, elapsed: float, detail: str) -> None:
+        """Count a single call, keeping it if it is one of the slowest."""
+        self.calls += 1
+        self.total += elapsed
+        if len(self.slowest) < SLOWEST:
+            heapq.heappush(self.slowest, (elapsed, detail))
+        elif elapsed > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (elapsed, detail))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Describe the timing as JSON-compatible data."""
+        return {
+            "calls": self.calls,
+            "total": self.total,
+            "slowest": [[detail, elapsed] for elapsed, detail in self.sorted()],
+        }
+
+    def sorted(self) -> List[Tuple[float, str]]:
+        """Get the slowest calls, slowest first."""
+        return sorted(self.slowest, reverse=True)
+
+
+class Timings:
+
+    """Seconds spent in each phase of a ``DoiTOML``, and in its plugins and sources.
+
+    Phases are named after the methods that run them, like ``find_config_sources``
+    or ``init_tasks``, and accumulate if run more than once. Each phase is logged
+    at ``DEBUG`` level as it finishes.
+    """
+
+    #: a reference to the parent
+    doitoml: "DoiTOML"
+    #: seconds spent in each phase, in the order they first ran
+    phases: Dict[str, float]
+    #: reading and parsing each source file, by resolved path
+    parsed: Dict[str, Timing]
+    #: finding and resolving the tasks of each config source, by prefix
+    sources: Dict[str, Timing]
+    #: transforming tokens, by DSL
+    dsl: Dict[str, Timing]
+    #: transforming tasks, by templater
+    templaters: Dict[str, Timing]
+
+    def __init__(self, doitoml: "DoiTOML") -> None:
+        """Create empty timings."""
+        self.doitoml = doitoml
+        self.phases = {}
+        self.parsed = {}
+        self.sources = {}
+        self.dsl = {}
+        self.templaters = {}
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time a phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed
+            self.doitoml.log.debug("%s took %.3fs", name, elapsed)
+
+    @contextlib.contextmanager
+    def timer(
+        self,
+        timings: Dict[str, Timing],
+        name: str,
+        detail: str,
+    ) -> Iterator[None]:
+        """Time a single call to a plugin or source."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            timing = timings.get(name)
+            if timing is None:
+                timing = timings[name] = Timing()
+            timing.add(elapsed, detail)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Describe all timings as JSON-compatible data."""
+        return {
+            "phases": dict(self.phases),
+            **{
+                kind: {name: timing.to_dict() for name, timing in timings.items()}
+                for kind, timings in self.by_kind().items()
+            },
+        }
+
+    def by_kind(self) -> Dict[str, Dict[str, Timing]]:
+        """Get the plugin and source timings, by kind."""
+        return {
+            "parsed": self.parsed,
+            "sources": self.sources,
+            "dsl": self.dsl,
+            "templaters": self.templaters,
+        }
+
+    def log_summary(self) -> None:
+        """Log the slowest plugins and sources of each kind at ``DEBUG`` level."""
+        log = self.doitoml.log
+        for kind, timings in self.by_kind().items():
+            ranked = sorted(timings.items(), key=lambda item: -item[1].total)
+            for name, timing in ranked[:SLOWEST]:
+                slowest = timing.sorted()[0]
+                log.debug(
+                    "%s %s: %s calls took %.3fs, slowest %.3fs: %s",
+                    kind,
+                    name,
+                    timing.calls,
+                    timing.total,
+                    *slowest,
+                )
@@ -1,10 +1,23 @@
 """Types for ``doitoml`` (but mostly ``doit``)."""
 from collections.abc import Callable, Generator
 from pathlib import Path
-from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
 
 from typing_extensions import TypedDict
 
+if TYPE_CHECKING:
+    from .tasks import TaskRecord
+
 Strings = List[str]
 Paths = List[Path]
 PathOrString = Union[Path, str]
@@ -95,15 +108,18 @@ TaskGenerator = Generator[Task, None, None]
 TaskOrTaskGenerator = Union[Task, TaskGenerator]
 TaskFunction = Callable[[], TaskOrTaskGenerator]
 
-PrefixedTaskGenerator = Generator[Tuple[Tuple[str, ...], Task], None, None]
+PrefixedTaskGenerator = Generator[Tuple[Tuple[str, ...], "TaskRecord"], None, None]
 
 
-PrefixedTasks = Dict[Tuple[str, ...], Task]
+PrefixedTasks = Dict[Tuple[str, ...], Union[Task, "TaskRecord"]]
 PrefixedPaths = Dict[Tuple[str, ...], Paths]
 PrefixedTemplates = Dict[str, Dict[str, TemplateSet]]
 PrefixedStrings = Dict[Tuple[str, ...], List[str]]
 PrefixedStringsOrPaths = Dict[Tuple[str, ...], List[Union[str, Path]]]
 GroupedTasks = Dict[str, PrefixedTasks]
+#: a named value which may be referenced: ``(kind, prefix, name)``
+Reference = Tuple[str, str, str]
+References = List[Reference]
 LogPaths = Tuple[MaybePath, MaybePath]
 
 
@@ -112,6 +128,6 @@ class ExecutionContext(NamedTuple):
     """A collection of data relevant to starting a process or calling a function."""
 
     cwd: Path
-    env: Dict[str, str]
+    env: Mapping[str, str]
     log_paths: LogPaths
     log_mode: str
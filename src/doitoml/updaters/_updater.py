@@ -22,7 +22,10 @@ class Updater:
 
     @abc.abstractmethod
     def transform_uptodate(self, source: "ConfigSource", uptodate_args: Any) -> Any:
-        """Replace uptodate tokens with DSL."""
+        """Replace uptodate tokens with DSL.
+
+        The arguments are shared with the parsed source, and must not be changed.
+        """
 
     @abc.abstractmethod
     def get_update_function(
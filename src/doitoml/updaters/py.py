@@ -28,11 +28,10 @@ class PyUpdater(Updater):
         args, kwargs = resolve_py_args(
             self.doitoml,
             source,
-            args_kwargs.pop("args", []),
-            args_kwargs.pop("kwargs", {}),
+            args_kwargs.get("args", []),
+            args_kwargs.get("kwargs", {}),
         )
-        args_kwargs.update(args=args, kwargs=kwargs)
-        return uptodate_args
+        return {path_dotted_func: {**args_kwargs, "args": args, "kwargs": kwargs}}
 
     def get_update_function(
         self,
@@ -0,0 +1,67 @@
+"""Environment variables shared by many tasks."""
+import os
+from typing import Dict, Iterator, Mapping, Optional
+
+
+class LayeredEnv(Mapping[str, str]):
+
+    """An immutable environment: a shared base, and a small overlay of changes.
+
+    Many tasks can share a single snapshot of ``os.environ`` as their ``base``,
+    each only holding the few variables they change. Entries are only built
+    when a process is started with it, e.g. by ``subprocess``, or ``dict(env)``.
+    """
+
+    __slots__ = ("base", "overlay")
+
+    #: the shared environment, which is never changed
+    base: Mapping[str, str]
+    #: the variables that replace, or add to, the ``base``
+    overlay: Mapping[str, str]
+
+    def __init__(
+        self,
+        base: Mapping[str, str],
+        overlay: Optional[Mapping[str, str]] = None,
+    ) -> None:
+        """Layer an overlay over a base environment."""
+        self.base = base
+        self.overlay = dict(overlay or {})
+
+    @classmethod
+    def from_environ(cls) -> "LayeredEnv":
+        """Take a snapshot of the current environment."""
+        return cls(dict(os.environ))
+
+    def layer(self, overlay: Mapping[str, str]) -> "LayeredEnv":
+        """Create a new environment, sharing this one's base."""
+        if not overlay:
+            return self
+        return LayeredEnv(self.base, {**self.overlay, **overlay})
+
+    def __getitem__(self, key: str) -> str:
+        """Get a variable, from the overlay if set there."""
+        if key in self.overlay:
+            return self.overlay[key]
+        return self.base[key]
+
+    def __contains__(self, key: object) -> bool:
+        """Check if a variable is in either layer."""
+        return key in self.overlay or key in self.base
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the variables in the overlay, then the rest of the base."""
+        yield from self.overlay
+        yield from (key for key in self.base if key not in self.overlay)
+
+    def __len__(self) -> int:
+        """Count the variables in both layers."""
+        return len(self.base) + sum(1 for key in self.overlay if key not in self.base)
+
+    def __repr__(self) -> str:
+        """Show only the overlay, as the base may be very large."""
+        return f"<{type(self).__name__} {len(self.base)} + {self.overlay}>"
+
+    def to_dict(self) -> Dict[str, str]:
+        """Build a real environment, e.g. for a process."""
+        return {**self.base, **self.overlay}
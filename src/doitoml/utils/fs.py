@@ -0,0 +1,394 @@
+"""Cached directory listings for ``glob`` and ``rglob``."""
+import fnmatch
+import hashlib
+import json
+import os
+import posixpath
+import re
+from pathlib import Path, PurePath
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from doitoml.constants import FNMATCH_WILDCARDS, UTF8, WIN
+from doitoml.errors import DslError
+
+#: the names in a directory, and whether each is a directory, or a symlink
+Listing = Dict[str, Tuple[bool, bool]]
+
+#: a callable that decides whether a directory (and its descendants) can be skipped
+Pruner = Callable[[str], bool]
+
+#: listings kept across instances that ``persist``, and the ``mtime_ns`` they had
+PERSISTED_LISTINGS: Dict[str, Tuple[int, Listing]] = {}
+
+#: the characters which can end a pattern which only matches directories
+SEPARATORS = ("/", os.sep)
+
+#: regular expression syntax which can depend on what follows a match
+PRUNE_UNSAFE = re.compile(r"\$|\\[ZbB]|\(\?[=!>]|[*+?}]\+")
+
+
+class IgnoreRule(NamedTuple):
+
+    """A compiled line of a ``.gitignore`` file."""
+
+    #: matches a path relative to the directory of the ``.gitignore``
+    pattern: "re.Pattern[str]"
+    #: whether a match re-includes a path
+    negate: bool
+    #: whether the rule only matches directories
+    dir_only: bool
+
+
+class DirectoryCache:
+
+    """A snapshot of the filesystem, where each directory is read at most once.
+
+    ``glob`` and ``rglob`` behave like their :class:`pathlib.Path` counterparts, but
+    return POSIX-style strings, and only read directories with ``os.scandir``.
+
+    If ``persist``, listings are shared with later instances which also ``persist``,
+    as long as the directory's ``mtime_ns`` hasn't changed.
+    """
+
+    #: whether to share listings with other instances
+    persist: bool
+    #: the number of directories read with ``os.scandir``
+    scans: int
+    #: the ``mtime_ns`` of every directory listed, if tracked
+    mtimes: Optional[Dict[str, Optional[int]]]
+    #: the paths of ``.gitignore`` files read
+    ignore_files: List[str]
+    #: listings by POSIX-style path, or ``None`` if not a readable directory
+    _listings: Dict[str, Optional[Listing]]
+    #: compiled wildcard patterns
+    _patterns: Dict[str, "re.Pattern[str]"]
+    #: the nearest directory containing ``.git``, by directory
+    _git_tops: Dict[str, Optional[str]]
+    #: whether paths are ignored by ``git``, by top directory and path
+    _ignored: Dict[Tuple[str, str], bool]
+    #: rules from ``.gitignore`` files, by directory
+    _gitignores: Dict[str, List[IgnoreRule]]
+
+    def __init__(
+        self,
+        persist: Optional[bool] = None,
+        track_mtimes: Optional[bool] = None,
+    ) -> None:
+        """Create an empty cache."""
+        self.persist = bool(persist)
+        self.scans = 0
+        self.mtimes = {} if track_mtimes else None
+        self.ignore_files = []
+        self._listings = {}
+        self._patterns = {}
+        self._git_tops = {}
+        self._ignored = {}
+        self._gitignores = {}
+
+    def glob(
+        self,
+        root: Path,
+        pattern: str,
+        prune: Optional[Pruner] = None,
+    ) -> List[str]:
+        """Find paths under ``root`` matching a relative ``pattern``.
+
+        Directories for which ``prune`` is true are not walked by ``**``, but are
+        still found by a final ``**``.
+        """
+        parts, trailing_sep = self.pattern_parts(pattern)
+        root_posix = root.as_posix()
+        if self.listdir(root_posix) is None:
+            return []
+
+        current = [root_posix]
+
+        for i, part in enumerate(parts):
+            dir_only = trailing_sep or i < len(parts) - 1
+            found: List[str] = []
+            if part == "**":
+                last = i == len(parts) - 1
+                for parent in current:
+                    found += self.walk(parent, prune, keep_pruned=last)
+                found = [*dict.fromkeys(found)]
+            elif any(c in part for c in FNMATCH_WILDCARDS):
+                matcher = self.compile(part)
+                for parent in current:
+                    listing = self.listdir(parent) or {}
+                    found += [
+                        f"{parent}/{name}"
+                        for name, (is_dir, _) in listing.items()
+                        if (is_dir or not dir_only) and matcher.fullmatch(name)
+                    ]
+            else:
+                found = [
+                    f"{parent}/{part}"
+                    for parent in current
+                    if self.exists(parent, part, dir_only=dir_only)
+                ]
+            current = found
+
+        return current
+
+    def rglob(
+        self,
+        root: Path,
+        pattern: str,
+        prune: Optional[Pruner] = None,
+    ) -> List[str]:
+        """Find paths under ``root``, at any depth, matching a relative ``pattern``."""
+        return self.glob(root, f"**/{pattern}", prune)
+
+    def pattern_parts(self, pattern: str) -> Tuple[Tuple[str, ...], bool]:
+        """Split a pattern into its parts, with the same checks as ``pathlib``.
+
+        Also report whether the pattern ends with a separator, in which case its last
+        part only matches directories.
+        """
+        pure = PurePath(pattern)
+        if pure.anchor:
+            message = f"Non-relative glob patterns are unsupported: {pattern}"
+            raise DslError(message)
+        if not pure.parts:
+            message = f"Unacceptable glob pattern: {pattern!r}"
+            raise DslError(message)
+        return pure.parts, pattern.endswith(SEPARATORS)
+
+    def compile(self, part: str) -> "re.Pattern[str]":
+        """Compile (and cache) a wildcard pattern for a single name."""
+        matcher = self._patterns.get(part)
+        if matcher is None:
+            flags = re.IGNORECASE if WIN else 0
+            matcher = re.compile(fnmatch.translate(part), flags)
+            self._patterns[part] = matcher
+        return matcher
+
+    def exists(self, parent: str, name: str, dir_only: bool) -> bool:
+        """Check whether a literal name exists in a directory."""
+        if name == "..":
+            return True
+        listing = self.listdir(parent)
+        if listing is None:
+            return False
+        found = listing.get(name)
+        if found is not None:
+            return found[0] or not dir_only
+        # fall back to the filesystem, e.g. for case-insensitive matches
+        path = f"{parent}/{name}"
+        return os.path.isdir(path) if dir_only else os.path.exists(path)  # noqa: PTH110, PTH112
+
+    def walk(
+        self,
+        root: str,
+        prune: Optional[Pruner] = None,
+        keep_pruned: Optional[bool] = None,
+    ) -> List[str]:
+        """Find a directory, and all its descendant directories, except symlinks.
+
+        Pruned directories are not listed, and are only found if ``keep_pruned``.
+        """
+        found = []
+        unchecked = [root]
+        while unchecked:
+            parent = unchecked.pop(0)
+            if prune is not None and prune(parent):
+                if keep_pruned:
+                    found += [parent]
+                continue
+            found += [parent]
+            listing = self.listdir(parent) or {}
+            unchecked += [
+                f"{parent}/{name}"
+                for name, (is_dir, is_symlink) in listing.items()
+                if is_dir and not is_symlink
+            ]
+        return found
+
+    def listdir(self, path: str) -> Optional[Listing]:
+        """Get the listing of a directory, reading it only once."""
+        if path in self._listings:
+            return self._listings[path]
+
+        mtime_ns = None
+        if self.persist or self.mtimes is not None:
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns  # noqa: PTH116
+            except OSError:
+                mtime_ns = None
+            if self.mtimes is not None:
+                self.mtimes[path] = mtime_ns
+            if mtime_ns is None:
+                self._listings[path] = None
+                return None
+
+        if self.persist:
+            persisted = PERSISTED_LISTINGS.get(path)
+            if persisted and persisted[0] == mtime_ns:
+                self._listings[path] = persisted[1]
+                return persisted[1]
+
+        listing = self.scandir(path)
+        self._listings[path] = listing
+
+        if self.persist and mtime_ns is not None and listing is not None:
+            PERSISTED_LISTINGS[path] = (mtime_ns, listing)
+
+        return listing
+
+    def scandir(self, path: str) -> Optional[Listing]:
+        """Read a directory with ``os.scandir``."""
+        self.scans += 1
+        listing: Listing = {}
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:  # pragma: no cover
+                        is_dir = False
+                    listing[entry.name] = (is_dir, entry.is_symlink())
+        except OSError:
+            return None
+        return listing
+
+    def git_top(self, path: str) -> Optional[str]:
+        """Find the nearest directory containing ``.git``, if any."""
+        if path not in self._git_tops:
+            parent = posixpath.dirname(path)
+            if os.path.exists(f"{path}/.git"):  # noqa: PTH110
+                self._git_tops[path] = path
+            elif parent == path:
+                self._git_tops[path] = None
+            else:
+                self._git_tops[path] = self.git_top(parent)
+        return self._git_tops[path]
+
+    def is_ignored(self, top: str, path: str) -> bool:
+        """Check whether a path would be ignored by ``git``, given a top directory.
+
+        The ``.gitignore`` files in ``top`` and the directories between it and
+        ``path`` are considered, as is being inside an ignored directory.
+        """
+        path = posixpath.normpath(path)
+        key = (top, path)
+        if key in self._ignored:
+            return self._ignored[key]
+
+        parent, name = posixpath.split(path)
+        ignored = False
+
+        if name == ".git":
+            ignored = True
+        elif parent != top and not parent.startswith(f"{top}/"):
+            ignored = False
+        elif parent != top and self.is_ignored(top, parent):
+            ignored = True
+        else:
+            is_dir = (self.listdir(parent) or {}).get(name, (False, False))[0]
+            bases = [top]
+            if parent != top:
+                for part in parent[len(top) + 1 :].split("/"):
+                    bases += [f"{bases[-1]}/{part}"]
+            for base in bases:
+                rel = path[len(base) + 1 :]
+                for rule in self.gitignore(base):
+                    if (is_dir or not rule.dir_only) and rule.pattern.fullmatch(rel):
+                        ignored = not rule.negate
+
+        self._ignored[key] = ignored
+        return ignored
+
+    def gitignore(self, path: str) -> List[IgnoreRule]:
+        """Get the rules from the ``.gitignore`` in a directory, if any."""
+        rules = self._gitignores.get(path)
+        if rules is None:
+            rules = self._gitignores[path] = []
+            listing = self.listdir(path) or {}
+            if ".gitignore" in listing and not listing[".gitignore"][0]:
+                ignore_file = f"{path}/.gitignore"
+                self.ignore_files += [ignore_file]
+                text = Path(ignore_file).read_text(encoding="utf-8")
+                rules += [*filter(None, map(parse_ignore_line, text.splitlines()))]
+        return rules
+
+    def invalidate(self) -> None:
+        """Forget all listings read by this instance."""
+        self._listings.clear()
+        self._git_tops.clear()
+        self._ignored.clear()
+        self._gitignores.clear()
+
+
+def replace_text(path: Path, text: str) -> None:
+    """Write a text file in one step, by replacing it with a temporary file.
+
+    Readers never see a partial file, even if writers race, or are interrupted.
+    """
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        tmp_path.write_text(text, encoding=UTF8)
+        tmp_path.replace(path)
+    except OSError:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def digest_listing(listing: Optional[Listing]) -> Optional[str]:
+    """Hash the names and kinds of entries in a directory, if it was readable."""
+    if listing is None:
+        return None
+    as_json = json.dumps(sorted(listing.items()))
+    return hashlib.sha256(as_json.encode("utf-8")).hexdigest()
+
+
+def parse_ignore_line(line: str) -> Optional[IgnoreRule]:
+    """Compile a line of a ``.gitignore``, if it is not blank or a comment."""
+    if line.endswith(" ") and not line.endswith("\\ "):
+        line = line.rstrip(" ")
+    if not line or line.startswith("#"):
+        return None
+
+    negate = line.startswith("!")
+    if negate or line.startswith(("\\!", "\\#")):
+        line = line[1:]
+
+    dir_only = line.endswith("/")
+    line = line.rstrip("/")
+    anchored = "/" in line
+    parts = line.lstrip("/").split("/")
+    regex = "" if anchored else "(?:.*/)?"
+
+    for i, part in enumerate(parts):
+        last = i == len(parts) - 1
+        if part == "**":
+            regex += ".*" if last else "(?:.*/)?"
+            continue
+        regex += translate_ignore_part(part) + ("" if last else "/")
+
+    return IgnoreRule(re.compile(regex, re.DOTALL), negate, dir_only)
+
+
+def translate_ignore_part(part: str) -> str:
+    """Translate one ``/``-delimited part of a ``.gitignore`` line to a regex."""
+    regex = ""
+    i = 0
+    while i < len(part):
+        char = part[i]
+        i += 1
+        if char == "*":
+            regex += "[^/]*"
+        elif char == "?":
+            regex += "[^/]"
+        elif char == "\\" and i < len(part):
+            regex += re.escape(part[i])
+            i += 1
+        elif char == "[" and "]" in part[i + 1 :]:
+            end = part.index("]", i + 1)
+            body = part[i:end]
+            i = end + 1
+            if body.startswith("!"):
+                body = f"^{body[1:]}"
+            regex += f"[{body.replace(chr(92), chr(92) * 2)}]"
+        else:
+            regex += re.escape(char)
+    return regex
@@ -1,7 +1,7 @@
 """JSON utilities for ``doitoml``."""
 import json
 import pathlib
-from typing import Any
+from typing import Any, Dict, List, Mapping, NoReturn
 
 from doitoml.sources._source import Source
 
@@ -11,6 +11,7 @@ class DoitomlEncoder(json.JSONEncoder):
     """JSON Encoder aware of ``doitoml`` conventions.
 
     * always encode :class:`pathlib.Path` as a POSIX-style path (even on Windows).
+    * encode read-only mappings, like ``TaskRecord``, as objects.
     """
 
     def default(self, obj: Any) -> Any:
@@ -21,9 +22,79 @@ class DoitomlEncoder(json.JSONEncoder):
         if isinstance(obj, Source):
             return obj.path.as_posix() if obj.path else None
 
+        if isinstance(obj, Mapping):
+            return dict(obj)
+
         return json.JSONEncoder.default(self, obj)  # pragma: no cover
 
 
 def to_json(obj: Any) -> Any:
     """Do an expensive roundtrip through JSON, just to be sure."""
     return json.loads(json.dumps(obj, cls=DoitomlEncoder, sort_keys=True))
+
+
+def _read_only(self: Any, *args: Any, **kwargs: Any) -> NoReturn:
+    """Refuse to change a frozen value."""
+    message = f"{type(self).__name__} is read-only: copy it to make changes"
+    raise TypeError(message)
+
+
+class FrozenDict(Dict[str, Any]):
+
+    """A ``dict`` which can't be changed, but still looks like JSON to anything else.
+
+    Copies, e.g. with :func:`copy.deepcopy`, are plain, and can be changed.
+    """
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> Dict[str, Any]:
+        """Make a plain, changeable copy."""
+        return thaw(self)
+
+    def __reduce__(self) -> Any:
+        """Pickle as a plain ``dict``."""
+        return dict, (thaw(self),)
+
+
+class FrozenList(List[Any]):
+
+    """A ``list`` which can't be changed, but still looks like JSON to anything else.
+
+    Copies, e.g. with :func:`copy.deepcopy`, are plain, and can be changed.
+    """
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = extend = insert = pop = remove = clear = sort = reverse = _read_only
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> List[Any]:
+        """Make a plain, changeable copy."""
+        return thaw(self)
+
+    def __reduce__(self) -> Any:
+        """Pickle as a plain ``list``."""
+        return list, (thaw(self),)
+
+
+def freeze(obj: Any) -> Any:
+    """Make read-only copies of the objects and arrays in JSON-like data."""
+    if isinstance(obj, dict):
+        frozen_dict = FrozenDict()
+        for key, value in obj.items():
+            dict.__setitem__(frozen_dict, key, freeze(value))
+        return frozen_dict
+    if isinstance(obj, list):
+        frozen_list = FrozenList()
+        list.extend(frozen_list, map(freeze, obj))
+        return frozen_list
+    return obj
+
+
+def thaw(obj: Any) -> Any:
+    """Make plain, changeable copies of the objects and arrays in JSON-like data."""
+    if isinstance(obj, dict):
+        return {key: thaw(value) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [*map(thaw, obj)]
+    return obj
@@ -1,10 +1,17 @@
 """Utilities for working with paths."""
 
+import os
+import re
+from collections import OrderedDict
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Dict, Iterable, Optional, Tuple
 
+from doitoml.constants import ENV_VARS, NAME, PLATFORM, WIN
 from doitoml.types import PathOrString
 
+#: the default number of paths remembered by a ``PathCache``
+PATH_CACHE_SIZE = 2**16
+
 
 def ensure_parents(*paths: Optional[Path]) -> Tuple[Optional[Path], ...]:
     """Clean out some paths and ensure their parents."""
@@ -15,12 +22,134 @@ def ensure_parents(*paths: Optional[Path]) -> Tuple[Optional[Path], ...]:
     return paths
 
 
+def get_user_cache_dir() -> Optional[Path]:
+    """Find the platform-specific directory for caches shared by all projects."""
+    from_env = os.environ.get(ENV_VARS.USER_CACHE_DIR)
+    if from_env is not None:
+        return Path(from_env) if from_env.strip() else None
+    try:
+        home = Path.home()
+    except RuntimeError:  # pragma: no cover
+        return None
+    if WIN:  # pragma: no cover
+        return Path(os.environ.get("LOCALAPPDATA", home / "AppData/Local")) / NAME
+    if PLATFORM == "Darwin":  # pragma: no cover
+        return home / "Library/Caches" / NAME
+    return Path(os.environ.get("XDG_CACHE_HOME") or home / ".cache") / NAME
+
+
 def normalize_path(path: PathOrString) -> str:
     """Apply some best-effort, platform-aware path normalization."""
-    as_path = Path(path).resolve()
-    norm = str(as_path)
-    if as_path.drive:  # pragma: no cover
-        norm_bits = str(path).split(":")
+    return normalize_resolved(str(Path(path).resolve()))
+
+
+def normalize_resolved(resolved: str) -> str:
+    """Normalize an already-resolved path."""
+    norm = resolved
+    if Path(resolved).drive:  # pragma: no cover
+        norm_bits = resolved.split(":")
         norm = ":".join([norm_bits[0].lower(), *norm_bits[1:]])
         norm = norm.replace("\\", "/")
     return norm
+
+
+class PathCache:
+
+    """A bounded memo of resolved and normalized paths, shared by a ``DoiTOML``.
+
+    Each path string is only resolved once, as is the path it resolves to: the
+    least-recently used entries are forgotten after ``maxsize``. Relative paths are
+    resolved in the working directory when one is first seen: call ``clear`` after
+    changing it.
+    """
+
+    #: the most entries to keep, or ``0`` to never remember any
+    maxsize: int
+    #: the number of times ``Path.resolve`` was called
+    resolves: int
+    #: the number of times a resolved path was reused
+    hits: int
+    #: resolved paths, keyed by the string they were resolved from
+    _resolved: "OrderedDict[str, str]"
+    #: normalized paths, keyed by their resolved path
+    _normalized: Dict[str, str]
+    #: the working directory relative paths are resolved in, once one is seen
+    _cwd: Optional[str]
+
+    def __init__(self, maxsize: int = PATH_CACHE_SIZE) -> None:
+        """Create an empty memo."""
+        self.maxsize = maxsize
+        self.resolves = 0
+        self.hits = 0
+        self._resolved = OrderedDict()
+        self._normalized = {}
+        self._cwd = None
+
+    def __len__(self) -> int:
+        """Count the remembered paths."""
+        return len(self._resolved)
+
+    def resolve(self, path: PathOrString) -> str:
+        """Get the resolved path, as with ``str(Path(path).resolve())``."""
+        key = str(path)
+        if not os.path.isabs(key):  # noqa: PTH117
+            if self._cwd is None:
+                self._cwd = os.getcwd()  # noqa: PTH109
+            key = os.path.join(self._cwd, key)  # noqa: PTH118
+        resolved = self._resolved.get(key)
+        if resolved is not None:
+            self.hits += 1
+            self._resolved.move_to_end(key)
+            return resolved
+
+        self.resolves += 1
+        resolved = str(Path(key).resolve())
+        if self.maxsize:
+            self.remember(key, resolved)
+            self.remember(resolved, resolved)
+        return resolved
+
+    def remember(self, key: str, resolved: str) -> None:
+        """Remember a resolved path, forgetting the oldest if full."""
+        self._resolved[key] = resolved
+        self._resolved.move_to_end(key)
+        while len(self._resolved) > self.maxsize:
+            old_key, old_resolved = self._resolved.popitem(last=False)
+            if old_key == old_resolved:
+                self._normalized.pop(old_resolved, None)
+
+    def normalize(self, path: PathOrString) -> str:
+        """Get the normalized path, as with ``normalize_path``."""
+        resolved = self.resolve(path)
+        normalized = self._normalized.get(resolved)
+        if normalized is None:
+            normalized = normalize_resolved(resolved)
+            if self.maxsize and resolved in self._resolved:
+                self._normalized[resolved] = normalized
+        return normalized
+
+    def clear(self) -> None:
+        """Forget all paths, e.g. after files are moved or linked."""
+        self._resolved.clear()
+        self._normalized.clear()
+        self._cwd = None
+
+
+class SafePaths:
+
+    """A fast check of whether normalized paths start with any of some prefixes."""
+
+    #: the prefixes
+    prefixes: Tuple[str, ...]
+    #: a single pattern that matches the start of any prefix
+    _pattern: "re.Pattern[str]"
+
+    def __init__(self, prefixes: Iterable[str]) -> None:
+        """Compile the prefixes."""
+        self.prefixes = tuple(prefixes)
+        alternatives = "|".join(map(re.escape, self.prefixes)) or "(?!)"
+        self._pattern = re.compile(f"(?:{alternatives})")
+
+    def __contains__(self, norm_path: object) -> bool:
+        """Check if a normalized path starts with any prefix."""
+        return bool(isinstance(norm_path, str) and self._pattern.match(norm_path))
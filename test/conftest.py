@@ -50,6 +50,19 @@ EXAMPLES_ROOT = ROOT / "examples"
 EXAMPLE_PPT = sorted(EXAMPLES_ROOT.glob("*/pyproject.toml"))
 
 
+@pytest.fixture(autouse=True)
+def a_user_cache_dir(
+    tmp_path_factory: pytest.TempPathFactory,
+    monkeypatch: pytest.MonkeyPatch,
+) -> Path:
+    """Keep caches shared by all projects out of the real user cache directory."""
+    from doitoml.constants import ENV_VARS
+
+    user_cache_dir = tmp_path_factory.mktemp("user_cache")
+    monkeypatch.setenv(ENV_VARS.USER_CACHE_DIR, str(user_cache_dir))
+    return user_cache_dir
+
+
 @pytest.fixture(params=[p.parent.name for p in EXAMPLE_PPT])
 def a_data_example(
     request: Any,
@@ -67,3 +67,27 @@ def test_bad_performance(a_pyproject_with: TPyprojectMaker) -> None:
 
     with pytest.raises(TaskError, match="not a recognized action"):
         list(tasks["task_baz"]())
+
+
+def test_py_raw_config_unchanged(a_pyproject_with: TPyprojectMaker) -> None:
+    """Verify custom Python never changes the parsed source it was read from."""
+    py = {"json:dumps": {"args": ["::foo"], "kwargs": {"indent": "::foo"}}}
+    skip = {"py": {"json:loads": {"args": ["false"]}}}
+    config = {
+        "prefix": "",
+        "paths": {"foo": ["a.txt"]},
+        "tasks": {
+            "a": {
+                "actions": [{"py": py}],
+                "uptodate": [{"py": py}],
+                "meta": {"doitoml": {"skip": skip}},
+            },
+        },
+    }
+    a_pyproject_with(config)
+    doitoml = DoiTOML(fail_quietly=False)
+    tasks = doitoml.tasks()
+    assert [*tasks] == ["task_a"]
+    assert doitoml.config.sources[""].raw_config == config
+    action = doitoml.config.tasks["", "a"]["actions"][0]
+    assert action["py"]["json:dumps"]["args"][0].endswith("a.txt")
@@ -0,0 +1,591 @@
+"""Tests of ``doitoml`` caches."""
+import json
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, Optional, Type
+from unittest import mock
+
+import pytest
+from doitoml import DoiTOML
+from doitoml.constants import WIN
+from doitoml.dsl import EnvReplacer
+from doitoml.entry_points import EntryPointCache
+from doitoml.errors import DslError
+from doitoml.sources._cache import ParseCache
+from doitoml.sources.json._json import JsonSource
+from doitoml.utils.fs import PERSISTED_LISTINGS, DirectoryCache, parse_ignore_line
+from doitoml.utils.path import PathCache, SafePaths, normalize_path
+
+from .conftest import TPyprojectMaker
+
+
+def test_parse_cache_shared(a_pyproject_with: TPyprojectMaker) -> None:
+    """Verify sources are parsed once, no matter how often they are used."""
+    a_pyproject_with(
+        {
+            "env": {"A": "a", "B": "${A}"},
+            "paths": {"a": ["a.txt"], "b": ["::a"]},
+            "tokens": {"c": ["::b"]},
+            "tasks": {"a": {"actions": [["echo", "::c"]]}},
+        },
+    )
+    doitoml = DoiTOML(fail_quietly=False, update_env=False)
+    cache = doitoml.parse_cache
+    assert cache.misses == 1
+    assert cache.hits > 1
+    assert len(cache) == 1
+
+
+def test_parse_cache_invalidate(tmp_path: Path) -> None:
+    """Verify changed files, and explicit invalidation, cause a re-parse."""
+    cache = ParseCache()
+    path = tmp_path / "foo.json"
+    path.write_text(json.dumps({"foo": 1}), encoding="utf-8")
+    source = JsonSource(path, cache=cache)
+
+    assert source.get(["foo"]) == 1
+    assert source.get(["foo"]) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    path.write_text(json.dumps({"foo": 22}), encoding="utf-8")
+    os.utime(path, ns=(0, 0))
+    assert source.get(["foo"]) == 22  # noqa: PLR2004
+    assert (cache.hits, cache.misses) == (1, 2)
+
+    cache.invalidate(tmp_path / "bar.json")
+    assert source.get(["foo"]) == 22  # noqa: PLR2004
+    assert (cache.hits, cache.misses) == (2, 2)
+
+    cache.invalidate(path)
+    assert source.get(["foo"]) == 22  # noqa: PLR2004
+    assert (cache.hits, cache.misses) == (2, 3)
+
+    cache.invalidate()
+    assert not len(cache)
+
+
+def test_source_registry(a_pyproject_with: TPyprojectMaker) -> None:
+    """Verify ``:get`` tokens and ``config_paths`` share one source per file."""
+    ppt = a_pyproject_with(
+        {
+            "prefix": "",
+            "config_paths": [":get::json::foo.json::doitoml"],
+            "env": {
+                "A": ":get::json::foo.json::a",
+                "B": ":get::toml::pyproject.toml::tool::doitoml::prefix",
+            },
+            "tokens": {"a": [":get::json::foo.json::a", ":get::json::foo.json::b"]},
+        },
+    )
+    (ppt.parent / "foo.json").write_text(
+        json.dumps({"a": "a", "b": "b", "doitoml": {"prefix": "foo"}}),
+        encoding="utf-8",
+    )
+    doitoml = DoiTOML(fail_quietly=False, update_env=False)
+    assert sorted(doitoml.config.sources) == ["", "foo"]
+    assert doitoml.config.tokens["", "a"] == ["a", "b"]
+    # ``pyproject.toml`` as a config source, and ``:get::json`` + ``:get::toml``
+    assert len(doitoml.source_registry) == 3  # noqa: PLR2004
+    assert doitoml.parse_cache.misses == 2  # noqa: PLR2004
+
+
+GLOB_TREE = [
+    "a.txt",
+    ".hidden.txt",
+    "b/c.txt",
+    "b/c.py",
+    "b/d/e.txt",
+    "b/d/.f/g.txt",
+    "h/i.txt",
+]
+
+GLOB_PATTERNS = [
+    ("glob", "*.txt"),
+    ("glob", "*"),
+    ("glob", "b/*.txt"),
+    ("glob", "*/c.*"),
+    ("glob", "b/d/*"),
+    ("glob", "b/missing/*"),
+    ("glob", "a.txt/*"),
+    ("glob", "**"),
+    ("glob", "**/*.txt"),
+    ("glob", "**/d/**/*.txt"),
+    ("glob", "b/../h/*.txt"),
+    ("glob", "[ab]*"),
+    ("glob", "*/"),
+    ("glob", "**/"),
+    ("glob", "*/*/"),
+    ("glob", "**/*/"),
+    ("glob", "b/"),
+    ("glob", "a.txt/"),
+    ("rglob", "*.txt"),
+    ("rglob", "*.py"),
+    ("rglob", "d"),
+    ("rglob", "*"),
+    ("rglob", "*/"),
+    ("rglob", "d/"),
+    ("rglob", "c.py/"),
+]
+
+
+@pytest.mark.parametrize(("kind", "pattern"), GLOB_PATTERNS)
+def test_directory_cache_glob(kind: str, pattern: str, tmp_path: Path) -> None:
+    """Verify cached globs match ``pathlib``, including symlinks."""
+    for rel in GLOB_TREE:
+        path = tmp_path / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(rel, encoding="utf-8")
+    if not WIN:
+        (tmp_path / "h/linked").symlink_to(tmp_path / "b", target_is_directory=True)
+
+    cache = DirectoryCache()
+    expected = sorted(p.as_posix() for p in getattr(tmp_path, kind)(pattern))
+    observed = sorted(getattr(cache, kind)(tmp_path, pattern))
+    assert observed == expected
+    scans = cache.scans
+    assert sorted(getattr(cache, kind)(tmp_path, pattern)) == expected
+    assert cache.scans == scans
+
+
+@pytest.mark.parametrize("persist", [True, False])
+def test_directory_cache_track_mtimes(persist: bool, tmp_path: Path) -> None:
+    """Verify listings are only kept for later instances if ``persist``."""
+    (tmp_path / "a.txt").touch()
+    cache = DirectoryCache(persist=persist, track_mtimes=True)
+    assert cache.glob(tmp_path, "*.txt") == [f"{tmp_path.as_posix()}/a.txt"]
+    assert cache.mtimes
+    assert (tmp_path.as_posix() in PERSISTED_LISTINGS) == persist
+
+
+@pytest.mark.parametrize("pattern", ["", "/abs/*"])
+def test_directory_cache_bad_glob(pattern: str, tmp_path: Path) -> None:
+    """Verify unacceptable patterns are reported."""
+    with pytest.raises(DslError):
+        DirectoryCache().glob(tmp_path, pattern)
+
+
+def test_directory_cache_persist(a_pyproject_with: TPyprojectMaker) -> None:
+    """Verify persisted listings are reused until a directory changes."""
+    ppt = a_pyproject_with({"paths": {"a": [":rglob::src::*.py"]}})
+    src = ppt.parent / "src"
+    (src / "a").mkdir(parents=True)
+    (src / "a/a.py").touch()
+
+    def load(persist: bool) -> DoiTOML:
+        return DoiTOML(
+            fail_quietly=False,
+            update_env=False,
+            persist_directory_cache=persist,
+        )
+
+    first = load(persist=True)
+    assert first.directory_cache.scans == 2  # noqa: PLR2004
+    assert first.config.paths["", "a"] == [str(src / "a/a.py")]
+
+    second = load(persist=True)
+    assert second.directory_cache.scans == 0
+    assert second.config.paths == first.config.paths
+
+    assert load(persist=False).directory_cache.scans == 2  # noqa: PLR2004
+
+    (src / "a/b.py").touch()
+    os.utime(src / "a", ns=(0, 0))
+    third = load(persist=True)
+    assert third.directory_cache.scans == 1
+    assert len(third.config.paths["", "a"]) == 2  # noqa: PLR2004
+
+
+@pytest.mark.parametrize(
+    ("line", "path", "expected"),
+    [
+        ("# comment", "# comment", None),
+        ("", "", None),
+        ("*.log", "a/b.log", True),
+        ("*.log", "a/b.logs", False),
+        ("/*.log", "a/b.log", False),
+        ("a/**/b", "a/x/y/b", True),
+        ("a/**/b", "a/b", True),
+        ("**/foo", "x/foo", True),
+        ("foo/**", "foo/x/y", True),
+        ("foo/**", "foo", False),
+        ("\\#x", "#x", True),
+        ("\\!x", "!x", True),
+        ("[!a]b", "cb", True),
+        ("[!a]b", "ab", False),
+        ("b?d", "b/d", False),
+        ("trailing   ", "trailing", True),
+    ],
+)
+def test_parse_ignore_line(line: str, path: str, expected: Optional[bool]) -> None:
+    """Verify ``.gitignore`` lines are translated to regular expressions."""
+    rule = parse_ignore_line(line)
+    if expected is None:
+        assert rule is None
+        return
+    assert rule is not None
+    assert bool(rule.pattern.fullmatch(path)) == expected
+
+
+def _change_nothing(_ppt: Path) -> None:
+    """Change nothing."""
+
+
+def _change_source(ppt: Path) -> None:
+    """Change a source file."""
+    ppt.write_text(ppt.read_text(encoding="utf-8") + "\n# hi\n", encoding="utf-8")
+
+
+def _change_env(_ppt: Path) -> None:
+    """Change a referenced environment variable, restored by ``monkeypatch``."""
+    os.environ["DOITOML_TEST_CACHE"] = "2"
+
+
+def _change_glob(ppt: Path) -> None:
+    """Add a file matching a glob."""
+    (ppt.parent / "src/b.py").touch()
+
+
+def _change_exists(ppt: Path) -> None:
+    """Add a file checked by a skipper."""
+    (ppt.parent / "skip.txt").touch()
+
+
+def _change_get(ppt: Path) -> None:
+    """Add a missing file, read with a default."""
+    (ppt.parent / "ver.json").write_text(json.dumps({"v": 42}), encoding="utf-8")
+
+
+@pytest.mark.parametrize(
+    ("change", "reason"),
+    [
+        (_change_nothing, None),
+        (_change_source, "file changed: .*pyproject.toml"),
+        (_change_env, "environment variable changed: DOITOML_TEST_CACHE"),
+        (_change_glob, "directory changed: .*src"),
+        (_change_exists, "path added: .*skip.txt"),
+        (_change_get, "path added: .*ver.json"),
+    ],
+)
+def test_config_cache(
+    change: Any,
+    reason: Optional[str],
+    a_pyproject_with: TPyprojectMaker,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Verify a resolved config is reused until one of its inputs changes."""
+    monkeypatch.setenv("DOITOML_TEST_CACHE", "1")
+    ppt = a_pyproject_with(
+        {
+            "env": {"A": "${DOITOML_TEST_CACHE}", "V": ":get|0::json::ver.json::v"},
+            "paths": {"py": [":rglob::src::*.py"]},
+            "tasks": {
+                "a": {"actions": [["echo", "::py", "${A}"]], "file_dep": ["::py"]},
+                "b": {
+                    "meta": {"doitoml": {"skip": {"exists": "skip.txt"}}},
+                    "actions": [["echo", "b"]],
+                },
+            },
+        },
+    )
+    (ppt.parent / "src").mkdir()
+    (ppt.parent / "src/a.py").touch()
+    cache_dir = ppt.parent / ".doitoml_cache"
+
+    def load() -> DoiTOML:
+        return DoiTOML(fail_quietly=False, update_env=False, cache_dir=cache_dir)
+
+    first = load()
+    assert not first.config_cache.hit
+    assert first.config_cache.reasons == ["no cache"]
+    assert (cache_dir / "config.json").exists()
+
+    second = load()
+    assert second.config_cache.hit, second.config_cache.reasons
+    assert not second.parse_cache.misses
+    assert second.config.to_dict() == first.config.to_dict()
+    assert second.config.tasks.keys() == first.config.tasks.keys()
+    dt_meta = second.config.tasks["", "a"]["meta"]["doitoml"]
+    assert dt_meta["cwd"] == ppt.parent
+    assert dt_meta["source"] is second.config.sources[""]
+    assert second.tasks().keys() == first.tasks().keys()
+
+    change(ppt)
+    third = load()
+    if reason is None:
+        assert third.config_cache.hit
+    else:
+        assert not third.config_cache.hit
+        assert any(re.match(reason, r) for r in third.config_cache.reasons)
+        assert load().config_cache.hit
+    assert third.config.env["V"] == ("42" if change is _change_get else "0")
+
+
+def test_config_cache_loader(
+    a_pyproject_with: TPyprojectMaker,
+    script_runner: Any,
+) -> None:
+    """Verify the ``doit`` loader caches config next to the dependency file."""
+    ppt = a_pyproject_with(
+        {
+            "doit": {"loader": "doitoml", "dep_file": "build/.doit.db"},
+            "doitoml": {"tasks": {"a": {"actions": [["echo", "a"]]}}},
+        },
+    )
+    (ppt.parent / "build").mkdir()
+    cached = ppt.parent / "build/.doitoml_cache/config.json"
+    assert script_runner.run(["doit", "list", "--no-doitoml-cache"]).success
+    assert not cached.exists()
+    assert script_runner.run(["doit", "list"]).success
+    assert cached.exists()
+
+    pkg_json = ppt.parent / "pkg/package.json"
+    pkg_json.parent.mkdir()
+    config = {"prefix": "pkg", "tasks": {"b": {"actions": [["echo", "b"]]}}}
+    pkg_json.write_text(json.dumps({"doitoml": config}), encoding="utf-8")
+    assert "pkg:b" not in script_runner.run(["doit", "list", "--all"]).stdout
+    listed = script_runner.run(["doit", "list", "--all", "--doitoml-discover"])
+    assert "pkg:b" in listed.stdout
+
+
+def test_config_cache_well_known(a_pyproject_with: TPyprojectMaker) -> None:
+    """Verify a cached config is not reused after a well-known config file appears."""
+    ppt = a_pyproject_with({"prefix": "py", "tasks": {"a": {"actions": [["echo"]]}}})
+    cache_dir = ppt.parent / ".doitoml_cache"
+
+    def load() -> DoiTOML:
+        return DoiTOML(fail_quietly=False, cache_dir=cache_dir)
+
+    assert sorted(load().config.sources) == ["py"]
+    assert load().config_cache.hit
+
+    config = {"prefix": "js", "tasks": {"b": {"actions": [["echo"]]}}}
+    pkg_json = ppt.parent / "package.json"
+    pkg_json.write_text(json.dumps({"doitoml": config}), encoding="utf-8")
+    after = load()
+    assert not after.config_cache.hit
+    assert any("path added" in reason for reason in after.config_cache.reasons)
+    assert sorted(after.config.sources) == ["js", "py"]
+
+
+class ThirdPartyDsl(EnvReplacer):
+
+    """A DSL from another package, which might read anything."""
+
+    pattern = re.compile(r"^:third-party::(?P<rest>.*)$")
+    starts_with = (":third-party::",)
+
+
+class CacheSafeDsl(ThirdPartyDsl):
+
+    """A DSL from another package, which promises to report everything it reads."""
+
+    cache_safe = True
+
+
+@pytest.mark.parametrize(
+    ("dsl_class", "cacheable"),
+    [(ThirdPartyDsl, False), (CacheSafeDsl, True)],
+)
+def test_config_cache_third_party(
+    dsl_class: Type[EnvReplacer],
+    cacheable: bool,
+    a_pyproject_with: TPyprojectMaker,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Verify plugins from other packages prevent caching, unless ``cache_safe``."""
+    describe = EntryPointCache.describe
+    value = f"{__name__}:{dsl_class.__name__}"
+
+    def describe_with_plugin(self: EntryPointCache) -> Any:
+        return [*describe(self), ["doitoml.dsl.v0", "third-party", value, "0.1.0"]]
+
+    monkeypatch.setattr(EntryPointCache, "describe", describe_with_plugin)
+    ppt = a_pyproject_with({"tasks": {"a": {"actions": [["echo"]]}}})
+    cache_dir = ppt.parent / ".doitoml_cache"
+
+    first = DoiTOML(fail_quietly=False, cache_dir=cache_dir)
+    assert bool(first.config_cache.uncacheable_reasons) != cacheable
+    second = DoiTOML(fail_quietly=False, cache_dir=cache_dir)
+    assert second.config_cache.hit == cacheable
+
+
+def test_config_cache_atomic(a_pyproject_with: TPyprojectMaker) -> None:
+    """Verify an interrupted write leaves the cache files as they were."""
+    jsone_task = {
+        "$map": "::v",
+        "each(v,i)": {"name": "e${i}", "actions": [["echo", "${v}"]]},
+    }
+    ppt = a_pyproject_with(
+        {
+            "prefix": "",
+            "tokens": {"v": ["1"]},
+            "templates": {"json-e": {"tasks": {"e": jsone_task}}},
+        },
+    )
+    cache_dir = ppt.parent / ".doitoml_cache"
+    first = DoiTOML(fail_quietly=False, cache_dir=cache_dir)
+    before = {path.name: path.read_bytes() for path in cache_dir.glob("*.json")}
+    assert {"config.json", "templates.json"} <= {*before}
+
+    for path in cache_dir.glob("*.json"):
+        path.write_text("{}", encoding="utf-8")
+    with mock.patch.object(Path, "replace", side_effect=OSError("interrupted")):
+        first.config_cache.save(first.config)
+        first.render_cache.save()
+    assert {path.name: path.read_bytes() for path in cache_dir.iterdir()} == {
+        name: b"{}" for name in before
+    }
+
+
+@pytest.mark.parametrize(
+    ("cached", "reason"),
+    [
+        ("{", "unreadable cache"),
+        ('{"version": 0}', "cache format changed"),
+        ('{"version": 1, "inputs": {}}', "unreadable cache"),
+    ],
+)
+def test_config_cache_bad(
+    cached: str,
+    reason: str,
+    a_pyproject_with: TPyprojectMaker,
+) -> None:
+    """Verify unusable caches are reported, and replaced."""
+    ppt = a_pyproject_with({"tasks": {"a": {"actions": [["echo"]]}}})
+    cache_dir = ppt.parent / ".doitoml_cache"
+    cache_dir.mkdir()
+    (cache_dir / "config.json").write_text(cached, encoding="utf-8")
+
+    doitoml = DoiTOML(fail_quietly=False, cache_dir=cache_dir)
+    assert doitoml.config_cache.reasons[0].startswith(reason)
+    assert DoiTOML(fail_quietly=False, cache_dir=cache_dir).config_cache.hit
+    assert "options changed" in DoiTOML(cache_dir=cache_dir).config_cache.reasons
+
+
+@pytest.mark.parametrize(
+    ("config", "cacheable"),
+    [
+        ({"config_paths": [":get::json::foo.json::doitoml"]}, True),
+        ({"templates": {"json-e": {"tasks": {}}}}, True),
+        (
+            {
+                "tasks": {
+                    "a": {"meta": {"doitoml": {"skip": {"py": {"os:getcwd": {}}}}}},
+                },
+            },
+            False,
+        ),
+    ],
+)
+def test_config_cache_inputs(
+    config: Dict[str, Any],
+    cacheable: bool,
+    a_pyproject_with: TPyprojectMaker,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Verify wrapped sources and templates are cached, but custom Python isn't."""
+    ppt = a_pyproject_with({"prefix": "", **config})
+    (ppt.parent / "foo.json").write_text(
+        json.dumps({"doitoml": {"prefix": "foo"}}),
+        encoding="utf-8",
+    )
+    cache_dir = ppt.parent / ".doitoml_cache"
+    first = DoiTOML(fail_quietly=False, cache_dir=cache_dir)
+    second = DoiTOML(fail_quietly=False, cache_dir=cache_dir)
+    assert second.config_cache.hit == cacheable
+    assert sorted(second.config.sources) == sorted(first.config.sources)
+
+    if config.get("templates"):
+        monkeypatch.setenv("DOITOML_TEST_CACHE", "1")
+        reasons = DoiTOML(fail_quietly=False, cache_dir=cache_dir).config_cache.reasons
+        assert reasons == ["environment variables changed"]
+
+
+def test_discover_tree_cache(a_pyproject_with: TPyprojectMaker) -> None:
+    """Verify only changed directories are read, and changed files parsed, again."""
+    ppt = a_pyproject_with({"prefix": ""})
+    root = ppt.parent
+    cache_dir = root / ".doitoml_cache"
+    for name in ["a", "b", "c"]:
+        pkg_json = root / f"packages/{name}/package.json"
+        pkg_json.parent.mkdir(parents=True)
+        pkg_json.write_text(json.dumps({"doitoml": {"prefix": name}}), "utf-8")
+
+    def load() -> DoiTOML:
+        return DoiTOML(
+            cwd=root,
+            discover_config_paths="tree",
+            fail_quietly=False,
+            update_env=False,
+            cache_dir=cache_dir,
+        )
+
+    first = load()
+    assert [*first.config.sources] == ["", "a", "b", "c"]
+    assert (first.tree_discovery.scans, first.tree_discovery.parsed) == (5, 4)
+    assert (cache_dir / "discovered.json").exists()
+
+    second = load()
+    assert second.config_cache.hit
+    assert (second.tree_discovery.scans, second.tree_discovery.parsed) == (0, 0)
+
+    (root / "packages/d").mkdir()
+    (root / "packages/d/package.json").write_text(
+        json.dumps({"doitoml": {"prefix": "d"}}),
+        encoding="utf-8",
+    )
+    third = load()
+    assert third.config_cache.reasons == ["discovered config sources changed"]
+    assert [*third.config.sources] == ["", "a", "b", "c", "d"]
+    assert (third.tree_discovery.scans, third.tree_discovery.parsed) == (2, 1)
+
+    (root / ".gitignore").write_text("/packages/b/\n", encoding="utf-8")
+    fourth = load()
+    assert [*fourth.config.sources] == ["", "a", "c", "d"]
+    assert fourth.tree_discovery.parsed == 0
+
+    (root / ".gitignore").write_text("# changed\n/packages/c/\n", encoding="utf-8")
+    fifth = load()
+    assert [*fifth.config.sources] == ["", "a", "b", "d"]
+    assert fifth.tree_discovery.parsed == 1
+
+
+def test_path_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Verify paths are resolved once, and the oldest are forgotten."""
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").symlink_to(tmp_path / "a")
+    monkeypatch.chdir(tmp_path)
+    cache = PathCache(maxsize=4)
+    real = str((tmp_path / "a").resolve())
+
+    assert cache.resolve("b") == real
+    assert cache.normalize(tmp_path / "b") == normalize_path(tmp_path / "b")
+    assert cache.resolve(real) == real
+    assert (cache.resolves, cache.hits) == (1, 2)
+    with mock.patch.object(os, "getcwd", side_effect=AssertionError("no syscall")):
+        assert cache.resolve("b") == real
+    assert (cache.resolves, cache.hits) == (1, 3)
+
+    for i in range(4):
+        cache.resolve(tmp_path / f"c{i}")
+    assert len(cache) == 4  # noqa: PLR2004
+    assert cache.resolve("b") == real
+    assert cache.resolves == 6  # noqa: PLR2004
+
+    cache.clear()
+    assert not len(cache)
+    monkeypatch.chdir(tmp_path / "a")
+    assert cache.resolve("b") == str(tmp_path.resolve() / "a/b")
+    assert PathCache(maxsize=0).normalize("b") == normalize_path("b")
+
+
+def test_safe_paths() -> None:
+    """Verify paths are checked against all safe prefixes."""
+    safe = SafePaths(["/a/b", "/c.d"])
+    assert "/a/b/c" in safe
+    assert "/c.d" in safe
+    assert "/cxd" not in safe
+    assert "/a" not in safe
+    assert None not in safe
+    assert "/a" not in SafePaths([])
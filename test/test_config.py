@@ -1,19 +1,28 @@
 """Test of (bad) ``doitoml`` configuration."""
 import json
+import os
 import shutil
+import sys
+from copy import deepcopy
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Type, Union
+from typing import Any, Dict, List, Optional, Set, Type, Union
 
 import pytest
+import tomli_w
+from doitoml.constants import CACHE, ENV_VARS
 from doitoml.doitoml import DoiTOML
+from doitoml.entry_points import EntryPointCache
 from doitoml.errors import (
     ActionError,
+    CircularReferenceError,
     ConfigError,
     DoitomlError,
     NoConfigError,
     PrefixError,
     UnresolvedError,
 )
+from doitoml.tasks import TaskRecord
+from doitoml.utils.path import get_user_cache_dir
 
 from .conftest import TPyprojectMaker
 
@@ -34,6 +43,22 @@ if __name__ == "__main__":
         (UnresolvedError, "resolve environment", {"env": {"a": "${b}"}}),
         (UnresolvedError, "resolve paths", {"paths": {"a": ["::b"]}}),
         (UnresolvedError, "resolve tokens", {"tokens": {"a": ["::b"]}}),
+        (UnresolvedError, "resolve paths", {"paths": {"a": ["::b"], "b": ["::c"]}}),
+        (
+            CircularReferenceError,
+            r"\$\{a\} -> \$\{b\} -> \$\{a\}",
+            {"env": {"a": "${b}", "b": "${a}"}},
+        ),
+        (
+            CircularReferenceError,
+            "paths ::a -> tokens ::b -> paths ::a",
+            {"paths": {"a": ["::b"]}, "tokens": {"b": ["::a"]}},
+        ),
+        (
+            CircularReferenceError,
+            "paths ::foo::a -> paths ::foo::b -> paths ::foo::a",
+            {"prefix": "foo", "paths": {"a": ["::b"], "b": ["::foo::a"]}},
+        ),
         (ConfigError, "not a dict", {"tasks": {"a": []}}),
         (UnresolvedError, "paths", {"tasks": {"a": {"actions": [["::b"]]}}}),
         (
@@ -56,6 +81,20 @@ def test_bad_doitoml(
         DoiTOML([ppt, ppt], update_env=False, fail_quietly=False)
 
 
+def test_env_first_source_wins(a_pyproject_with: TPyprojectMaker) -> None:
+    """Verify the first source to set an env var wins, even if it needs a later one."""
+    ppt = a_pyproject_with(
+        {"prefix": "", "config_paths": ["pkg/package.json"], "env": {"A": "${B}"}},
+    )
+    pkg_json = ppt.parent / "pkg/package.json"
+    pkg_json.parent.mkdir()
+    pkg_config = {"prefix": "pkg", "env": {"B": "b", "A": "later"}}
+    pkg_json.write_text(json.dumps({"doitoml": pkg_config}), encoding="utf-8")
+
+    doitoml = DoiTOML(fail_quietly=False, update_env=False)
+    assert doitoml.config.env == {"A": "b", "B": "b"}
+
+
 def test_bad_prefixes(a_pyproject_with: TPyprojectMaker, tmp_path: Path) -> None:
     """Verify prefix collision is caught."""
     ppt = a_pyproject_with(
@@ -84,6 +123,125 @@ def test_bad_prefixes(a_pyproject_with: TPyprojectMaker, tmp_path: Path) -> None
         DoiTOML([pj], update_env=False)
 
 
+def test_source_graph(tmp_path: Path) -> None:
+    """Verify nested sources are found in the order they are listed."""
+
+    def write(path: str, config: Dict[str, Any]) -> Path:
+        pkg_json = tmp_path / path / "package.json"
+        pkg_json.parent.mkdir(parents=True, exist_ok=True)
+        pkg_json.write_text(json.dumps({"doitoml": config}), encoding="utf-8")
+        return pkg_json
+
+    children = [f"pkg{i}" for i in range(20)]
+    root = write(
+        ".",
+        {"prefix": "root", "config_paths": [f"{c}/package.json" for c in children]},
+    )
+    for i, child in enumerate(children):
+        write(
+            child,
+            {
+                "prefix": child,
+                "env": {"WHO": child},
+                "config_paths": ["leaf/package.json", "../package.json"],
+            },
+        )
+        write(f"{child}/leaf", {"prefix": f"leaf{i}", "env": {"WHO": f"leaf{i}"}})
+
+    doitoml = DoiTOML([root], cwd=tmp_path, update_env=False, fail_quietly=False)
+    expected = ["root"]
+    for i, child in enumerate(children):
+        expected += [child, f"leaf{i}"]
+    assert [*doitoml.config.sources] == expected
+    assert doitoml.config.env["WHO"] == "pkg0"
+
+    write("pkg7/leaf", {"prefix": "pkg3"})
+    write("pkg5", {"prefix": "pkg12"})
+    for _ in range(3):
+        with pytest.raises(PrefixError, match=r"pkg7/leaf.*cannot claim prefix 'pkg3'"):
+            DoiTOML([root], cwd=tmp_path, update_env=False, fail_quietly=False)
+
+    write("pkg5", {"prefix": "pkg5", "config_paths": ["missing/package.json"]})
+    with pytest.raises(FileNotFoundError, match="pkg5"):
+        DoiTOML([root], cwd=tmp_path, update_env=False, fail_quietly=False)
+
+
+def test_discover_tree(
+    a_pyproject_with: TPyprojectMaker,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    """Verify config is found under the working directory, except where pruned."""
+    ppt = a_pyproject_with({"prefix": "", "paths": {"all": ["::*::dist"]}})
+    root = ppt.parent
+    (root / ".gitignore").write_text("build/\n*.ignored/\n", encoding="utf-8")
+    found = {
+        "b/pyproject.toml": "b",
+        "b/package.json": "b_js",
+        "a/z/package.json": "a_z",
+        "a/pyproject.toml": "a",
+        "a/b/package.json": "a_b",
+    }
+    pruned = [
+        "node_modules/c/package.json",
+        ".hidden/package.json",
+        "build/package.json",
+        "a/x.ignored/package.json",
+        "env/package.json",
+    ]
+    for rel, prefix in [*found.items(), *((rel, rel) for rel in pruned)]:
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        config = {"prefix": prefix, "paths": {"dist": ["dist"]}}
+        if path.name == "package.json":
+            path.write_text(json.dumps({"doitoml": config}), encoding="utf-8")
+        else:
+            path.write_text(tomli_w.dumps({"tool": {"doitoml": config}}), "utf-8")
+    (root / "env/pyvenv.cfg").touch()
+    (root / "c").mkdir()
+    (root / "c/pyproject.toml").write_text("[project]\n", encoding="utf-8")
+    (root / "d").mkdir()
+    (root / "d/package.json").write_text("{", encoding="utf-8")
+
+    doitoml = DoiTOML(
+        cwd=root,
+        discover_config_paths="tree",
+        update_env=False,
+        fail_quietly=False,
+    )
+    assert [*doitoml.config.sources] == ["", "a", "a_b", "a_z", "b_js", "b"]
+    assert doitoml.config.paths["", "all"] == sorted(
+        {(root / rel).parent.joinpath("dist").as_posix() for rel in found},
+    )
+    assert "Not discovering" in caplog.text
+    assert doitoml.tree_discovery.parsed == len(found) + 3
+
+
+def test_reference_order(a_pyproject_with: TPyprojectMaker, tmp_path: Path) -> None:
+    """Verify values are resolved after the values they reference."""
+    ppt = a_pyproject_with(
+        {
+            "config_paths": ["package.json"],
+            "env": {"A": "::a", "HOME": "${HOME}"},
+            "paths": {"a": ["::b"], "b": ["${B}"], "all": ["::pkg_*::c"]},
+            "tokens": {"b": ["::b"], "a": ["::b", "::a"], "c": ["::pkg_b::c"]},
+        },
+    )
+    pj = tmp_path / "package.json"
+    pj.write_text(
+        json.dumps(
+            {"doitoml": {"prefix": "pkg_b", "env": {"B": "b"}, "paths": {"c": ["c"]}}},
+        ),
+        encoding="utf-8",
+    )
+    doitoml = DoiTOML([ppt], update_env=False, fail_quietly=False)
+    config = doitoml.config
+    b = str(tmp_path / "b")
+    assert config.env["A"] == b
+    assert config.paths["", "all"] == [str(tmp_path / "c")]
+    assert config.tokens["", "a"] == [b, b]
+    assert config.tokens["", "c"] == config.paths["", "all"]
+
+
 def test_unknown_config(a_pyproject_with: TPyprojectMaker, tmp_path: Path) -> None:
     """Verify unknown configs are caught."""
     a_pyproject_with({})
@@ -140,6 +298,200 @@ def test_task_env(a_pyproject_with: TPyprojectMaker, script_runner: Any) -> None
     assert "oob" in foo2
 
 
+def test_task_env_layers(
+    a_pyproject_with: TPyprojectMaker,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Verify subtasks share one snapshot of the environment."""
+    monkeypatch.setenv("FOO", "bar")
+    a_pyproject_with(
+        {
+            "prefix": "",
+            "tasks": {
+                "a": {"actions": [["echo"]]},
+                "b": {
+                    "actions": [["echo"]],
+                    "meta": {"doitoml": {"env": {"FOO": "b"}}},
+                },
+            },
+        },
+    )
+    doitoml = DoiTOML(fail_quietly=False)
+
+    def get_envs() -> Dict[str, Any]:
+        return {
+            name: [*func()][0]["actions"][1].pkwargs["env"]
+            for name, func in doitoml.tasks().items()
+        }
+
+    envs = get_envs()
+    assert envs["task_a"]["FOO"] == "bar"
+    assert len(envs["task_a"]) == len(os.environ)
+    assert envs["task_b"].base is envs["task_a"].base
+
+    monkeypatch.setenv("FOO", "baz")
+    new_envs = get_envs()
+    assert new_envs["task_a"]["FOO"] == "baz"
+    assert new_envs["task_b"]["FOO"] == "b"
+    assert dict(new_envs["task_b"]) == {**os.environ, "FOO": "b"}
+    assert "FOO" in new_envs["task_b"]
+    assert "'FOO': 'b'" in repr(new_envs["task_b"])
+
+
+def test_lazy_entry_points(a_pyproject_with: TPyprojectMaker) -> None:
+    """Verify plugins are only created when a config uses them."""
+    a_pyproject_with(
+        {
+            "prefix": "",
+            "tasks": {
+                "a": {
+                    "actions": [["echo"]],
+                    "meta": {"doitoml": {"skip": {"platform": {"system": "^$"}}}},
+                },
+            },
+        },
+    )
+    doitoml = DoiTOML(fail_quietly=False)
+    entry_points = doitoml.entry_points
+    assert {*entry_points.parsers.names()} >= {"json", "toml"}
+    assert not entry_points.parsers.loaded
+    assert not entry_points.templaters.loaded
+    assert [*entry_points.skippers.loaded] == ["platform"]
+
+    assert entry_points.parsers["json"] is entry_points.parsers["json"]
+    assert [*entry_points.parsers.loaded] == ["json"]
+    with pytest.raises(KeyError):
+        entry_points.parsers["not-a-parser"]
+
+    ranked = [*entry_points.skippers]
+    assert len(entry_points.skippers) == len(ranked)
+    assert ranked == [*entry_points.skippers.ranked(reversed(ranked))]
+    by_rank = sorted(entry_points.skippers.items(), key=entry_points.rank_key)
+    assert ranked == [key for key, _ in by_rank]
+
+
+def test_entry_point_cache(
+    a_user_cache_dir: Path,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Verify installed ``entry_points`` are only found again if packages change."""
+    cache = EntryPointCache(get_user_cache_dir())
+    described = cache.describe()
+    assert ["doitoml.parser.v0", "json"] in [d[:2] for d in described]
+    assert (a_user_cache_dir / CACHE.ENTRY_POINTS).exists()
+    key = cache.get_key()
+
+    def find(_self: EntryPointCache) -> Any:
+        pytest.fail("should not read package metadata")
+
+    with monkeypatch.context() as patched:
+        patched.setattr(EntryPointCache, "find", find)
+        warm = EntryPointCache(get_user_cache_dir())
+        assert warm.describe() == described
+        assert [*warm.group("doitoml.parser.v0")] == [*cache.group("doitoml.parser.v0")]
+
+    site = tmp_path / "site"
+    site.mkdir()
+    monkeypatch.syspath_prepend(str(site))
+    key_with_site = cache.get_key()
+    assert key_with_site != key
+    (site / "foo-0.1.0.dist-info").mkdir()
+    assert cache.get_key() != key_with_site
+
+    monkeypatch.setenv(ENV_VARS.USER_CACHE_DIR, "")
+    assert get_user_cache_dir() is None
+    assert EntryPointCache(get_user_cache_dir()).describe() == described
+
+
+def test_task_records(a_pyproject_with: TPyprojectMaker) -> None:
+    """Verify resolved tasks are compact, and only become ``doit`` tasks late."""
+    ppt = a_pyproject_with(
+        {
+            "prefix": "",
+            "tasks": {
+                "a": {
+                    "doc": "a task",
+                    "actions": [["echo", "a"]],
+                    "file_dep": ["a.txt"],
+                    "task_dep": ["b"],
+                    "meta": {"other": 1, "doitoml": {"env": {"FOO": "a"}}},
+                },
+                "b": {"actions": [["echo", "b"]]},
+            },
+        },
+    )
+    doitoml = DoiTOML(fail_quietly=False)
+    a_record = doitoml.config.tasks["", "a"]
+    b_record = doitoml.config.tasks["", "b"]
+    assert isinstance(a_record, TaskRecord)
+    assert isinstance(b_record, TaskRecord)
+    assert not hasattr(a_record, "__dict__")
+    assert a_record.source is b_record.source is doitoml.config.sources[""]
+    assert a_record.prefixes[0] is b_record.prefixes[0]
+    assert a_record.file_dep == (str(ppt.parent / "a.txt"),)
+    assert b_record.env is None
+    assert "uptodate" not in a_record
+    assert a_record["meta"]["other"] == 1
+    assert a_record["meta"]["doitoml"]["env"] == {"FOO": "a"}
+    assert {*a_record} == {*a_record.to_task()}
+    assert len(a_record) == len(a_record.to_task())
+    assert "from" in repr(a_record)
+
+    [task] = [*doitoml.tasks()["task_a"]()]
+    assert task["doc"] == "a task"
+    assert task["file_dep"] == [str(ppt.parent / "a.txt")]
+    task["task_dep"] += ["c"]
+    assert a_record["task_dep"] == ["b"]
+
+
+def test_context_cache(
+    a_pyproject_with: TPyprojectMaker,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Verify normalized config data is only built again when stale."""
+    a_pyproject_with(
+        {
+            "prefix": "",
+            "tokens": {"foo": ["bar"]},
+            "tasks": {"a": {"actions": [["echo", "::foo"]]}},
+        },
+    )
+    config = DoiTOML(fail_quietly=False).config
+    context = config.get_context()
+    assert context["tokens"] == {":foo": ["bar"]}
+    assert config.get_context_cache() is config.get_context_cache()
+    with pytest.raises(TypeError):
+        context["tokens"] = {}  # type: ignore
+    with pytest.raises(TypeError):
+        context["tokens"][":foo"].append("baz")
+    with pytest.raises(TypeError):
+        context["tokens"].clear()
+    assert config.get_context()["tokens"] == {":foo": ["bar"]}
+    thawed = deepcopy(context["tokens"])
+    thawed[":foo"] += ["baz"]
+    assert context["tokens"] == {":foo": ["bar"]}
+
+    as_dict = config.to_dict()
+    as_dict["tokens"].clear()
+    assert config.to_dict()["tokens"] == {":foo": ["bar"]}
+
+    cached = config.get_context_cache()
+    monkeypatch.setenv("DOITOML_TEST_CONTEXT", "1")
+    assert config.get_context()["env"]["DOITOML_TEST_CONTEXT"] == "1"
+    assert config.get_context_cache() is not cached
+
+    cached = config.get_context_cache()
+    config.tasks = {**config.tasks}
+    assert config.get_context_cache() is not cached
+
+    cached = config.get_context_cache()
+    config.tokens["", "foo"] = ["baz"]
+    assert config.get_context_cache() is cached
+    config.forget_context()
+    assert config.get_context()["tokens"] == {":foo": ["baz"]}
+
+
 @pytest.mark.parametrize(
     "action",
     [["::foo"], {"py": {"foo:foo": {}}}],
@@ -277,3 +629,187 @@ def test_config_path_get(a_pyproject_with: TPyprojectMaker) -> None:
     as_dict = DoiTOML(fail_quietly=False).config.to_dict()
     task_names = set(as_dict["tasks"])
     assert task_names == {":a", "foo:a"}
+
+
+TOUCH = [sys.executable, "-c", "import pathlib, sys; pathlib.Path(sys.argv[1]).touch()"]
+
+LAZY_TASKS = {
+    "prefix": "",
+    "tasks": {
+        "build": {"actions": [["echo", "build"]], "task_dep": ["lint:*"]},
+        "lint": {
+            "py": {"actions": [["echo", "py"]]},
+            "js": {"actions": [["echo", "js"]], "setup": ["fmt:"]},
+        },
+        "fmt": {"actions": [["echo", "fmt"]]},
+        "bad": {"actions": [["::nope"]]},
+        "make": {
+            "in": {"actions": [[*TOUCH, "in.txt"]], "targets": ["in.txt"]},
+            "out": {
+                "actions": [[*TOUCH, "out.txt"]],
+                "file_dep": ["in.txt"],
+                "targets": ["out.txt"],
+            },
+        },
+        "use": {"actions": [["echo", "use"]], "file_dep": ["out.txt"]},
+    },
+}
+
+
+@pytest.mark.parametrize(
+    ("selectors", "expected"),
+    [
+        (["build:"], {"build", "lint:py", "lint:js", "fmt"}),
+        (["lint:js"], {"lint:js", "fmt"}),
+        (["lint"], {"lint:py", "lint:js", "fmt"}),
+        (["fmt:*"], {"fmt"}),
+        (["use"], {"use", "make:out", "make:in"}),
+    ],
+)
+def test_lazy_tasks(
+    selectors: List[str],
+    expected: Set[str],
+    a_pyproject_with: TPyprojectMaker,
+) -> None:
+    """Verify lazy tasks are resolved as selected, with their dependencies."""
+    a_pyproject_with(LAZY_TASKS)
+    doitoml = DoiTOML(fail_quietly=False, lazy_tasks=True)
+    assert not doitoml.config.tasks
+    assert len(doitoml.config.pending_tasks) == 8  # noqa: PLR2004
+
+    tasks = doitoml.tasks(selectors)
+    assert {":".join(k[1:]) for k in doitoml.config.tasks} == expected
+    assert len(tasks) == len({k[1] for k in doitoml.config.tasks})
+
+    with pytest.raises(UnresolvedError, match="bad"):
+        doitoml.tasks(["bad:", *selectors])
+
+
+@pytest.mark.parametrize("selectors", [None, ["not-a-task"]])
+def test_lazy_tasks_all(
+    selectors: Optional[List[str]],
+    a_pyproject_with: TPyprojectMaker,
+) -> None:
+    """Verify all lazy tasks are resolved if none, or an unknown one, is selected."""
+    a_pyproject_with(LAZY_TASKS)
+    doitoml = DoiTOML(fail_quietly=False, lazy_tasks=True)
+    with pytest.raises(UnresolvedError, match="bad"):
+        doitoml.tasks(selectors)
+
+
+def test_lazy_tasks_loader(
+    a_pyproject_with: TPyprojectMaker,
+    script_runner: Any,
+) -> None:
+    """Verify the ``doit`` loader only resolves selected tasks."""
+    a_pyproject_with({"doit": {"loader": "doitoml"}, "doitoml": LAZY_TASKS})
+    assert script_runner.run(["doit", "--doitoml-lazy", "lint:js"]).success
+    assert script_runner.run(["doit", "--doitoml-lazy", "use"]).success
+    assert script_runner.run(["doit", "--doitoml-lazy-sources", "lint:js"]).success
+    assert not script_runner.run(["doit", "lint:js"]).success
+
+
+LAZY_SOURCES: Dict[str, Dict[str, Any]] = {
+    ".": {
+        "prefix": "",
+        "config_paths": [f"{pkg}/package.json" for pkg in "abcdef"],
+        "paths": {"all": ["::*::dist"]},
+    },
+    "a": {
+        "prefix": "a",
+        "tasks": {
+            "build": {"actions": [["echo", "::b::dist"]], "task_dep": ["c:*"]},
+            "test": {"actions": [["echo", "::e::dist"]]},
+            "use": {"actions": [["echo"]], "file_dep": ["::b::dist"]},
+            "glob": {"actions": [["echo"]], "file_dep": [":glob::.::*.json"]},
+        },
+    },
+    "b": {"prefix": "b", "paths": {"dist": ["::out"], "out": ["out"]}},
+    "c": {"prefix": "c", "tasks": {"build": {"actions": [["echo", "${FROM_D}"]]}}},
+    "d": {"prefix": "d", "env": {"FROM_D": "d"}, "paths": {"dist": ["::nope"]}},
+    "e": {"prefix": "e", "paths": {"dist": ["::nope"]}},
+    "f": {
+        "prefix": "f",
+        "env": {"FROM_F": "f"},
+        "tasks": {"make": {"actions": [["echo"]], "targets": ["../b/out"]}},
+    },
+}
+
+
+@pytest.mark.parametrize(
+    ("selectors", "expected_sources", "expected_tasks"),
+    [
+        (["a:build"], ["", "a", "b", "c", "d", "f"], {"a:build", "c:build"}),
+        (["c"], ["", "c", "d", "f"], {"c:build"}),
+        (["a:use"], ["", "a", "b", "d", "f"], {"a:use", "f:make"}),
+    ],
+)
+def test_lazy_sources(
+    selectors: List[str],
+    expected_sources: List[str],
+    expected_tasks: Set[str],
+    tmp_path: Path,
+) -> None:
+    """Verify only the sources, and values, needed by selected tasks are loaded."""
+    for path, config in LAZY_SOURCES.items():
+        (tmp_path / path).mkdir(exist_ok=True)
+        pkg_json = tmp_path / path / "package.json"
+        pkg_json.write_text(json.dumps({"doitoml": config}), encoding="utf-8")
+
+    def load(selectors: List[str]) -> DoiTOML:
+        return DoiTOML(
+            cwd=tmp_path,
+            update_env=False,
+            fail_quietly=False,
+            selectors=selectors,
+        )
+
+    doitoml = load(selectors)
+    config = doitoml.config
+    assert [*config.sources] == expected_sources
+    assert "all" not in config.paths.get("", {})
+    assert "dist" not in config.paths.get("d", {})
+
+    tasks = doitoml.tasks(["a:test"])
+    assert {":".join(k) for k in config.tasks} == expected_tasks
+    assert len(tasks) == len({k[0] for k in config.tasks})
+    assert config.env["FROM_D"] == "d"
+    assert config.env["FROM_F"] == "f"
+
+    for bad_selectors in [[], ["a:test"], ["not-a-task"], ["a:glob"]]:
+        with pytest.raises(UnresolvedError, match="nope"):
+            load(bad_selectors).tasks(bad_selectors)
+
+
+def test_timings(
+    a_pyproject_with: TPyprojectMaker,
+    script_runner: Any,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Verify phases, sources, and DSL are timed, and dumped by the loader."""
+    ppt = a_pyproject_with(
+        {
+            "doit": {"loader": "doitoml"},
+            "doitoml": {
+                "prefix": "b",
+                "tasks": {"a": {"actions": [[":glob::.::*.toml"]]}},
+            },
+        },
+    )
+    doitoml = DoiTOML(fail_quietly=False)
+    doitoml.tasks()
+    timings = doitoml.timings.to_dict()
+    assert [*timings["phases"]][:3] == [
+        "entry_points",
+        "config_cache.load",
+        "find_config_sources",
+    ]
+    assert "tasks" in timings["phases"]
+    assert [*timings["parsed"]] == [str(ppt.resolve())]
+    assert timings["sources"]["b"]["calls"] == 1
+    assert timings["dsl"]["Globber"]["slowest"][0][0] == ":glob::.::*.toml"
+
+    dumped = ppt.parent / "build/timings.json"
+    monkeypatch.setenv("DOITOML_TIMINGS", str(dumped))
+    assert script_runner.run(["doit", "list"]).success
+    assert "tasks" in json.loads(dumped.read_text(encoding="utf-8"))["phases"]
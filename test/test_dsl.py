@@ -1,13 +1,19 @@
 """Tests of ``doitoml`` DSL."""
+import fnmatch
+import json
 import os
+import re
 from pathlib import Path
 from typing import Any, Type
 from unittest import mock
 
 import pytest
 from doitoml.doitoml import DoiTOML
+from doitoml.dsl import DslIndex, EnvReplacer, PathRef
 from doitoml.errors import DslError, EnvVarError, ParseError
 
+from .conftest import TPyprojectMaker
+
 GET = "doitoml-colon-get"
 GLOB = "doitoml-colon-glob"
 ENV = "doitoml-dollar-env"
@@ -68,3 +74,221 @@ def test_dsl_success(
     ]
     observed = list(dsl.transform_token(source, match, raw_token))
     assert observed == rel_expected
+
+
+@pytest.mark.parametrize(
+    "token",
+    [
+        "plain",
+        "",
+        "::foo",
+        "::pkg_*::foo",
+        "${FOO}",
+        "foo-${FOO}-bar",
+        ":glob::.::*.txt",
+        ":rglob::.::*.txt",
+        ":get::json::baz.json::foo",
+        ":get|x::json::baz.json::foo",
+        ":got::json::baz.json::foo",
+        "::${FOO}",
+        "::${FOO}::a::b",
+    ],
+)
+def test_dsl_index(token: str, empty_doitoml: DoiTOML) -> None:
+    """Verify the DSL index finds the same DSL as trying every pattern."""
+    entry_points = empty_doitoml.entry_points
+    expected = None
+    for dsl in entry_points.dsl.values():
+        if dsl.pattern.search(token):
+            expected = dsl
+            break
+    found = entry_points.dsl_index.match(token)
+    assert (found[0] if found else None) is expected
+
+
+def test_dsl_index_rank(empty_doitoml: DoiTOML) -> None:
+    """Verify DSL without literals are always tried, in rank order."""
+
+    class Anything(EnvReplacer):
+        pattern = re.compile(r".*")
+        contains = ()
+        rank = 50
+
+    class Late(Anything):
+        rank = 1000
+        starts_with = ("",)
+
+    assert empty_doitoml.entry_points.dsl_index.match("plain") is None
+
+    dsl = dict(empty_doitoml.entry_points.dsl)
+    dsl.update(late=Late(empty_doitoml))
+    index = DslIndex(dsl)
+    # ``::a::b::c`` has the literal of ``PathRef``, but only matches ``Late``
+    for token in ["plain", "::a::b::c"]:
+        found = index.match(token)
+        assert found
+        assert type(found[0]) is Late
+
+    dsl.update(anything=Anything(empty_doitoml))
+    index = DslIndex(dict(sorted(dsl.items(), key=lambda kv: kv[1].rank)))
+    for token in ["::x", "plain"]:
+        found = index.match(token)
+        assert found
+        assert type(found[0]) is Anything
+
+    found = DslIndex(dsl).match("::x")
+    assert found
+    assert isinstance(found[0], PathRef)
+
+
+@pytest.mark.parametrize("token", ["::x", "::a::b::c", ":get::x", "${", "plain"])
+def test_dsl_index_match_once(token: str, empty_doitoml: DoiTOML) -> None:
+    """Verify a token is matched against the literals, and each DSL, at most once."""
+    index = DslIndex(empty_doitoml.entry_points.dsl)
+    spies = [mock.Mock(pattern=mock.Mock(wraps=d.pattern)) for d, _, _ in index.ranked]
+    index.ranked = [(spy, *rest) for spy, (_, *rest) in zip(spies, index.ranked)]
+    with mock.patch.object(index, "any_literal", wraps=index.any_literal) as literal:
+        index.match(token)
+    assert literal.match.call_count == 1
+    assert all(spy.pattern.search.call_count <= 1 for spy in spies)
+
+
+
+def test_path_ref_wildcard(a_pyproject_with: TPyprojectMaker) -> None:
+    """Verify wildcard prefixes are matched once, and keep their order."""
+    packages = [f"pkg_{i:02d}" for i in range(30)]
+    ppt = a_pyproject_with(
+        {
+            "prefix": "",
+            "config_paths": [f"{pkg}/package.json" for pkg in packages],
+            "tokens": {"all": ["::pkg_*::dist"]},
+        },
+    )
+    for i, pkg in enumerate(packages):
+        pkg_json = ppt.parent / pkg / "package.json"
+        pkg_json.parent.mkdir()
+        config: Any = {"prefix": pkg, "paths": {"dist": [f"dist/{i}.whl"]}}
+        if i % 10 == 0:
+            config["tokens"] = {"dist": [f"token-{i}"]}
+        pkg_json.write_text(json.dumps({"doitoml": config}), encoding="utf-8")
+
+    doitoml = DoiTOML([ppt], update_env=False, fail_quietly=False)
+    expected = [
+        f"token-{i}" if i % 10 == 0 else (ppt.parent / f"{pkg}/dist/{i}.whl").as_posix()
+        for i, pkg in enumerate(packages)
+    ]
+    assert doitoml.config.tokens["", "all"] == expected
+
+    source = doitoml.config.sources[""]
+    dsl = doitoml.entry_points.dsl["doitoml-colon-colon-path"]
+    raw_token = "::pkg_1*::dist"  # noqa: S105
+    match = dsl.pattern.search(raw_token)
+    assert match is not None
+    with mock.patch.object(fnmatch, "filter", wraps=fnmatch.filter) as filtered:
+        for _ in range(3):
+            observed = dsl.transform_token(source, match, raw_token)
+            assert observed == expected[10:20]
+    assert filtered.call_count == 1
+
+PRUNE_TREE = [
+    "src/a.js",
+    "src/b/c.js",
+    "src/b/c.log",
+    "src/b/keep.log",
+    "node_modules/d.js",
+    "node_modules/e/f.js",
+    "build/g.js",
+    ".git/h.js",
+]
+
+GITIGNORE = """
+# comments and blank lines are skipped
+
+*.log
+!keep.log
+/build/
+node_modules
+"""
+
+
+ALL_JS = [p for p in PRUNE_TREE if p.endswith(".js")]
+UNIGNORED_JS = ["src/a.js", "src/b/c.js", "build/g.js", ".git/h.js"]
+UNIGNORED = [".gitignore", "pyproject.toml", "src", "src/a.js", "src/b", "src/b/c.js"]
+
+
+@pytest.mark.parametrize(
+    ("raw_token", "expected", "scans"),
+    [
+        (":rglob::.::*.js", ALL_JS, 7),
+        (":rglob::.::*.js::!node_modules", UNIGNORED_JS, 5),
+        (":rglob::.::*.js::!^node_modules/", UNIGNORED_JS, 5),
+        (":rglob::.::*.js::!node_modules$", ALL_JS, 7),
+        (":rglob::.::*::/gitignore/", [*UNIGNORED, "src/b/keep.log"], 3),
+        (":glob::src::**/*.log::/gitignore/", ["src/b/keep.log"], 3),
+    ],
+)
+def test_glob_prune(
+    raw_token: str,
+    expected: Any,
+    scans: int,
+    a_pyproject_with: TPyprojectMaker,
+) -> None:
+    """Verify excluded directories are not walked, and ``.gitignore`` is respected."""
+    ppt = a_pyproject_with({"prefix": ""})
+    for rel in PRUNE_TREE:
+        path = ppt.parent / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.touch()
+    (ppt.parent / ".gitignore").write_text(GITIGNORE, encoding="utf-8")
+
+    doitoml = DoiTOML([ppt], update_env=False, discover_config_paths=False)
+    assert not doitoml.directory_cache.scans
+    source = doitoml.config.sources[""]
+    dsl = doitoml.entry_points.dsl[GLOB]
+    match = dsl.pattern.search(raw_token)
+    assert match is not None
+    observed = dsl.transform_token(source, match, raw_token)
+    assert observed == sorted((ppt.parent / rel).as_posix() for rel in expected)
+    assert doitoml.directory_cache.scans == scans
+
+
+@pytest.mark.parametrize(
+    ("kind", "pattern", "exclude"),
+    [
+        ("rglob", "*/", "node_modules"),
+        ("rglob", "*/", "^src/b/"),
+        ("rglob", "*.js", "node_modules"),
+        ("rglob", "*.log", "^src/b/c"),
+        ("glob", "**/", "^node_modules/"),
+        ("glob", "*/", "build"),
+    ],
+)
+def test_glob_prune_like_pathlib(
+    kind: str,
+    pattern: str,
+    exclude: str,
+    a_pyproject_with: TPyprojectMaker,
+) -> None:
+    """Verify pruned globs match filtering the results of ``pathlib``."""
+    ppt = a_pyproject_with({"prefix": ""})
+    root = ppt.parent
+    for rel in PRUNE_TREE:
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.touch()
+
+    raw_token = f":{kind}::.::{pattern}::!{exclude}"
+    doitoml = DoiTOML([ppt], update_env=False, discover_config_paths=False)
+    source = doitoml.config.sources[""]
+    dsl = doitoml.entry_points.dsl[GLOB]
+    match = dsl.pattern.search(raw_token)
+    assert match is not None
+    observed = dsl.transform_token(source, match, raw_token)
+
+    excluded = re.compile(exclude)
+    expected = sorted(
+        path.as_posix()
+        for path in getattr(root, kind)(pattern)
+        if path == root or not excluded.search(path.relative_to(root).as_posix())
+    )
+    assert observed == expected
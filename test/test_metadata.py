@@ -1,7 +1,44 @@
 """Tests of basic packaging and runtime metadata."""
+import importlib
+import subprocess
+import sys
+
 import doitoml
+import pytest
+
+from .conftest import SELF_PPT, tomllib
+
+if sys.version_info < (3, 10):  # pragma: no cover
+    from importlib_metadata import version
+else:  # pragma: no cover
+    from importlib.metadata import version
 
 
 def test_version() -> None:
     """Verify there is a version."""
     assert doitoml.__version__
+
+
+def test_version_matches() -> None:
+    """Verify the version matches the package metadata."""
+    assert doitoml.__version__ == version("doitoml")
+    ppt = tomllib.loads(SELF_PPT.read_text(encoding="utf-8"))
+    assert doitoml.__version__ == ppt["project"]["version"]
+
+
+@pytest.mark.parametrize("module", ["doitoml", "doitoml._version"])
+def test_version_only_attribute(module: str) -> None:
+    """Verify only ``__version__`` is read lazily."""
+    with pytest.raises(AttributeError, match="no attribute 'not_a_version'"):
+        importlib.import_module(module).not_a_version  # noqa: B018
+
+
+@pytest.mark.parametrize(
+    "module",
+    ["doit", "importlib.metadata", "pprint", "subprocess", "jsonschema"],
+)
+def test_import_defers(module: str) -> None:
+    """Verify importing ``doitoml`` doesn't import modules only used later."""
+    code = f"import sys, doitoml; print({module!r} in sys.modules)"
+    out = subprocess.check_output([sys.executable, "-c", code], text=True)  # noqa: S603
+    assert out.strip() == "False"
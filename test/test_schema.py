@@ -1,5 +1,16 @@
 """Tests for ``doitoml`` schema."""
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict
+
+import pytest
 from doitoml import DoiTOML
+from doitoml.constants import CACHE
+from doitoml.errors import SchemaError
+from doitoml.schema import LATEST_SCHEMA
+from doitoml.schema.compiler import SchemaCompiler, load_validator
+from doitoml.schema.validator import Version, latest
 
 from .conftest import TPyprojectMaker
 
@@ -15,3 +26,118 @@ def test_no_validate(a_pyproject_with: TPyprojectMaker) -> None:
     doitoml = DoiTOML(validate=False)
     doitoml.config.tasks = {("0",): BAD_TASK}  # type: ignore
     doitoml.config.maybe_validate()
+
+
+def test_validation_cache(
+    a_pyproject_with: TPyprojectMaker,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Verify only changed parts of a config are validated again."""
+    tasks = {"a": {"actions": [["echo", "a"]]}, "b": {"actions": [["echo", "b"]]}}
+    a_pyproject_with({"prefix": "pp", "tasks": tasks})
+    cache_dir = tmp_path / "cache"
+
+    def load() -> DoiTOML:
+        # don't reuse the resolved config
+        (cache_dir / CACHE.CONFIG).unlink(missing_ok=True)
+        return DoiTOML(fail_quietly=False, cache_dir=cache_dir)
+
+    first = load()
+    assert (first.validation_cache.hits, first.validation_cache.misses) == (0, 2)
+    assert (cache_dir / CACHE.VALIDATED).exists()
+    assert latest.path == LATEST_SCHEMA
+
+    with monkeypatch.context() as patched:
+        patched.setattr(Version, "validate", lambda *_: pytest.fail("validated"))
+        second = load()
+    assert (second.validation_cache.hits, second.validation_cache.misses) == (2, 0)
+
+    doitoml = DoiTOML(fail_quietly=False)
+    doitoml.config.tasks = {("pp", "a"): BAD_TASK}  # type: ignore
+    with pytest.raises(SchemaError, match="#/tasks/pp:a/name"):
+        doitoml.config.maybe_validate()
+
+
+GOOD_META = {"doitoml": {"cwd": ".", "log": [None, None], "source": "a"}}
+
+
+@pytest.mark.parametrize(
+    "instance",
+    [
+        {},
+        [],
+        {"env": {"A": 1}, "paths": {"p": ["", 1]}, "tokens": {"t": "x"}, "tasks": []},
+        {
+            "env": {},
+            "paths": {},
+            "tokens": {},
+            "tasks": {
+                "a": {
+                    "name": 1,
+                    "verbosity": True,
+                    "actions": [1, {"py": 1}, "x", ["x", 1], None],
+                    "uptodate": [1, True, None, {}],
+                    "file_dep": ["", 1],
+                    "meta": {"doitoml": {"cwd": 1, "zz": 2, "yy": 1, "log": [1]}},
+                },
+                "b": {"meta": {"doitoml": {**GOOD_META["doitoml"], "skip": []}}},
+                "c": {"verbosity": 2, "meta": GOOD_META, "watch": "x"},
+            },
+        },
+    ],
+)
+def test_compiled_validator(instance: Any) -> None:
+    """Verify the generated validator finds the same errors as ``jsonschema``."""
+    compiled = latest.compiled(instance)
+    assert compiled
+    expected = latest.jsonschema_errors(instance)
+    assert sorted(map(str, compiled)) == sorted(map(str, expected))
+
+
+def test_compiled_validator_cache(
+    a_user_cache_dir: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Verify generated validators are stored by the hash of the schema."""
+    validate = load_validator(LATEST_SCHEMA, a_user_cache_dir)
+    assert validate({"env": {}, "paths": {}, "tokens": {}, "tasks": {}}) == []
+    cached = [*a_user_cache_dir.glob("*.py")]
+    assert len(cached) == 1
+
+    with monkeypatch.context() as patched:
+        patched.setattr(SchemaCompiler, "generate", lambda *_: pytest.fail("generated"))
+        assert load_validator(LATEST_SCHEMA, a_user_cache_dir)([]) == validate([])
+
+    source = cached[0].read_text(encoding="utf-8")
+    for changed in [f"{source}\nraise ValueError()", f"# not checked\n{source}"]:
+        cached[0].write_text(changed, encoding="utf-8")
+        assert load_validator(LATEST_SCHEMA, a_user_cache_dir)([]) == validate([])
+        assert cached[0].read_text(encoding="utf-8") == source
+
+    with pytest.raises(SchemaError, match="'pattern' cannot be compiled"):
+        SchemaCompiler({"type": "string", "pattern": "^a"}).generate()
+
+
+def test_compiled_without_jsonschema(a_user_cache_dir: Path) -> None:
+    """Verify validating with the generated validator doesn't import ``jsonschema``."""
+    code = (
+        "import sys; from doitoml.schema.validator import latest; "
+        "latest.validate({'env': {}, 'paths': {}, 'tokens': {}, 'tasks': {}}); "
+        "print('jsonschema' in sys.modules)"
+    )
+    out = subprocess.check_output([sys.executable, "-c", code], text=True)  # noqa: S603
+    assert out.strip() == "False"
+    assert [*(a_user_cache_dir / CACHE.SCHEMA).glob("*.py")]
+
+
+def test_compiled_one_of() -> None:
+    """Verify values valid under more than one of ``oneOf`` match ``jsonschema``."""
+    from jsonschema import Draft7Validator
+
+    schema = {"oneOf": [{"type": "number"}, {"enum": [1, True]}, {"minLength": 1}]}
+    namespace: Dict[str, Any] = {}
+    exec(SchemaCompiler(schema).generate(), namespace)  # noqa: S102
+    for instance in [1, True, "a", "", 1.5]:
+        expected = [e.message for e in Draft7Validator(schema).iter_errors(instance)]
+        assert [e["message"] for e in namespace["validate"](instance)] == expected
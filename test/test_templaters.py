@@ -1,9 +1,12 @@
 """Tests of ``doitoml`` templaters."""
 
+from pathlib import Path
 from typing import Any, Type
+from unittest import mock
 
 import pytest
 from doitoml import DoiTOML
+from doitoml.constants import CACHE
 from doitoml.errors import (
     DoitomlError,
     Jinja2Error,
@@ -20,6 +23,14 @@ from .conftest import (
     TPyprojectMaker,
 )
 
+if HAS_JINJA2:
+    from doitoml.templaters.jinja2 import Jinja2
+
+if HAS_JSONE:
+    from doitoml.templaters.jsone import JsonE
+
+TEMPLATED_TASKS = 10
+
 
 @pytest.mark.parametrize(
     ("templates", "message"),
@@ -89,3 +100,213 @@ def test_bad_templater_jinja_tasks(
 
     with pytest.raises(error_type, match=message):
         DoiTOML(fail_quietly=False)
+
+
+@pytest.mark.skipif(not HAS_JINJA2, **MSG_MISSING_JINJA2)
+def test_jinja2_parser_rank(a_pyproject_with: TPyprojectMaker) -> None:
+    """Verify the first parser by rank is used, whatever order a task lists them."""
+    task = {
+        "yaml": "- name: from_yaml\n  actions: [[echo]]\n",
+        "json": '[{"name": "from_json", "actions": [["echo"]]}]',
+    }
+    a_pyproject_with({"prefix": "", "templates": {"jinja2": {"tasks": {"t": task}}}})
+    doitoml = DoiTOML(fail_quietly=False)
+    assert [*doitoml.config.tasks] == [("", "t", "from_json")]
+
+
+@pytest.mark.skipif(not HAS_JINJA2, **MSG_MISSING_JINJA2)
+def test_jinja2_template_cache(
+    a_pyproject_with: TPyprojectMaker,
+    tmp_path: Path,
+) -> None:
+    """Verify a template shared by many tasks is only compiled once."""
+    yaml = """
+    - name: v{{ tokens[":v"][0] }}
+      actions: [[echo, "{{ tokens[":v"][0] }}"]]
+    """
+    task = {"yaml": yaml.replace("\n    ", "\n")}
+    a_pyproject_with(
+        {
+            "prefix": "",
+            "tokens": {"v": ["1"]},
+            "templates": {
+                "jinja2": {"tasks": {f"t{i}": task for i in range(TEMPLATED_TASKS)}},
+            },
+        },
+    )
+    cache_dir = tmp_path / "cache"
+
+    def load() -> DoiTOML:
+        return DoiTOML(fail_quietly=False, cache_dir=cache_dir)
+
+    doitoml = load()
+    templater = doitoml.entry_points.templaters["jinja2"]
+    assert isinstance(templater, Jinja2)
+    assert len(doitoml.config.tasks) == TEMPLATED_TASKS
+    assert len(templater.templates) == 1
+    [*bytecode] = (cache_dir / CACHE.JINJA2).glob("*.cache")
+    assert len(bytecode) == 1
+
+    (cache_dir / CACHE.CONFIG).unlink()
+    mtime = bytecode[0].stat().st_mtime_ns
+    assert len(load().config.tasks) == TEMPLATED_TASKS
+    assert bytecode[0].stat().st_mtime_ns == mtime
+
+
+@pytest.mark.skipif(not HAS_JINJA2, **MSG_MISSING_JINJA2)
+def test_jinja2_context_read_only(a_pyproject_with: TPyprojectMaker) -> None:
+    """Verify a template can't change the context shared with later templates."""
+    task = {"yaml": '- {name: a, actions: [[echo, "{{ tokens[":v"].append(2) }}"]]}'}
+    a_pyproject_with(
+        {
+            "prefix": "",
+            "tokens": {"v": ["1"]},
+            "templates": {"jinja2": {"tasks": {"t": task}}},
+        },
+    )
+    with pytest.raises(TypeError, match="read-only"):
+        DoiTOML(fail_quietly=False)
+
+
+@pytest.mark.skipif(not (HAS_JINJA2 and HAS_JSONE), **MSG_MISSING_JINJA2)
+def test_render_cache(
+    a_pyproject_with: TPyprojectMaker,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Verify templated tasks are reused across runs, until their inputs change."""
+    jinja_task = {"yaml": '- {name: a, actions: [[echo, "{{ tokens[":v"][0] }}"]]}'}
+    jsone_task = {
+        "$map": "::v",
+        "each(v,i)": {"name": "e${i}", "actions": [["echo", "${v}"]]},
+    }
+
+    def write(version: str) -> None:
+        a_pyproject_with(
+            {
+                "prefix": "",
+                "tokens": {"v": [version]},
+                "templates": {
+                    "jinja2": {"tasks": {"j0": jinja_task, "j1": jinja_task}},
+                    "json-e": {"tasks": {"e": jsone_task}},
+                },
+            },
+        )
+
+    cache_dir = tmp_path / "cache"
+
+    def load() -> DoiTOML:
+        config_json = cache_dir / CACHE.CONFIG
+        if config_json.exists():
+            config_json.unlink()
+        return DoiTOML(fail_quietly=False, cache_dir=cache_dir)
+
+    write("1")
+    with mock.patch.object(
+        JsonE,
+        "expand_task",
+        autospec=True,
+        side_effect=JsonE.expand_task,
+    ) as expand_task:
+        first = load()
+    assert expand_task.call_count == 1
+    assert (first.render_cache.hits, first.render_cache.misses) == (1, 2)
+    assert (cache_dir / CACHE.TEMPLATES).exists()
+
+    second = load()
+    assert (second.render_cache.hits, second.render_cache.misses) == (3, 0)
+    assert second.config.to_dict()["tasks"] == first.config.to_dict()["tasks"]
+
+    monkeypatch.setenv("DOITOML_TEST_RENDER", "1")
+    third = load()
+    assert (third.render_cache.hits, third.render_cache.misses) == (2, 1)
+
+    write("2")
+    fourth = load()
+    assert (fourth.render_cache.hits, fourth.render_cache.misses) == (1, 2)
+    task = fourth.config.tasks["", "j0", "a"]
+    assert task["actions"] == (["echo", "2"],)
+
+    templater = fourth.entry_points.templaters["jinja2"]
+    source = next(iter(fourth.config.sources.values()))
+    once, twice = [
+        fourth.render_cache.transform_task("jinja2", templater, source, jinja_task)
+        for _ in range(2)
+    ]
+    assert once == twice
+    assert once is not twice
+
+    assert not DoiTOML(fail_quietly=False).render_cache.hits
+
+
+@pytest.mark.skipif(not HAS_JSONE, **MSG_MISSING_JSONE)
+@pytest.mark.parametrize(
+    ("action", "cached"),
+    [
+        ("${v}", True),
+        ({"$eval": "now"}, False),
+        ({"$fromNow": "1 day"}, False),
+        ({"$eval": "fromNow('1 day')"}, False),
+    ],
+)
+def test_render_cache_jsone_time(
+    action: Any,
+    cached: bool,
+    a_pyproject_with: TPyprojectMaker,
+    tmp_path: Path,
+) -> None:
+    """Verify JSON-e templates which use the current time are never reused."""
+    jsone_task = {
+        "$map": "::v",
+        "each(v,i)": {"name": "e${i}", "actions": [["echo", action]]},
+    }
+    a_pyproject_with(
+        {
+            "prefix": "",
+            "tokens": {"v": ["1"]},
+            "templates": {"json-e": {"tasks": {"e": jsone_task}}},
+        },
+    )
+    cache_dir = tmp_path / "cache"
+
+    def load() -> DoiTOML:
+        (cache_dir / CACHE.CONFIG).unlink(missing_ok=True)
+        return DoiTOML(fail_quietly=False, cache_dir=cache_dir)
+
+    assert load().render_cache.hits == 0
+    assert load().render_cache.hits == int(cached)
+
+
+@pytest.mark.skipif(not HAS_JSONE, **MSG_MISSING_JSONE)
+def test_render_cache_jsone_version(
+    a_pyproject_with: TPyprojectMaker,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Verify JSON-e templates are rendered again after ``json-e`` changes."""
+    jsone_task = {
+        "$map": "::v",
+        "each(v,i)": {"name": "e${i}", "actions": [["echo", "${v}"]]},
+    }
+    a_pyproject_with(
+        {
+            "prefix": "",
+            "tokens": {"v": ["1"]},
+            "templates": {"json-e": {"tasks": {"e": jsone_task}}},
+        },
+    )
+    cache_dir = tmp_path / "cache"
+
+    def load() -> DoiTOML:
+        (cache_dir / CACHE.CONFIG).unlink(missing_ok=True)
+        return DoiTOML(fail_quietly=False, cache_dir=cache_dir)
+
+    first = load()
+    templater = first.entry_points.templaters["json-e"]
+    assert isinstance(templater, JsonE)
+    assert templater.get_jsone_version()
+    assert load().render_cache.hits == 1
+
+    monkeypatch.setattr(JsonE, "get_jsone_version", lambda _self: "0.0.0")
+    assert load().render_cache.hits == 0
+    assert load().render_cache.hits == 1